@@ -1,30 +1,37 @@
 import calendar
-import csv
-import glob
-import math
-import os
-from datetime import date, datetime, timedelta
+import threading
+from datetime import date
 import tkinter as tk
 from tkinter import messagebox, ttk
 
-
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-CSV_DIR = os.path.join(BASE_DIR, "csv")
-DATA_DIR = os.path.join(BASE_DIR, "data", "usdjpy", "m1")
-JST_OFFSET = timedelta(hours=9)
-
-DATETIME_FORMATS = (
-    "%Y-%m-%d %H:%M",
-    "%Y/%m/%d %H:%M",
-    "%Y.%m.%d %H:%M",
-    "%y.%m.%d %H:%M",
-)
-DATE_FORMATS = (
-    "%Y-%m-%d",
-    "%Y/%m/%d",
-    "%Y.%m.%d",
-    "%Y%m%d",
+from engine import (
+    CSV_DIR,
+    DATA_DIR,
+    JST_OFFSET,
+    PIP_SIZE,
+    REASON_ITEMS,
+    REASON_LABELS,
+    TIMEFRAMES,
+    apply_indicator_filters,
+    build_params,
+    calc_stats,
+    format_dt,
+    format_pips,
+    format_price,
+    indicator_lookback,
+    load_indicator_bars,
+    load_ohlc_range,
+    load_signals,
+    filter_signals_by_tags,
+    parse_datetime_text,
+    parse_period,
+    resample_bars,
+    run_trades,
 )
+from indicators import shared_cache
+from montecarlo import format_report, run_monte_carlo
+from signal_store import Signals
+
 CHART_HEIGHT = 520
 CHART_BG = "#ffffff"
 CHART_GRID = "#e0e0e0"
@@ -39,51 +46,31 @@ CHART_LEFT_PAD = 10
 CHART_RIGHT_PAD = 80
 CHART_TOP_PAD = 8
 CHART_BOTTOM_PAD = 26
+# 自動の表示足は、この本数に収まる最も細かい足にする
 MAX_DRAW_BARS = 1500
+CHART_TF_AUTO = "自動"
 EQUITY_HEIGHT = 260
-ZOOM_MIN = 0.5
+ZOOM_MIN = 0.05
 ZOOM_MAX = 3.0
 ZOOM_STEP = 0.1
 CHART_MIN_BAR_STEP = 5
 CHART_MAX_BAR_STEP = 20
-PIP_SIZE = 0.01
-EQUITY_POINT_RADIUS = 3
-
-REASON_ITEMS = (
-    ("entry", "新規"),
-    ("entry_plan", "新規予定"),
-    ("boast", "自慢"),
-    ("fear", "恐怖"),
-    ("fear_plan", "恐怖予定"),
-    ("greed", "欲望"),
-    ("stop", "損切"),
-    ("stop_plan", "損切予定"),
-    ("lc", "ロスカ"),
-    ("lc_plan", "ロスカ予定"),
-    ("tp", "利確"),
-    ("tp_plan", "利確予定"),
+# 1本の幅がこれより狭いときは、画面の1列ごとに高値・安値の幅だけを描く
+CHART_LOD_STEP = 3
+# スクロールや拡大縮小の描き直しは、この間隔(ms)に1回へまとめる
+CHART_REDRAW_MS = 16
+# 描く順（後ろほど手前）
+CHART_LAYERS = (
+    ("grid", "line"),
+    ("axis", "text"),
+    ("wick", "line"),
+    ("body", "rectangle"),
+    ("series", "line"),
+    ("trade", "line"),
+    ("arrow", "polygon"),
+    ("label", "text"),
 )
-REASON_LABELS = dict(REASON_ITEMS)
-
-
-def parse_datetime_text(text, is_end=False):
-    text = (text or "").strip()
-    if not text:
-        raise ValueError("empty")
-    for fmt in DATETIME_FORMATS:
-        try:
-            return datetime.strptime(text, fmt)
-        except ValueError:
-            pass
-    for fmt in DATE_FORMATS:
-        try:
-            base = datetime.strptime(text, fmt)
-            if is_end:
-                return base.replace(hour=23, minute=59)
-            return base.replace(hour=0, minute=0)
-        except ValueError:
-            pass
-    raise ValueError("format")
+EQUITY_POINT_RADIUS = 3
 
 
 def parse_date_for_calendar(text):
@@ -93,208 +80,12 @@ def parse_date_for_calendar(text):
         return date.today()
 
 
-def parse_signal_datetime(text):
-    text = (text or "").strip()
-    if not text:
-        return None
-    for fmt in DATETIME_FORMATS:
-        try:
-            return datetime.strptime(text, fmt)
-        except ValueError:
-            pass
-    return None
-
-
-def parse_flag(value):
-    if value is None:
-        return False
-    text = str(value).strip().lower()
-    return text in ("1", "true", "yes", "y")
-
-
-def parse_reason_to_tags(reason_text):
-    """reason列（縦線区切りの理由文字列）をtagsディクショナリに変換"""
-    if not reason_text:
-        return {
-            "entry": False,
-            "entry_plan": False,
-            "boast": False,
-            "fear": False,
-            "fear_plan": False,
-            "greed": False,
-            "stop": False,
-            "stop_plan": False,
-            "lc": False,
-            "lc_plan": False,
-            "tp": False,
-            "tp_plan": False,
-        }
-    tags = {
-        "entry": False,
-        "entry_plan": False,
-        "boast": False,
-        "fear": False,
-        "fear_plan": False,
-        "greed": False,
-        "stop": False,
-        "stop_plan": False,
-        "lc": False,
-        "lc_plan": False,
-        "tp": False,
-        "tp_plan": False,
-    }
-    reasons = [r.strip() for r in str(reason_text).split("|") if r.strip()]
-    for reason in reasons:
-        if reason == "entry":
-            tags["entry"] = True
-        elif reason == "entry_plan":
-            tags["entry_plan"] = True
-        elif reason == "boast":
-            tags["boast"] = True
-        elif reason == "fear":
-            tags["fear"] = True
-        elif reason == "fear_plan":
-            tags["fear_plan"] = True
-        elif reason == "greed":
-            tags["greed"] = True
-        elif reason == "stop":
-            tags["stop"] = True
-        elif reason == "stop_plan":
-            tags["stop_plan"] = True
-        elif reason == "lc":
-            tags["lc"] = True
-        elif reason == "lc_plan":
-            tags["lc_plan"] = True
-        elif reason == "tp":
-            tags["tp"] = True
-        elif reason == "tp_plan":
-            tags["tp_plan"] = True
-    return tags
-
-
-def normalize_entry_type(text):
-    if not text:
-        return "INSTANT"
-    cleaned = str(text).strip().upper()
-    if cleaned in ("LIMIT", "L"):
-        return "LIMIT"
-    if cleaned in ("INSTANT", "I"):
-        return "INSTANT"
-    return "INSTANT"
-
-
-def normalize_action(text):
-    if not text:
-        return None
-    cleaned = text.strip().upper()
-    if cleaned in ("BUY", "LONG", "B"):
-        return "BUY"
-    if cleaned in ("SELL", "SHORT", "S"):
-        return "SELL"
-    return None
-
-
-def format_dt(dt):
-    return dt.strftime("%Y-%m-%d %H:%M")
-
-
-def format_price(value):
-    return f"{value:.3f}"
-
-
 def format_axis_time(dt, show_date):
     if show_date:
         return dt.strftime("%m-%d %H:%M")
     return dt.strftime("%H:%M")
 
 
-def format_pips(value):
-    return f"{value:.2f}"
-
-
-def load_signals(csv_dir):
-    signals = []
-    errors = []
-    if not os.path.isdir(csv_dir):
-        return signals, ["サインの場所が見つかりません"]
-    paths = sorted(glob.glob(os.path.join(csv_dir, "*.csv")))
-    if not paths:
-        return signals, ["サインのファイルがありません"]
-
-    for path in paths:
-        try:
-            with open(path, "r", encoding="utf-8-sig", newline="") as f:
-                reader = csv.DictReader(f)
-                if not reader.fieldnames:
-                    continue
-
-                # 新フォーマットか旧フォーマットかを判定
-                # 新フォーマット: datetime,side,entry_type,entry_price,reason
-                # 旧フォーマット: datetime,symbol,side,entry_type,entry_price,is_entry,...
-                is_new_format = "reason" in reader.fieldnames
-
-                for row in reader:
-                    dt_text = row.get("datetime") or row.get("time") or row.get("日時")
-                    action = row.get("action") or row.get("side") or row.get("売買")
-                    entry_type = normalize_entry_type(row.get("entry_type"))
-                    entry_price_text = row.get("entry_price")
-                    entry_price = None
-                    if entry_price_text not in (None, ""):
-                        try:
-                            entry_price = float(entry_price_text)
-                        except ValueError:
-                            entry_price = None
-
-                    # 旧フォーマットのみsymbolをチェック
-                    if not is_new_format:
-                        symbol = row.get("symbol") or row.get("通貨")
-                        if symbol and symbol.strip().upper() != "USDJPY":
-                            continue
-
-                    dt_jst = parse_signal_datetime(dt_text)
-                    if not dt_jst:
-                        continue
-                    action_norm = normalize_action(action)
-                    if not action_norm:
-                        continue
-
-                    # フォーマットに応じてtagsを生成
-                    if is_new_format:
-                        tags = parse_reason_to_tags(row.get("reason"))
-                    else:
-                        # 旧フォーマット: is_付きのカラム名 → is_なしのキーに変換
-                        tags = {
-                            "entry": parse_flag(row.get("is_entry")),
-                            "entry_plan": parse_flag(row.get("is_entry_plan")),
-                            "boast": parse_flag(row.get("is_boast")),
-                            "fear": parse_flag(row.get("is_fear")),
-                            "fear_plan": parse_flag(row.get("is_fear_plan")),
-                            "greed": parse_flag(row.get("is_greed")),
-                            "stop": parse_flag(row.get("is_stop")),
-                            "stop_plan": parse_flag(row.get("is_stop_plan")),
-                            "lc": parse_flag(row.get("is_lc")),
-                            "lc_plan": parse_flag(row.get("is_lc_plan")),
-                            "tp": parse_flag(row.get("is_tp")),
-                            "tp_plan": parse_flag(row.get("is_tp_plan")),
-                        }
-                    signals.append(
-                        {
-                            "time_jst": dt_jst,
-                            "time_utc": dt_jst - JST_OFFSET,
-                            "action": action_norm,
-                            "entry_type": entry_type,
-                            "entry_price": entry_price,
-                            "source": row.get("source") or os.path.basename(path),
-                            "tags": tags,
-                        }
-                    )
-        except Exception as exc:
-            errors.append(f"{os.path.basename(path)} の読み込み失敗: {exc}")
-
-    signals.sort(key=lambda item: item["time_utc"])
-    return signals, errors
-
-
 class CalendarDialog(tk.Toplevel):
     def __init__(self, parent, target_var, initial_date):
         super().__init__(parent)
@@ -371,272 +162,42 @@ class CalendarDialog(tk.Toplevel):
         self.destroy()
 
 
-def iter_dates(start_date, end_date):
-    day = start_date
-    while day <= end_date:
-        yield day
-        day += timedelta(days=1)
-
-
-def load_ohlc_range(data_dir, start_utc, end_utc):
-    bars = []
-    errors = []
-    if not os.path.isdir(data_dir):
-        return bars, {}, ["足データの場所が見つかりません"]
-
-    for day in iter_dates(start_utc.date(), end_utc.date()):
-        year_dir = os.path.join(data_dir, f"{day.year:04d}")
-        path = os.path.join(year_dir, f"{day:%Y-%m-%d}.csv")
-        if not os.path.isfile(path):
-            continue
-        try:
-            with open(path, "r", encoding="utf-8", newline="") as f:
-                # 最初の行を読んでフォーマットを判定
-                first_line = f.readline()
-                f.seek(0)
-
-                # デリミタを判定（カンマかタブ）
-                if "," in first_line:
-                    delimiter = ","
-                else:
-                    delimiter = "\t"
-
-                reader = csv.DictReader(f, delimiter=delimiter)
-                if not reader.fieldnames:
-                    continue
-
-                # 新フォーマットか旧フォーマットかを判定
-                # 新フォーマット: "Local time"列がある
-                # 旧フォーマット: "time"または"Time"列がある
-                is_new_format = "Local time" in reader.fieldnames
-
-                for row in reader:
-                    if is_new_format:
-                        time_text = row.get("Local time")
-                        if not time_text:
-                            continue
-                        # "01.01.2026 00:00:00.000 GMT+0900" 形式をパース
-                        # "GMT+0900"部分を削除してからパース
-                        time_text_clean = time_text.split("GMT")[0].strip()
-                        try:
-                            bar_time = datetime.strptime(time_text_clean, "%d.%m.%Y %H:%M:%S.%f")
-                        except ValueError:
-                            continue
-                        # JSTとして扱う（データがGMT+0900と明記されているため）
-                        # UTCに変換
-                        bar_time = bar_time - JST_OFFSET
-                    else:
-                        time_text = row.get("time") or row.get("Time")
-                        if not time_text:
-                            continue
-                        try:
-                            bar_time = datetime.strptime(time_text.strip(), "%Y.%m.%d %H:%M")
-                        except ValueError:
-                            continue
-                        # 旧フォーマットはUTCとして扱う
-
-                    if bar_time < start_utc or bar_time > end_utc:
-                        continue
-                    try:
-                        bars.append(
-                            {
-                                "time": bar_time,
-                                "open": float(row.get("Open") or row.get("open") or 0),
-                                "high": float(row.get("High") or row.get("high") or 0),
-                                "low": float(row.get("Low") or row.get("low") or 0),
-                                "close": float(row.get("Close") or row.get("close") or 0),
-                            }
-                        )
-                    except ValueError:
-                        continue
-        except Exception as exc:
-            errors.append(f"{path} の読み込み失敗: {exc}")
-
-    bars.sort(key=lambda item: item["time"])
-    index_by_time = {bar["time"]: idx for idx, bar in enumerate(bars)}
-    return bars, index_by_time, errors
-
-
-def calc_rolling_stats(bars, period):
-    closes = [bar["close"] for bar in bars]
-    means = [None] * len(closes)
-    stds = [None] * len(closes)
-    if period <= 0:
-        return means, stds
-    sums = [0.0]
-    sums_sq = [0.0]
-    for price in closes:
-        sums.append(sums[-1] + price)
-        sums_sq.append(sums_sq[-1] + price * price)
-    for idx in range(period - 1, len(closes)):
-        total = sums[idx + 1] - sums[idx + 1 - period]
-        mean = total / period
-        total_sq = sums_sq[idx + 1] - sums_sq[idx + 1 - period]
-        var = total_sq / period - mean * mean
-        if var < 0:
-            var = 0.0
-        means[idx] = mean
-        stds[idx] = math.sqrt(var)
-    return means, stds
-
-
-def calc_deviation_percent(bars, means):
-    devs = [None] * len(bars)
-    for idx, mean in enumerate(means):
-        if mean is None or mean == 0:
-            continue
-        close = bars[idx]["close"]
-        devs[idx] = (close - mean) / mean * 100.0
-    return devs
-
-
-def find_limit_entry(
-    bars,
-    start_idx,
-    end_idx,
-    direction,
-    limit_price,
-    spread,
-    limit_expire_min,
-):
-    half = spread / 2.0
-    current_mid = bars[start_idx]["close"]
-    if direction == "BUY":
-        if current_mid <= limit_price:
-            entry_price = current_mid + half
-            return start_idx, current_mid, entry_price
-    else:
-        if current_mid >= limit_price:
-            entry_price = current_mid - half
-            return start_idx, current_mid, entry_price
-    if limit_expire_min is None:
-        last_idx = end_idx
-    else:
-        last_idx = start_idx + limit_expire_min
-        if last_idx > end_idx:
-            last_idx = end_idx
-
-    for idx in range(start_idx + 1, last_idx + 1):
-        bar = bars[idx]
-        if direction == "BUY":
-            if bar["low"] <= limit_price:
-                entry_price = limit_price + half
-                return idx, limit_price, entry_price
-        else:
-            if bar["high"] >= limit_price:
-                entry_price = limit_price - half
-                return idx, limit_price, entry_price
-    return None
-
-
-def simulate_trade(
-    bars,
-    start_idx,
-    end_idx,
-    direction,
-    stop,
-    limit,
-    spread,
-    stop_limit_enabled,
-    time_limit_enabled,
-    time_limit_min,
-    entry_mid=None,
-):
-    half = spread / 2.0
-    if entry_mid is None:
-        entry_mid = bars[start_idx]["close"]
-    time_idx = None
-    if time_limit_enabled and time_limit_min is not None:
-        time_idx = start_idx + time_limit_min
-        if time_idx > end_idx:
-            time_idx = None
-
-    if direction == "BUY":
-        entry_price = entry_mid + half
-        stop_price = entry_price - stop
-        limit_price = entry_price + limit
-        stop_trigger = stop_price + half
-        limit_trigger = limit_price + half
-        for idx in range(start_idx + 1, end_idx + 1):
-            bar = bars[idx]
-            low = bar["low"]
-            high = bar["high"]
-            hit_stop = stop_limit_enabled and stop > 0 and low <= stop_trigger
-            hit_limit = stop_limit_enabled and limit > 0 and high >= limit_trigger
-            if hit_stop and hit_limit:
-                return {
-                    "exit_reason": "stop",
-                    "exit_price": stop_price,
-                    "exit_time": bar["time"],
-                }
-            if hit_stop:
-                return {
-                    "exit_reason": "stop",
-                    "exit_price": stop_price,
-                    "exit_time": bar["time"],
-                }
-            if hit_limit:
-                return {
-                    "exit_reason": "limit",
-                    "exit_price": limit_price,
-                    "exit_time": bar["time"],
-                }
-            if time_idx is not None and idx >= time_idx:
-                exit_mid = bar["close"]
-                return {
-                    "exit_reason": "time",
-                    "exit_price": exit_mid - half,
-                    "exit_time": bar["time"],
-                }
-        exit_mid = bars[end_idx]["close"]
-        return {
-            "exit_reason": "end",
-            "exit_price": exit_mid - half,
-            "exit_time": bars[end_idx]["time"],
-        }
-
-    entry_price = entry_mid - half
-    stop_price = entry_price + stop
-    limit_price = entry_price - limit
-    stop_trigger = stop_price - half
-    limit_trigger = limit_price - half
-    for idx in range(start_idx + 1, end_idx + 1):
-        bar = bars[idx]
-        low = bar["low"]
-        high = bar["high"]
-        hit_stop = stop_limit_enabled and stop > 0 and high >= stop_trigger
-        hit_limit = stop_limit_enabled and limit > 0 and low <= limit_trigger
-        if hit_stop and hit_limit:
-            return {
-                "exit_reason": "stop",
-                "exit_price": stop_price,
-                "exit_time": bar["time"],
-            }
-        if hit_stop:
-            return {
-                "exit_reason": "stop",
-                "exit_price": stop_price,
-                "exit_time": bar["time"],
-            }
-        if hit_limit:
-            return {
-                "exit_reason": "limit",
-                "exit_price": limit_price,
-                "exit_time": bar["time"],
-            }
-        if time_idx is not None and idx >= time_idx:
-            exit_mid = bar["close"]
-            return {
-                "exit_reason": "time",
-                "exit_price": exit_mid + half,
-                "exit_time": bar["time"],
-            }
-    exit_mid = bars[end_idx]["close"]
-    return {
-        "exit_reason": "end",
-        "exit_price": exit_mid + half,
-        "exit_time": bars[end_idx]["time"],
-    }
+class CanvasItemPool:
+    """同じ種類のキャンバス項目を使い回す。描き直しでは作り直さず coords() で動かす"""
+
+    def __init__(self, canvas, name, kind):
+        self.canvas = canvas
+        self.tag = f"layer_{name}"
+        self.create = getattr(canvas, f"create_{kind}")
+        self.items = []
+        self.options = []
+        self.used = 0
+        self.shown = 0
+
+    def place(self, coords, **options):
+        idx = self.used
+        self.used += 1
+        if idx < len(self.items):
+            item = self.items[idx]
+            self.canvas.coords(item, *coords)
+            # 色などは変わったときだけ設定し直す（前回使わなかった項目は表示に戻す）
+            if idx >= self.shown:
+                self.canvas.itemconfigure(item, state="normal", **options)
+            elif options != self.options[idx]:
+                self.canvas.itemconfigure(item, **options)
+            self.options[idx] = options
+            return item
+        item = self.create(*coords, tags=(self.tag,), **options)
+        self.items.append(item)
+        self.options.append(options)
+        return item
+
+    def finish(self):
+        """今回使わなかった項目を隠し、次の描き直しに備える"""
+        for item in self.items[self.used : self.shown]:
+            self.canvas.itemconfigure(item, state="hidden")
+        self.shown = self.used
+        self.used = 0
 
 
 class BacktestApp:
@@ -645,16 +206,22 @@ class BacktestApp:
         self.root.title("USDJPY バックテスト")
         self.root.rowconfigure(0, weight=1)
         self.root.columnconfigure(0, weight=1)
-        self.signals = []
+        self.signals = Signals()
         self.chart_data = None
+        self.chart_pools = None
+        self.chart_redraw_job = None
         self.equity_data = None
         self.zoom_var = tk.DoubleVar(value=1.5)
         self.zoom_text_var = tk.StringVar(value="")
         self.timezone_var = tk.StringVar(value="JST")
+        self.chart_tf_var = tk.StringVar(value=CHART_TF_AUTO)
         self.stop_limit_enabled_var = tk.BooleanVar(value=True)
         self.time_limit_enabled_var = tk.BooleanVar(value=True)
         self.allow_same_dir_var = tk.BooleanVar(value=True)
         self.allow_opp_dir_var = tk.BooleanVar(value=True)
+        self.position_max_var = tk.StringVar(value="0")
+        self.position_dir_max_var = tk.StringVar(value="0")
+        self.netting_var = tk.BooleanVar(value=False)
         self.time_limit_var = tk.StringVar(value="30")
         self.filter_boast_var = tk.BooleanVar(value=False)
         self.filter_fear_var = tk.BooleanVar(value=False)
@@ -677,8 +244,8 @@ class BacktestApp:
         self.filter_ma_dev_var = tk.BooleanVar(value=False)
         self.ma_period_var = tk.StringVar(value="20")
         self.ma_dev_var = tk.StringVar(value="0.5")
-        self.indicator_cache = {}
-        self.indicator_cache_bars_id = None
+        self.indicator_tf_var = tk.StringVar(value="M1")
+        self.chart_tf_cache = {}
 
         self.start_var = tk.StringVar()
         self.end_var = tk.StringVar()
@@ -749,6 +316,16 @@ class BacktestApp:
         ttk.Checkbutton(exit_opts, text="逆方向の同時保有", variable=self.allow_opp_dir_var).grid(
             row=1, column=1, sticky="w", padx=(12, 0), pady=(4, 0)
         )
+        ttk.Checkbutton(exit_opts, text="逆方向は相殺", variable=self.netting_var).grid(
+            row=1, column=2, columnspan=2, sticky="w", padx=(12, 0), pady=(4, 0)
+        )
+        position_opts = ttk.Frame(exit_opts)
+        position_opts.grid(row=2, column=0, columnspan=4, sticky="w", pady=(4, 0))
+        ttk.Label(position_opts, text="同時保有の上限").grid(row=0, column=0, sticky="w")
+        ttk.Entry(position_opts, textvariable=self.position_max_var, width=6).grid(row=0, column=1, padx=(6, 12))
+        ttk.Label(position_opts, text="方向ごとの上限").grid(row=0, column=2, sticky="w")
+        ttk.Entry(position_opts, textvariable=self.position_dir_max_var, width=6).grid(row=0, column=3, padx=(6, 2))
+        ttk.Label(position_opts, text="（0は無制限）").grid(row=0, column=4, sticky="w")
 
         limit_opts = ttk.Frame(params)
         limit_opts.grid(row=5, column=0, columnspan=6, sticky="w", pady=(4, 0))
@@ -824,6 +401,18 @@ class BacktestApp:
         ttk.Label(indicator_opts, text="買いはマイナス以下 / 売りはプラス以上").grid(
             row=1, column=6, sticky="w", padx=(8, 0)
         )
+        ttk.Label(indicator_opts, text="").grid(row=2, column=0, sticky="w")
+        ttk.Label(indicator_opts, text="時間足").grid(row=2, column=1, sticky="w", padx=(8, 0))
+        ttk.Combobox(
+            indicator_opts,
+            textvariable=self.indicator_tf_var,
+            values=list(TIMEFRAMES),
+            state="readonly",
+            width=5,
+        ).grid(row=2, column=2, columnspan=2, sticky="w", padx=(8, 0))
+        ttk.Label(indicator_opts, text="1分足以外はサイン時点で確定している足の値を使う").grid(
+            row=2, column=4, columnspan=3, sticky="w", padx=(8, 0)
+        )
 
         params.columnconfigure(4, weight=1)
 
@@ -859,6 +448,16 @@ class BacktestApp:
             value="UTC",
             command=self.on_timezone_change,
         ).grid(row=0, column=7, sticky="w")
+        ttk.Label(chart_ctrl, text="表示足").grid(row=0, column=8, sticky="w", padx=(12, 4))
+        chart_tf_box = ttk.Combobox(
+            chart_ctrl,
+            textvariable=self.chart_tf_var,
+            values=[CHART_TF_AUTO] + list(TIMEFRAMES),
+            state="readonly",
+            width=5,
+        )
+        chart_tf_box.grid(row=0, column=9, sticky="w")
+        chart_tf_box.bind("<<ComboboxSelected>>", self.on_chart_tf_change)
         chart_ctrl.columnconfigure(1, weight=1)
 
         self.chart_frame = ttk.Frame(chart_view)
@@ -902,6 +501,8 @@ class BacktestApp:
         self.trade_count_var = tk.StringVar(value="-")
         self.win_rate_var = tk.StringVar(value="-")
         self.pf_var = tk.StringVar(value="-")
+        self.mc_var = tk.StringVar(value="-")
+        self.last_results = []
 
         ttk.Label(stats, text="総損益(pips)").grid(row=0, column=0, sticky="w")
         ttk.Label(stats, textvariable=self.total_pips_var).grid(row=0, column=1, sticky="w", padx=(8, 20))
@@ -938,6 +539,14 @@ class BacktestApp:
                 row=row, column=col + 2, sticky="w", padx=(2, 8), pady=2
             )
 
+        mc_frame = ttk.LabelFrame(stats, text="信頼区間（取引結果の引き直し）")
+        mc_frame.grid(row=6, column=0, columnspan=2, sticky="ew", pady=(8, 0))
+        self.mc_btn = ttk.Button(mc_frame, text="計算", command=self.run_monte_carlo)
+        self.mc_btn.grid(row=0, column=0, sticky="nw", padx=6, pady=4)
+        ttk.Label(mc_frame, textvariable=self.mc_var, justify="left").grid(
+            row=0, column=1, sticky="w", padx=(8, 6), pady=4
+        )
+
         self.equity_chart = tk.Canvas(
             self.tab_pnl,
             background=CHART_BG,
@@ -967,6 +576,8 @@ class BacktestApp:
         self.trade_count_var.set("-")
         self.win_rate_var.set("-")
         self.pf_var.set("-")
+        self.mc_var.set("-")
+        self.last_results = []
         for var in self.reason_pnl_vars.values():
             var.set("-")
         for var in self.reason_count_vars.values():
@@ -1004,54 +615,7 @@ class BacktestApp:
         selected = self.selected_tag_keys()
         if not selected:
             return signals, None
-        filtered = []
-        for item in signals:
-            tags = item.get("tags") or {}
-            if any(tags.get(key) for key in selected):
-                filtered.append(item)
-        return filtered, selected
-
-    def filter_signals_by_bollinger(self, signals, bars, index_by_time, means, stds, sigma):
-        filtered = []
-        for item in signals:
-            idx = index_by_time.get(item["time_utc"])
-            if idx is None:
-                filtered.append(item)
-                continue
-            mean = means[idx]
-            std = stds[idx]
-            if mean is None or std is None:
-                continue
-            upper = mean + sigma * std
-            lower = mean - sigma * std
-            bar = bars[idx]
-            if item["action"] == "BUY":
-                if bar["low"] <= lower:
-                    filtered.append(item)
-            else:
-                if bar["high"] >= upper:
-                    filtered.append(item)
-        return filtered
-
-    def filter_signals_by_ma_dev(self, signals, index_by_time, devs, threshold):
-        if threshold <= 0:
-            return list(signals)
-        filtered = []
-        for item in signals:
-            idx = index_by_time.get(item["time_utc"])
-            if idx is None:
-                filtered.append(item)
-                continue
-            dev = devs[idx]
-            if dev is None:
-                continue
-            if item["action"] == "BUY":
-                if dev <= -threshold:
-                    filtered.append(item)
-            else:
-                if dev >= threshold:
-                    filtered.append(item)
-        return filtered
+        return filter_signals_by_tags(signals, selected), selected
 
     def display_time(self, dt):
         if self.timezone_var.get() == "JST":
@@ -1059,9 +623,7 @@ class BacktestApp:
         return dt
 
     def on_timezone_change(self):
-        if self.chart_data:
-            bars, results = self.chart_data
-            self.draw_chart(bars, results)
+        self.redraw_chart()
         if self.equity_data is not None:
             self.draw_equity_chart(self.equity_data)
 
@@ -1071,8 +633,8 @@ class BacktestApp:
             for item in errors:
                 self.log(item)
         if self.signals:
-            min_jst = min(item["time_jst"] for item in self.signals)
-            max_jst = max(item["time_jst"] for item in self.signals)
+            min_jst = self.signals.time_jst(0)
+            max_jst = self.signals.time_jst(len(self.signals) - 1)
             self.info_var.set(f"サイン件数: {len(self.signals)} 期間: {format_dt(min_jst)} ～ {format_dt(max_jst)}")
             if not self.start_var.get().strip():
                 self.start_var.set(format_dt(min_jst))
@@ -1085,6 +647,39 @@ class BacktestApp:
         base = parse_date_for_calendar(target_var.get())
         CalendarDialog(self.root, target_var, base)
 
+    def on_chart_tf_change(self, _event=None):
+        self.redraw_chart()
+
+    def schedule_chart_redraw(self):
+        """続けて来るスクロール・拡大縮小の描き直しを、CHART_REDRAW_MS ごとの1回にまとめる"""
+        if self.chart_redraw_job is None and self.chart_data:
+            self.chart_redraw_job = self.root.after(CHART_REDRAW_MS, self.redraw_chart)
+
+    def redraw_chart(self):
+        if self.chart_redraw_job is not None:
+            self.root.after_cancel(self.chart_redraw_job)
+            self.chart_redraw_job = None
+        if self.chart_data:
+            bars, results = self.chart_data
+            self.draw_chart(bars, results)
+
+    def select_chart_bars(self, bars):
+        """表示する時間足とその足を返す。自動なら MAX_DRAW_BARS 本に収まる最も細かい足"""
+        choice = self.chart_tf_var.get()
+        names = [choice] if choice in TIMEFRAMES else list(TIMEFRAMES)
+        for name in names:
+            is_last = name == names[-1]
+            # 1本に入る1分足は多くても足の分数までなので、明らかに多すぎる足はまとめずに飛ばす
+            if not is_last and len(bars) > MAX_DRAW_BARS * TIMEFRAMES[name]:
+                continue
+            key = (bars.version, name)
+            chart_bars = self.chart_tf_cache.get(key)
+            if chart_bars is None:
+                chart_bars = resample_bars(bars, name)
+                self.chart_tf_cache[key] = chart_bars
+            if is_last or len(chart_bars) <= MAX_DRAW_BARS:
+                return name, chart_bars
+
     def update_zoom_label(self):
         percent = int(self.zoom_var.get() * 100)
         self.zoom_text_var.set(f"表示倍率: {percent}%")
@@ -1098,9 +693,7 @@ class BacktestApp:
         if abs(current - value) > 1e-6:
             self.zoom_var.set(value)
         self.update_zoom_label()
-        if self.chart_data:
-            bars, results = self.chart_data
-            self.draw_chart(bars, results)
+        self.schedule_chart_redraw()
 
     def on_zoom_change(self, _value):
         self.set_zoom(float(self.zoom_var.get()))
@@ -1118,9 +711,7 @@ class BacktestApp:
         if event.state & 0x0001:
             delta = -1 if event.delta > 0 else 1
             self.chart.xview_scroll(delta, "units")
-            if self.chart_data:
-                bars, results = self.chart_data
-                self.draw_chart(bars, results)
+            self.schedule_chart_redraw()
             return
         delta = -1 if event.delta > 0 else 1
         self.chart.yview_scroll(delta, "units")
@@ -1131,15 +722,11 @@ class BacktestApp:
 
     def on_chart_drag_move(self, event):
         self.chart.scan_dragto(event.x, self.drag_start_y, gain=1)
-        if self.chart_data:
-            bars, results = self.chart_data
-            self.draw_chart(bars, results)
+        self.schedule_chart_redraw()
 
     def on_xscroll(self, *args):
         self.chart.xview(*args)
-        if self.chart_data:
-            bars, results = self.chart_data
-            self.draw_chart(bars, results)
+        self.schedule_chart_redraw()
 
     def on_yscroll(self, *args):
         self.chart.yview(*args)
@@ -1148,6 +735,7 @@ class BacktestApp:
         self.chart.delete("all")
         self.chart.configure(scrollregion=(0, 0, 0, 0))
         self.chart_data = None
+        self.chart_pools = None
 
     def clear_equity_chart(self):
         self.equity_chart.delete("all")
@@ -1158,9 +746,7 @@ class BacktestApp:
             self.draw_equity_chart(self.equity_data)
 
     def on_canvas_resize(self, event):
-        if self.chart_data:
-            bars, results = self.chart_data
-            self.draw_chart(bars, results)
+        self.schedule_chart_redraw()
 
     def draw_arrow(self, x, y, direction, color):
         size = 6
@@ -1168,16 +754,24 @@ class BacktestApp:
             points = (x, y - size, x - size, y + size, x + size, y + size)
         else:
             points = (x, y + size, x - size, y - size, x + size, y - size)
-        self.chart.create_polygon(points, fill=color, outline=color)
+        self.chart_pools["arrow"].place(points, fill=color, outline=color)
 
     def draw_chart(self, bars, results):
         xview = self.chart.xview()
         yview = self.chart.yview()
-        self.chart.delete("all")
         if not bars:
+            self.chart.delete("all")
             self.chart_data = None
+            self.chart_pools = None
             return
         self.chart_data = (bars, results)
+        if self.chart_pools is None:
+            self.chart_pools = {name: CanvasItemPool(self.chart, name, kind) for name, kind in CHART_LAYERS}
+        pools = self.chart_pools
+        if any(key[0] != bars.version for key in self.chart_tf_cache):
+            self.chart_tf_cache = {}
+        # 以降は表示する時間足の足で描く
+        timeframe, bars = self.select_chart_bars(bars)
 
         show_bb = bool(self.filter_bb_var.get())
         show_ma = bool(self.filter_ma_dev_var.get())
@@ -1216,8 +810,6 @@ class BacktestApp:
         count = len(bars)
         zoom = float(self.zoom_var.get())
         bar_step = CHART_MIN_BAR_STEP * zoom
-        if bar_step < 1:
-            bar_step = 1
         if bar_step > CHART_MAX_BAR_STEP:
             bar_step = CHART_MAX_BAR_STEP
         base_w = left + right + max(1, (count - 1)) * bar_step
@@ -1233,7 +825,6 @@ class BacktestApp:
             view_left = 0
             view_right = width
 
-        visible_bars = bars
         start_idx = 0
         end_idx = count - 1
         if count > 1 and bar_step > 0:
@@ -1246,10 +837,9 @@ class BacktestApp:
             if end_idx < start_idx:
                 start_idx = 0
                 end_idx = count - 1
-            visible_bars = bars[start_idx : end_idx + 1]
 
-        min_p = min(bar["low"] for bar in visible_bars)
-        max_p = max(bar["high"] for bar in visible_bars)
+        min_p = min(bars.lows[start_idx : end_idx + 1])
+        max_p = max(bars.highs[start_idx : end_idx + 1])
         if max_p == min_p:
             max_p += PIP_SIZE
             min_p -= PIP_SIZE
@@ -1258,16 +848,10 @@ class BacktestApp:
         bb_stds = None
         ma_means = None
         if show_bb or show_ma:
-            if self.indicator_cache_bars_id != id(bars):
-                self.indicator_cache = {}
-                self.indicator_cache_bars_id = id(bars)
 
             def get_stats(period):
-                stats = self.indicator_cache.get(period)
-                if stats is None:
-                    stats = calc_rolling_stats(bars, period)
-                    self.indicator_cache[period] = stats
-                return stats
+                # 絞り込みと同じキャッシュを使うので、同じ足・期間なら計算し直さない
+                return shared_cache.get(bars, timeframe, "mean_std", period)
 
             if show_bb:
                 bb_means, bb_stds = get_stats(bb_period)
@@ -1324,58 +908,78 @@ class BacktestApp:
         for i in range(ticks):
             price = min_p + (max_p - min_p) * i / (ticks - 1)
             y = price_to_y(price)
-            self.chart.create_line(grid_left, y, grid_right, y, fill=CHART_GRID)
-            self.chart.create_text(axis_x, y, text=format_price(price), anchor="e", fill=CHART_TEXT)
-        self.chart.create_line(grid_right, top, grid_right, top + plot_h, fill=CHART_AXIS)
+            pools["grid"].place((grid_left, y, grid_right, y), fill=CHART_GRID)
+            pools["axis"].place((axis_x, y), text=format_price(price), anchor="e", fill=CHART_TEXT)
+        pools["grid"].place((grid_right, top, grid_right, top + plot_h), fill=CHART_AXIS)
 
-        show_date = self.display_time(bars[0]["time"]).date() != self.display_time(bars[-1]["time"]).date()
+        show_date = self.display_time(bars.time_at(0)).date() != self.display_time(bars.time_at(count - 1)).date()
         visible_count = end_idx - start_idx + 1
         time_ticks = min(6, visible_count) if visible_count > 1 else 1
         for i in range(time_ticks):
             idx = start_idx if time_ticks == 1 else int(start_idx + (visible_count - 1) * i / (time_ticks - 1))
             x = index_to_x(idx)
-            bar_time = self.display_time(bars[idx]["time"])
+            bar_time = self.display_time(bars.time_at(idx))
             label = format_axis_time(bar_time, show_date)
-            self.chart.create_line(x, top, x, top + plot_h, fill=CHART_GRID)
-            self.chart.create_text(x, top + plot_h + 8, text=label, anchor="n", fill=CHART_TEXT)
-
-        body_w = max(1, bar_step * 0.6)
-        if body_w > 12:
-            body_w = 12
-        for idx in range(start_idx, end_idx + 1):
-            bar = bars[idx]
-            x = index_to_x(idx)
-            y_high = price_to_y(bar["high"])
-            y_low = price_to_y(bar["low"])
-            y_open = price_to_y(bar["open"])
-            y_close = price_to_y(bar["close"])
-            color = CHART_UP if bar["close"] >= bar["open"] else CHART_DOWN
-            self.chart.create_line(x, y_high, x, y_low, fill=color)
-            y_top = min(y_open, y_close)
-            y_bot = max(y_open, y_close)
-            if y_bot - y_top < 1:
-                y_bot = y_top + 1
-            self.chart.create_rectangle(
-                x - body_w / 2,
-                y_top,
-                x + body_w / 2,
-                y_bot,
-                fill=color,
-                outline=color,
-            )
-
-        def draw_series(value_for_index, color, width=1, dash=None):
-            last = None
+            pools["grid"].place((x, top, x, top + plot_h), fill=CHART_GRID)
+            pools["axis"].place((x, top + plot_h + 8), text=label, anchor="n", fill=CHART_TEXT)
+
+        opens = bars.opens
+        highs = bars.highs
+        lows = bars.lows
+        closes = bars.closes
+        if bar_step < CHART_LOD_STEP:
+            # 細かすぎる足は画面の1列ごとにまとめ、その列の高値〜安値を1本の線で描く
+            idx = start_idx
+            while idx <= end_idx:
+                column = int(index_to_x(idx))
+                col_open = opens[idx]
+                col_high = highs[idx]
+                col_low = lows[idx]
+                idx += 1
+                while idx <= end_idx and int(index_to_x(idx)) == column:
+                    if highs[idx] > col_high:
+                        col_high = highs[idx]
+                    if lows[idx] < col_low:
+                        col_low = lows[idx]
+                    idx += 1
+                y_high = price_to_y(col_high)
+                y_low = max(price_to_y(col_low), y_high + 1)
+                color = CHART_UP if closes[idx - 1] >= col_open else CHART_DOWN
+                pools["wick"].place((column, y_high, column, y_low), fill=color)
+        else:
+            body_w = max(1, bar_step * 0.6)
+            if body_w > 12:
+                body_w = 12
             for idx in range(start_idx, end_idx + 1):
-                value = value_for_index(idx)
-                if value is None:
-                    last = None
-                    continue
                 x = index_to_x(idx)
-                y = price_to_y(value)
-                if last is not None:
-                    self.chart.create_line(last[0], last[1], x, y, fill=color, width=width, dash=dash)
-                last = (x, y)
+                y_high = price_to_y(highs[idx])
+                y_low = price_to_y(lows[idx])
+                y_open = price_to_y(opens[idx])
+                y_close = price_to_y(closes[idx])
+                color = CHART_UP if closes[idx] >= opens[idx] else CHART_DOWN
+                pools["wick"].place((x, y_high, x, y_low), fill=color)
+                y_top = min(y_open, y_close)
+                y_bot = max(y_open, y_close)
+                if y_bot - y_top < 1:
+                    y_bot = y_top + 1
+                pools["body"].place(
+                    (x - body_w / 2, y_top, x + body_w / 2, y_bot),
+                    fill=color,
+                    outline=color,
+                )
+
+        def draw_series(value_for_index, color, width=1, dash=""):
+            # 途切れるまでの点を1本の折れ線にする
+            points = []
+            for idx in range(start_idx, end_idx + 2):
+                value = value_for_index(idx) if idx <= end_idx else None
+                if value is not None:
+                    points.append(index_to_x(idx))
+                    points.append(price_to_y(value))
+                    continue
+                if len(points) >= 4:
+                    pools["series"].place(points, fill=color, width=width, dash=dash)
+                points = []
 
         if show_bb and bb_means and bb_stds:
             draw_series(lambda idx: bb_means[idx], CHART_BB_CENTER)
@@ -1401,48 +1005,38 @@ class BacktestApp:
         if show_ma and ma_means and (not show_bb or ma_period != bb_period):
             draw_series(lambda idx: ma_means[idx], CHART_MA, width=2)
 
-        index_by_time = {bar["time"]: idx for idx, bar in enumerate(bars)}
-        for item in results:
-            entry_idx = index_by_time.get(item["entry_time"])
-            exit_idx = index_by_time.get(item["exit_time"])
-            if entry_idx is not None and exit_idx is not None:
-                x1 = index_to_x(entry_idx)
-                y1 = price_to_y(item["entry_price"])
-                x2 = index_to_x(exit_idx)
-                y2 = price_to_y(item["exit_price"])
-                line_color = CHART_UP if item["action"] == "BUY" else CHART_DOWN
-                self.chart.create_line(x1, y1, x2, y2, fill=line_color, dash=(4, 4))
-
+        # 表示範囲にかかる取引だけ描く
         for item in results:
+            entry_idx = bars.index_of(item["entry_time"])
+            exit_idx = bars.index_of(item["exit_time"])
+            if entry_idx is None or exit_idx is None or exit_idx < start_idx or entry_idx > end_idx:
+                continue
+            x1 = index_to_x(entry_idx)
+            y1 = price_to_y(item["entry_price"])
+            x2 = index_to_x(exit_idx)
+            y2 = price_to_y(item["exit_price"])
             color = CHART_UP if item["action"] == "BUY" else CHART_DOWN
-            entry_idx = index_by_time.get(item["entry_time"])
-            if entry_idx is not None:
-                x = index_to_x(entry_idx)
-                y = price_to_y(item["entry_price"])
-                direction = "up" if item["action"] == "BUY" else "down"
-                self.draw_arrow(x, y, direction, color)
-            exit_idx = index_by_time.get(item["exit_time"])
-            if exit_idx is not None:
-                x = index_to_x(exit_idx)
-                y = price_to_y(item["exit_price"])
-                direction = "down" if item["action"] == "BUY" else "up"
-                self.draw_arrow(x, y, direction, color)
-
-        self.chart.create_text(
-            grid_left,
-            4,
+            pools["trade"].place((x1, y1, x2, y2), fill=color, dash=(4, 4))
+            self.draw_arrow(x1, y1, "up" if item["action"] == "BUY" else "down", color)
+            self.draw_arrow(x2, y2, "down" if item["action"] == "BUY" else "up", color)
+
+        pools["label"].place(
+            (grid_left, 4),
             text="買い=上矢印 / 売り=下矢印 / クローズ=逆矢印",
             anchor="nw",
             fill=CHART_TEXT,
         )
         tz_label = "JST" if self.timezone_var.get() == "JST" else "UTC"
-        self.chart.create_text(
-            grid_left,
-            18,
-            text=f"時刻: {tz_label}",
+        pools["label"].place(
+            (grid_left, 18),
+            text=f"時刻: {tz_label} / 足: {timeframe}",
             anchor="nw",
             fill=CHART_TEXT,
         )
+        for name, _kind in CHART_LAYERS:
+            pools[name].finish()
+            # 後から増えた項目も描く順を保つ
+            self.chart.tag_raise(pools[name].tag)
         self.chart.xview_moveto(xview[0])
         self.chart.yview_moveto(yview[0])
 
@@ -1550,7 +1144,9 @@ class BacktestApp:
         )
 
     def update_stats(self, results):
-        total = len(results)
+        self.last_results = list(results)
+        stats = calc_stats(results)
+        total = stats["trades"]
         self.trade_count_var.set(str(total))
         if total == 0:
             self.total_pips_var.set("0.00")
@@ -1559,36 +1155,40 @@ class BacktestApp:
             self.pf_var.set("計算不可")
             return
 
-        pips_list = [r["pnl"] / PIP_SIZE for r in results]
-        total_pips = sum(pips_list)
-        wins = sum(1 for p in pips_list if p > 0)
-        losses = sum(1 for p in pips_list if p < 0)
-        win_rate = wins / total * 100
-        win_text = f"{win_rate:.2f}% {wins}/{total}"
-
-        profit_sum = sum(p for p in pips_list if p > 0)
-        loss_sum = sum(p for p in pips_list if p < 0)
-        if loss_sum == 0:
+        win_text = f"{stats['win_rate']:.2f}% {stats['wins']}/{total}"
+        if stats["pf"] is None:
             pf_text = "計算不可"
         else:
-            pf_text = f"{profit_sum / abs(loss_sum):.3f}"
+            pf_text = f"{stats['pf']:.3f}"
 
-        equity = 0.0
-        max_dd = 0.0
-        peak = 0.0
-        for p in pips_list:
-            equity += p
-            if equity > peak:
-                peak = equity
-            dd = peak - equity
-            if dd > max_dd:
-                max_dd = dd
-
-        self.total_pips_var.set(format_pips(total_pips))
-        self.max_dd_var.set(format_pips(max_dd))
+        self.total_pips_var.set(format_pips(stats["total_pips"]))
+        self.max_dd_var.set(format_pips(stats["max_dd"]))
         self.win_rate_var.set(win_text)
         self.pf_var.set(pf_text)
 
+    def run_monte_carlo(self):
+        if not self.last_results:
+            self.mc_var.set("取引がありません")
+            return
+        results = self.last_results
+        self.mc_btn.configure(state="disabled")
+        self.mc_var.set("計算中...")
+
+        def worker():
+            try:
+                text = format_report(run_monte_carlo(results))
+            except Exception as exc:
+                text = f"計算に失敗しました: {exc}"
+            self.root.after(0, lambda: self.finish_monte_carlo(results, text))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def finish_monte_carlo(self, results, text):
+        # 計算中に実行し直した場合は古い結果を出さない
+        if results is self.last_results:
+            self.mc_var.set(text)
+        self.mc_btn.configure(state="normal")
+
     def update_reason_pnls(self, results):
         sums = {key: 0.0 for key, _label in REASON_ITEMS}
         counts = {key: 0 for key, _label in REASON_ITEMS}
@@ -1614,128 +1214,46 @@ class BacktestApp:
             return
 
         try:
-            start_jst = parse_datetime_text(self.start_var.get(), is_end=False)
-            end_jst = parse_datetime_text(self.end_var.get(), is_end=True)
-        except ValueError:
-            messagebox.showerror("エラー", "開始と終了は日時で入力してください")
-            return
-        if start_jst > end_jst:
-            messagebox.showerror("エラー", "開始が終了より後です")
-            return
-        stop_limit_enabled = bool(self.stop_limit_enabled_var.get())
-        time_limit_enabled = bool(self.time_limit_enabled_var.get())
-
-        try:
-            spread_pips = float(self.spread_var.get().strip())
-        except ValueError:
-            messagebox.showerror("エラー", "スプレッドの値が数値ではありません")
-            return
-        if spread_pips < 0:
-            messagebox.showerror("エラー", "スプレッドの値は0以上で入力してください")
-            return
-
-        stop_pips = 0.0
-        limit_pips = 0.0
-        if stop_limit_enabled:
-            try:
-                stop_pips = float(self.stop_var.get().strip())
-                limit_pips = float(self.limit_var.get().strip())
-            except ValueError:
-                messagebox.showerror("エラー", "ストップ/リミットの値が数値ではありません")
-                return
-            if stop_pips < 0 or limit_pips < 0:
-                messagebox.showerror("エラー", "ストップ/リミットは0以上で入力してください")
-                return
-
-        time_limit_min = None
-        if time_limit_enabled:
-            try:
-                time_limit_min = int(self.time_limit_var.get().strip())
-            except ValueError:
-                messagebox.showerror("エラー", "時間クローズは分で入力してください")
-                return
-            if time_limit_min < 1:
-                messagebox.showerror("エラー", "時間クローズは1以上で入力してください")
-                return
-        allow_same_dir = bool(self.allow_same_dir_var.get())
-        allow_opp_dir = bool(self.allow_opp_dir_var.get())
-
-        try:
-            limit_offset_pips = float(self.limit_offset_var.get().strip())
-        except ValueError:
-            messagebox.showerror("エラー", "指値位置の値が数値ではありません")
-            return
-        if limit_offset_pips < 0:
-            messagebox.showerror("エラー", "指値位置は0以上で入力してください")
-            return
-        try:
-            limit_expire_min = int(self.limit_expire_var.get().strip())
-        except ValueError:
-            messagebox.showerror("エラー", "指値の有効は分で入力してください")
-            return
-        if limit_expire_min < 1:
-            messagebox.showerror("エラー", "指値の有効は1以上で入力してください")
+            start_jst, end_jst = parse_period(self.start_var.get(), self.end_var.get())
+            params = build_params(
+                {
+                    "stop_limit_enabled": self.stop_limit_enabled_var.get(),
+                    "stop_pips": self.stop_var.get(),
+                    "limit_pips": self.limit_var.get(),
+                    "spread_pips": self.spread_var.get(),
+                    "time_limit_enabled": self.time_limit_enabled_var.get(),
+                    "time_limit_min": self.time_limit_var.get(),
+                    "allow_same_dir": self.allow_same_dir_var.get(),
+                    "allow_opp_dir": self.allow_opp_dir_var.get(),
+                    "max_positions": self.position_max_var.get(),
+                    "max_per_direction": self.position_dir_max_var.get(),
+                    "netting": self.netting_var.get(),
+                    "limit_offset_pips": self.limit_offset_var.get(),
+                    "limit_expire_min": self.limit_expire_var.get(),
+                    "bb_enabled": self.filter_bb_var.get(),
+                    "bb_period": self.bb_period_var.get(),
+                    "bb_sigma": self.bb_sigma_var.get(),
+                    "ma_dev_enabled": self.filter_ma_dev_var.get(),
+                    "ma_period": self.ma_period_var.get(),
+                    "ma_threshold": self.ma_dev_var.get(),
+                    "indicator_tf": self.indicator_tf_var.get(),
+                }
+            )
+        except ValueError as exc:
+            messagebox.showerror("エラー", str(exc))
             return
 
-        bb_enabled = bool(self.filter_bb_var.get())
-        ma_dev_enabled = bool(self.filter_ma_dev_var.get())
-        bb_period = None
-        bb_sigma = None
-        ma_period = None
-        ma_threshold = None
-        if bb_enabled:
-            try:
-                bb_period = int(self.bb_period_var.get().strip())
-            except ValueError:
-                messagebox.showerror("エラー", "ボリンジャーバンドの期間は数値で入力してください")
-                return
-            if bb_period < 2:
-                messagebox.showerror("エラー", "ボリンジャーバンドの期間は2以上で入力してください")
-                return
-            try:
-                bb_sigma = float(self.bb_sigma_var.get().strip())
-            except ValueError:
-                messagebox.showerror("エラー", "ボリンジャーバンドのシグマは数値で入力してください")
-                return
-            if bb_sigma <= 0:
-                messagebox.showerror("エラー", "ボリンジャーバンドのシグマは0より大きくしてください")
-                return
-        if ma_dev_enabled:
-            try:
-                ma_period = int(self.ma_period_var.get().strip())
-            except ValueError:
-                messagebox.showerror("エラー", "移動平均乖離率の期間は数値で入力してください")
-                return
-            if ma_period < 2:
-                messagebox.showerror("エラー", "移動平均乖離率の期間は2以上で入力してください")
-                return
-            try:
-                ma_threshold = float(self.ma_dev_var.get().strip())
-            except ValueError:
-                messagebox.showerror("エラー", "移動平均乖離率のしきい値は数値で入力してください")
-                return
-            if ma_threshold < 0:
-                messagebox.showerror("エラー", "移動平均乖離率のしきい値は0以上で入力してください")
-                return
-
-        stop = stop_pips * PIP_SIZE
-        limit = limit_pips * PIP_SIZE
-        spread = spread_pips * PIP_SIZE
-        limit_offset = limit_offset_pips * PIP_SIZE
-
         start_utc = start_jst - JST_OFFSET
         end_utc = end_jst - JST_OFFSET
 
-        bars, index_by_time, bar_errors = load_ohlc_range(DATA_DIR, start_utc, end_utc)
+        bars, time_index, bar_errors = load_ohlc_range(DATA_DIR, start_utc, end_utc)
         for item in bar_errors:
             self.log(item)
         if not bars:
             self.log("足データが読み込めません")
             return
 
-        period_signals = [
-            item for item in self.signals if start_utc <= item["time_utc"] <= end_utc
-        ]
+        period_signals = self.signals.between(start_utc, end_utc)
         self.log(f"サイン総数: {len(self.signals)}")
         self.log(f"期間内サイン: {len(period_signals)}")
 
@@ -1744,33 +1262,16 @@ class BacktestApp:
             labels = [REASON_LABELS.get(key, key) for key in selected_tags]
             self.log(f"理由絞り込み: {' / '.join(labels)} -> {len(period_signals)}")
 
-        if bb_enabled or ma_dev_enabled:
-            stats_cache = {}
-
-            def get_stats(period):
-                stats = stats_cache.get(period)
-                if stats is None:
-                    stats = calc_rolling_stats(bars, period)
-                    stats_cache[period] = stats
-                return stats
-
-            if bb_enabled:
-                bb_means, bb_stds = get_stats(bb_period)
-                period_signals = self.filter_signals_by_bollinger(
-                    period_signals, bars, index_by_time, bb_means, bb_stds, bb_sigma
-                )
-                self.log(
-                    f"ボリンジャーバンド絞り込み: 期間{bb_period} シグマ{bb_sigma} -> {len(period_signals)}"
-                )
-            if ma_dev_enabled:
-                ma_means, _ma_stds = get_stats(ma_period)
-                ma_devs = calc_deviation_percent(bars, ma_means)
-                period_signals = self.filter_signals_by_ma_dev(
-                    period_signals, index_by_time, ma_devs, ma_threshold
-                )
-                self.log(
-                    f"移動平均乖離率絞り込み: 期間{ma_period} しきい値{ma_threshold}% -> {len(period_signals)}"
-                )
+        indicator_bars, bar_errors = load_indicator_bars(
+            DATA_DIR, start_utc, end_utc, params["indicator_tf"], indicator_lookback(params)
+        )
+        for item in bar_errors:
+            self.log(item)
+        period_signals, filter_messages = apply_indicator_filters(
+            bars, time_index, period_signals, params, indicator_bars=indicator_bars
+        )
+        for message in filter_messages:
+            self.log(message)
 
         if not period_signals:
             self.draw_chart(bars, [])
@@ -1780,113 +1281,15 @@ class BacktestApp:
             self.log("期間内のサインがありません")
             return
 
-        end_idx = len(bars) - 1
-        results = []
-        missing = 0
-        limit_missing = 0
-        limit_cancelled = 0
-        skip_same = 0
-        skip_opp = 0
-        candidates = []
-
-        for order, signal in enumerate(period_signals):
-            idx = index_by_time.get(signal["time_utc"])
-            if idx is None:
-                missing += 1
-                continue
-            direction = signal["action"]
-            entry_type = signal.get("entry_type") or "INSTANT"
-            tags = dict(signal.get("tags") or {})
-            entry_idx = idx
-            entry_mid = None
-            entry_price = None
-            if entry_type == "LIMIT":
-                base_price = signal.get("entry_price")
-                if base_price is None:
-                    limit_missing += 1
-                    continue
-                use_plan_offset = bool(tags.get("entry_plan") or tags.get("tp_plan"))
-                if direction == "BUY":
-                    limit_price = base_price + limit_offset if use_plan_offset else base_price - limit_offset
-                else:
-                    limit_price = base_price - limit_offset if use_plan_offset else base_price + limit_offset
-                found = find_limit_entry(
-                    bars,
-                    idx,
-                    end_idx,
-                    direction,
-                    limit_price,
-                    spread,
-                    limit_expire_min,
-                )
-                if not found:
-                    limit_cancelled += 1
-                    continue
-                entry_idx, entry_mid, entry_price = found
-            else:
-                entry_mid = bars[entry_idx]["close"]
-                half = spread / 2.0
-                entry_price = entry_mid + half if direction == "BUY" else entry_mid - half
-
-            candidates.append(
-                {
-                    "order": order,
-                    "direction": direction,
-                    "entry_idx": entry_idx,
-                    "entry_time": bars[entry_idx]["time"],
-                    "entry_mid": entry_mid,
-                    "entry_price": entry_price,
-                    "tags": tags,
-                }
-            )
-
-        candidates.sort(key=lambda item: (item["entry_time"], item["order"]))
-        open_positions = []
-        for item in candidates:
-            entry_time = item["entry_time"]
-            if open_positions:
-                open_positions = [pos for pos in open_positions if pos["exit_time"] > entry_time]
-            has_same = any(pos["direction"] == item["direction"] for pos in open_positions)
-            has_opp = any(pos["direction"] != item["direction"] for pos in open_positions)
-            if (not allow_same_dir and has_same) or (not allow_opp_dir and has_opp):
-                if not allow_same_dir and has_same:
-                    skip_same += 1
-                elif not allow_opp_dir and has_opp:
-                    skip_opp += 1
-                continue
-
-            trade = simulate_trade(
-                bars,
-                item["entry_idx"],
-                end_idx,
-                item["direction"],
-                stop,
-                limit,
-                spread,
-                stop_limit_enabled,
-                time_limit_enabled,
-                time_limit_min,
-                entry_mid=item["entry_mid"],
-            )
-            entry_price = item["entry_price"]
-            pnl = (
-                trade["exit_price"] - entry_price
-                if item["direction"] == "BUY"
-                else entry_price - trade["exit_price"]
-            )
-            results.append(
-                {
-                    "action": item["direction"],
-                    "entry_time": item["entry_time"],
-                    "entry_price": entry_price,
-                    "exit_time": trade["exit_time"],
-                    "exit_price": trade["exit_price"],
-                    "exit_reason": trade["exit_reason"],
-                    "pnl": pnl,
-                    "tags": item["tags"],
-                }
-            )
-            open_positions.append({"direction": item["direction"], "exit_time": trade["exit_time"]})
+        results, counts = run_trades(bars, time_index, period_signals, params)
+        missing = counts["missing"]
+        limit_missing = counts["limit_missing"]
+        limit_cancelled = counts["limit_cancelled"]
+        skip_same = counts["skip_same"]
+        skip_opp = counts["skip_opp"]
+        skip_max = counts["skip_max"]
+        skip_dir_max = counts["skip_dir_max"]
+        netted = counts["netted"]
 
         if missing:
             self.log(f"足が無いサイン: {missing}")
@@ -1898,6 +1301,12 @@ class BacktestApp:
             self.log(f"同方向の追加を許可しないため除外: {skip_same}")
         if skip_opp:
             self.log(f"逆方向の同時保有を許可しないため除外: {skip_opp}")
+        if skip_max:
+            self.log(f"同時保有の上限で除外: {skip_max}")
+        if skip_dir_max:
+            self.log(f"方向ごとの上限で除外: {skip_dir_max}")
+        if netted:
+            self.log(f"逆方向のサインで相殺: {netted}")
 
         self.draw_chart(bars, results)
         if not results:
@@ -1964,6 +1373,7 @@ class BacktestApp:
                 "limit": "利確",
                 "time": "時間",
                 "end": "期間終了",
+                "net": "相殺",
             }.get(item["exit_reason"], "不明")
             self.log(
                 f"{format_dt(entry_jst)} {action_label} "
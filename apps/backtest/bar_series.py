@@ -0,0 +1,180 @@
+import itertools
+import os
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+APPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APPS_DIR not in sys.path:
+    sys.path.insert(0, APPS_DIR)
+
+from common.timeutil import datetime_to_minutes, minutes_to_datetime
+
+
+# 高値・安値の区間極値を64本単位で階層的に持つ
+BLOCK_BITS = 6
+BLOCK_MASK = (1 << BLOCK_BITS) - 1
+
+# 読み込んだ足ごとの通し番号（指標のキャッシュのキーに使う）
+_versions = itertools.count(1)
+
+
+def _build_levels(values, reduce_fn):
+    levels = []
+    current = values
+    while len(current) > 1:
+        step = 1 << BLOCK_BITS
+        reduced = array("d", (reduce_fn(current[i : i + step]) for i in range(0, len(current), step)))
+        levels.append(reduced)
+        current = reduced
+    return levels
+
+
+class Bars:
+    """1分足を列ごとの配列で持つ（時刻はUTCの経過分）。1本あたり約40バイト
+
+    version はデータの版。別の時間足にまとめた足は元の版を引き継ぎ、時間足で見分ける
+    """
+
+    __slots__ = ("times", "opens", "highs", "lows", "closes", "version")
+
+    def __init__(self, times=None, opens=None, highs=None, lows=None, closes=None, version=None):
+        self.times = times if times is not None else array("q")
+        self.opens = opens if opens is not None else array("d")
+        self.highs = highs if highs is not None else array("d")
+        self.lows = lows if lows is not None else array("d")
+        self.closes = closes if closes is not None else array("d")
+        # 別プロセスへ渡した足とも重ならないよう、プロセス番号も含める
+        self.version = version if version is not None else (os.getpid(), next(_versions))
+
+    @classmethod
+    def from_columns(cls, columns, version=None):
+        """OhlcColumns の配列をコピーせずにそのまま使う"""
+        return cls(*columns.columns(), version=version)
+
+    def __len__(self):
+        return len(self.times)
+
+    def columns(self):
+        return (self.times, self.opens, self.highs, self.lows, self.closes)
+
+    def slice(self, start, end):
+        """start〜end-1 本目を切り出した足（別のデータとして新しい版になる）"""
+        return Bars(*(column[start:end] for column in self.columns()))
+
+    def time_at(self, idx):
+        """idx 本目の時刻（datetime）"""
+        return minutes_to_datetime(self.times[idx])
+
+    def index_of(self, dt):
+        """時刻を含む足（その時刻以前で最後の足）の位置（無ければNone）"""
+        idx = bisect_right(self.times, datetime_to_minutes(dt)) - 1
+        return idx if idx >= 0 else None
+
+
+class ExtremeIndex:
+    """安値の最小・高値の最大をブロックごとに前計算し、最初に価格へ触れた足を探す"""
+
+    def __init__(self, lows, highs):
+        self.lows = lows if isinstance(lows, array) else array("d", lows)
+        self.highs = highs if isinstance(highs, array) else array("d", highs)
+        self.low_levels = _build_levels(self.lows, min)
+        self.high_levels = _build_levels(self.highs, max)
+
+    @classmethod
+    def from_bars(cls, bars):
+        return cls(bars.lows, bars.highs)
+
+    def __len__(self):
+        return len(self.lows)
+
+    def first_low_at_or_below(self, start, end, price):
+        """start〜end の範囲で安値が price 以下になる最初の足（無ければNone）"""
+        lows = self.lows
+        levels = self.low_levels
+        if end >= len(lows):
+            end = len(lows) - 1
+        idx = start
+        while idx <= end:
+            if idx == start or idx & BLOCK_MASK == 0:
+                # 触れていないブロックは残りをまとめて飛ばす（開始位置では途中からでも飛ばせる）
+                skipped = False
+                for level in range(len(levels), 0, -1):
+                    bits = BLOCK_BITS * level
+                    block = idx >> bits
+                    if levels[level - 1][block] > price:
+                        idx = (block + 1) << bits
+                        skipped = True
+                        break
+                if skipped:
+                    continue
+            if lows[idx] <= price:
+                return idx
+            idx += 1
+        return None
+
+    def first_high_at_or_above(self, start, end, price):
+        """start〜end の範囲で高値が price 以上になる最初の足（無ければNone）"""
+        highs = self.highs
+        levels = self.high_levels
+        if end >= len(highs):
+            end = len(highs) - 1
+        idx = start
+        while idx <= end:
+            if idx == start or idx & BLOCK_MASK == 0:
+                skipped = False
+                for level in range(len(levels), 0, -1):
+                    bits = BLOCK_BITS * level
+                    block = idx >> bits
+                    if levels[level - 1][block] < price:
+                        idx = (block + 1) << bits
+                        skipped = True
+                        break
+                if skipped:
+                    continue
+            if highs[idx] >= price:
+                return idx
+            idx += 1
+        return None
+
+
+class TimeIndex:
+    """足の時刻（UTCの経過分）の昇順配列。指定時刻ちょうど、無ければ次の足を探す"""
+
+    def __init__(self, times):
+        self.times = times if isinstance(times, array) else array("q", times)
+
+    def __len__(self):
+        return len(self.times)
+
+    def locate(self, minutes, max_gap=0):
+        """minutes ちょうどの足、無ければ max_gap 分以内の次の足の位置（無ければNone）"""
+        times = self.times
+        idx = bisect_left(times, minutes)
+        if idx >= len(times) or times[idx] - minutes > max_gap:
+            return None
+        return idx
+
+    def locate_all(self, minutes_list, max_gap=0):
+        """複数の時刻をまとめて引く。昇順なら前回の位置から先だけを探す"""
+        times = self.times
+        count = len(times)
+        result = []
+        lo = 0
+        prev = None
+        for minutes in minutes_list:
+            if prev is not None and minutes < prev:
+                lo = 0
+            prev = minutes
+            idx = bisect_left(times, minutes, lo)
+            lo = idx
+            if idx >= count or times[idx] - minutes > max_gap:
+                result.append(None)
+            else:
+                result.append(idx)
+        return result
+
+    def locate_closed(self, minutes, span):
+        """minutes の1分足が閉じた時点で確定している、最後の span 分足の位置（無ければNone）"""
+        idx = bisect_right(self.times, minutes + 1 - span) - 1
+        return idx if idx >= 0 else None
@@ -0,0 +1,178 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+
+from engine import (
+    CACHE_DIR,
+    CSV_DIR,
+    DATA_DIR,
+    JST_OFFSET,
+    PIP_SIZE,
+    build_params,
+    evaluate,
+    format_dt,
+    indicator_lookback,
+    load_indicator_bars,
+    load_ohlc_range,
+    load_signals,
+    parse_period,
+)
+from montecarlo import MODES, format_report, run_monte_carlo
+
+
+TRADE_COLUMNS = (
+    "action",
+    "entry_time_jst",
+    "entry_price",
+    "exit_time_jst",
+    "exit_price",
+    "exit_reason",
+    "pnl_pips",
+    "tags",
+)
+
+
+def load_config(path):
+    """設定ファイルを読む（拡張子が .toml ならTOML、それ以外はJSON）"""
+    if path.lower().endswith(".toml"):
+        import tomllib
+
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def trade_to_row(trade):
+    return {
+        "action": trade["action"],
+        "entry_time_jst": format_dt(trade["entry_time"] + JST_OFFSET),
+        "entry_price": round(trade["entry_price"], 5),
+        "exit_time_jst": format_dt(trade["exit_time"] + JST_OFFSET),
+        "exit_price": round(trade["exit_price"], 5),
+        "exit_reason": trade["exit_reason"],
+        "pnl_pips": round(trade["pnl"] / PIP_SIZE, 4),
+        "tags": "/".join(key for key, value in trade["tags"].items() if value),
+    }
+
+
+def run_config(config):
+    """設定どおりに1回分のバックテストを行い、出力用の辞書を返す。設定の誤りはValueError"""
+    start_jst, end_jst = parse_period(config.get("start"), config.get("end"))
+    params = build_params(config.get("params", {}))
+    start_utc = start_jst - JST_OFFSET
+    end_utc = end_jst - JST_OFFSET
+
+    messages = []
+    data_dir = config.get("data_dir", DATA_DIR)
+    cache_dir = config.get("cache_dir", CACHE_DIR)
+    bars, time_index, errors = load_ohlc_range(data_dir, start_utc, end_utc, cache_dir)
+    messages.extend(errors)
+    if not bars:
+        raise ValueError("足データが読み込めません")
+    indicator_bars, errors = load_indicator_bars(
+        data_dir, start_utc, end_utc, params["indicator_tf"], indicator_lookback(params), cache_dir
+    )
+    messages.extend(errors)
+
+    signals, errors = load_signals(config.get("csv_dir", CSV_DIR))
+    messages.extend(errors)
+    period_signals = signals.between(start_utc, end_utc)
+
+    results, counts, stats = evaluate(bars, time_index, period_signals, params, indicator_bars=indicator_bars)
+    results.sort(key=lambda item: item["exit_time"])
+    report = {
+        "start_jst": format_dt(start_jst),
+        "end_jst": format_dt(end_jst),
+        "params": params,
+        "bars": len(bars),
+        "signals": len(signals),
+        "period_signals": len(period_signals),
+        "counts": counts,
+        "stats": stats,
+        "trades": [trade_to_row(item) for item in results],
+        "messages": messages,
+    }
+    monte_carlo = config.get("monte_carlo") or {}
+    if monte_carlo.get("runs"):
+        report["monte_carlo"] = run_monte_carlo(
+            results,
+            monte_carlo["runs"],
+            monte_carlo.get("mode", "bootstrap"),
+            monte_carlo.get("confidence", 0.95),
+            monte_carlo.get("seed"),
+            monte_carlo.get("workers"),
+        )
+    return report
+
+
+def write_output(report, fmt, out_path):
+    if fmt == "csv":
+        buffer = io.StringIO(newline="")
+        writer = csv.DictWriter(buffer, fieldnames=TRADE_COLUMNS)
+        writer.writeheader()
+        writer.writerows(report["trades"])
+        text = buffer.getvalue()
+    else:
+        text = json.dumps(report, ensure_ascii=False, indent=2) + "\n"
+
+    if not out_path:
+        sys.stdout.write(text)
+        return
+    out_dir = os.path.dirname(out_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    os.replace(tmp_path, out_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="画面なしでバックテストを実行します")
+    parser.add_argument("config", help="設定ファイル(JSON/TOML)のパス")
+    parser.add_argument("--format", choices=("json", "csv"), default="json", help="出力形式（csvは取引一覧のみ）")
+    parser.add_argument("--out", default=None, help="出力先（省略時は標準出力）")
+    parser.add_argument(
+        "--monte-carlo", type=int, default=None, help="取引結果を引き直して信頼区間を求める回数（設定の monte_carlo.runs より優先）"
+    )
+    parser.add_argument("--mc-mode", choices=MODES, default=None, help="bootstrap=重複ありで引き直し / shuffle=順番の並べ替え")
+    args = parser.parse_args()
+
+    try:
+        config = load_config(args.config)
+    except (OSError, ValueError) as exc:
+        print(f"設定ファイルを読めません: {exc}", file=sys.stderr)
+        return 2
+    monte_carlo = dict(config.get("monte_carlo") or {})
+    if args.monte_carlo is not None:
+        monte_carlo["runs"] = args.monte_carlo
+    if args.mc_mode:
+        monte_carlo["mode"] = args.mc_mode
+    config["monte_carlo"] = monte_carlo
+    try:
+        report = run_config(config)
+    except ValueError as exc:
+        print(f"エラー: {exc}", file=sys.stderr)
+        return 1
+
+    for message in report["messages"]:
+        print(message, file=sys.stderr)
+    stats = report["stats"]
+    pf_text = "-" if stats["pf"] is None else f"{stats['pf']:.2f}"
+    print(
+        f"取引数: {stats['trades']} 合計: {stats['total_pips']:.2f}pips "
+        f"最大DD: {stats['max_dd']:.2f}pips 勝率: {stats['win_rate']:.1f}% PF: {pf_text}",
+        file=sys.stderr,
+    )
+    if "monte_carlo" in report:
+        print(format_report(report["monte_carlo"]), file=sys.stderr)
+    write_output(report, args.format, args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
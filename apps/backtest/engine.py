@@ -0,0 +1,854 @@
+import csv
+import os
+import sys
+from datetime import datetime, timedelta
+
+APPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APPS_DIR not in sys.path:
+    sys.path.insert(0, APPS_DIR)
+
+from bar_series import Bars, ExtremeIndex, TimeIndex
+from indicators import shared_cache
+from positions import PositionBook
+from signal_store import (
+    ENTRY_INSTANT,
+    ENTRY_LIMIT,
+    SIDE_BUY,
+    SIDE_SELL,
+    TAG_BITS,
+    TAG_KEYS,
+    SignalStore,
+    Signals,
+    mask_to_tags,
+    tags_to_mask,
+)
+from common.ohlc_store import TIMEFRAMES, load_range, resample
+from common.timeutil import JST_OFFSET_MIN, datetime_to_minutes, minutes_to_datetime, parse_datetime_minutes
+
+
+BASE_DIR = os.path.dirname(APPS_DIR)
+CSV_DIR = os.path.join(BASE_DIR, "csv")
+DATA_DIR = os.path.join(BASE_DIR, "data", "usdjpy", "m1")
+CACHE_DIR = os.path.join(BASE_DIR, "data", "usdjpy", "m1_cache")
+JST_OFFSET = timedelta(hours=9)
+
+DATETIME_FORMATS = (
+    "%Y-%m-%d %H:%M",
+    "%Y/%m/%d %H:%M",
+    "%Y.%m.%d %H:%M",
+    "%y.%m.%d %H:%M",
+)
+DATE_FORMATS = (
+    "%Y-%m-%d",
+    "%Y/%m/%d",
+    "%Y.%m.%d",
+    "%Y%m%d",
+)
+PIP_SIZE = 0.01
+
+REASON_ITEMS = (
+    ("entry", "新規"),
+    ("entry_plan", "新規予定"),
+    ("boast", "自慢"),
+    ("fear", "恐怖"),
+    ("fear_plan", "恐怖予定"),
+    ("greed", "欲望"),
+    ("stop", "損切"),
+    ("stop_plan", "損切予定"),
+    ("lc", "ロスカ"),
+    ("lc_plan", "ロスカ予定"),
+    ("tp", "利確"),
+    ("tp_plan", "利確予定"),
+)
+REASON_LABELS = dict(REASON_ITEMS)
+
+
+def parse_datetime_text(text, is_end=False):
+    text = (text or "").strip()
+    if not text:
+        raise ValueError("empty")
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    for fmt in DATE_FORMATS:
+        try:
+            base = datetime.strptime(text, fmt)
+            if is_end:
+                return base.replace(hour=23, minute=59)
+            return base.replace(hour=0, minute=0)
+        except ValueError:
+            pass
+    raise ValueError("format")
+
+
+def parse_signal_datetime(text):
+    minutes = parse_datetime_minutes(text, DATETIME_FORMATS)
+    return None if minutes is None else minutes_to_datetime(minutes)
+
+
+def parse_flag(value):
+    if value is None:
+        return False
+    text = str(value).strip().lower()
+    return text in ("1", "true", "yes", "y")
+
+
+def parse_reason_to_mask(reason_text):
+    """reason列（縦線区切りの理由文字列）を理由のビットの和に変換"""
+    if not reason_text:
+        return 0
+    return tags_to_mask(r.strip() for r in str(reason_text).split("|"))
+
+
+def parse_reason_to_tags(reason_text):
+    """reason列（縦線区切りの理由文字列）をtagsディクショナリに変換"""
+    return mask_to_tags(parse_reason_to_mask(reason_text))
+
+
+def normalize_entry_type(text):
+    if not text:
+        return "INSTANT"
+    cleaned = str(text).strip().upper()
+    if cleaned in ("LIMIT", "L"):
+        return "LIMIT"
+    if cleaned in ("INSTANT", "I"):
+        return "INSTANT"
+    return "INSTANT"
+
+
+def normalize_action(text):
+    if not text:
+        return None
+    cleaned = text.strip().upper()
+    if cleaned in ("BUY", "LONG", "B"):
+        return "BUY"
+    if cleaned in ("SELL", "SHORT", "S"):
+        return "SELL"
+    return None
+
+
+def format_dt(dt):
+    return dt.strftime("%Y-%m-%d %H:%M")
+
+
+def format_price(value):
+    return f"{value:.3f}"
+
+
+def format_pips(value):
+    return f"{value:.2f}"
+
+
+# 設定ファイルや画面から受け取る値の既定（画面の初期値と同じ）
+DEFAULT_PARAMS = {
+    "stop_limit_enabled": True,
+    "stop_pips": 20,
+    "limit_pips": 20,
+    "spread_pips": 1,
+    "time_limit_enabled": True,
+    "time_limit_min": 30,
+    "allow_same_dir": True,
+    "allow_opp_dir": True,
+    "max_positions": 0,
+    "max_per_direction": 0,
+    "netting": False,
+    "limit_offset_pips": 5,
+    "limit_expire_min": 180,
+    "bb_enabled": False,
+    "bb_period": 20,
+    "bb_sigma": 3,
+    "ma_dev_enabled": False,
+    "ma_period": 20,
+    "ma_threshold": 0.5,
+    "bar_gap_min": 5,
+    "indicator_tf": "M1",
+    "tags": None,
+}
+
+
+def parse_period(start_text, end_text):
+    """開始・終了の入力を日本時間のdatetimeにする。誤りはValueError"""
+    try:
+        start_jst = parse_datetime_text(start_text, is_end=False)
+        end_jst = parse_datetime_text(end_text, is_end=True)
+    except ValueError:
+        raise ValueError("開始と終了は日時で入力してください") from None
+    if start_jst > end_jst:
+        raise ValueError("開始が終了より後です")
+    return start_jst, end_jst
+
+
+def _to_number(value, kind, message):
+    if isinstance(value, str):
+        value = value.strip()
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(message) from None
+
+
+def _to_bool(value):
+    if isinstance(value, str):
+        return parse_flag(value)
+    return bool(value)
+
+
+def build_params(values):
+    """入力値（文字列でも数値でもよい）を確認して売買の設定にする。誤りはValueError"""
+    raw = dict(DEFAULT_PARAMS)
+    raw.update({key: value for key, value in values.items() if value is not None})
+
+    stop_limit_enabled = _to_bool(raw["stop_limit_enabled"])
+    time_limit_enabled = _to_bool(raw["time_limit_enabled"])
+
+    spread_pips = _to_number(raw["spread_pips"], float, "スプレッドの値が数値ではありません")
+    if spread_pips < 0:
+        raise ValueError("スプレッドの値は0以上で入力してください")
+
+    stop_pips = 0.0
+    limit_pips = 0.0
+    if stop_limit_enabled:
+        message = "ストップ/リミットの値が数値ではありません"
+        stop_pips = _to_number(raw["stop_pips"], float, message)
+        limit_pips = _to_number(raw["limit_pips"], float, message)
+        if stop_pips < 0 or limit_pips < 0:
+            raise ValueError("ストップ/リミットは0以上で入力してください")
+
+    time_limit_min = None
+    if time_limit_enabled:
+        time_limit_min = _to_number(raw["time_limit_min"], int, "時間クローズは分で入力してください")
+        if time_limit_min < 1:
+            raise ValueError("時間クローズは1以上で入力してください")
+
+    max_positions = _to_number(raw["max_positions"], int, "同時保有の上限は整数で入力してください")
+    max_per_direction = _to_number(raw["max_per_direction"], int, "方向ごとの上限は整数で入力してください")
+    if max_positions < 0 or max_per_direction < 0:
+        raise ValueError("保有の上限は0以上で入力してください（0は無制限）")
+
+    limit_offset_pips = _to_number(raw["limit_offset_pips"], float, "指値位置の値が数値ではありません")
+    if limit_offset_pips < 0:
+        raise ValueError("指値位置は0以上で入力してください")
+    limit_expire_min = _to_number(raw["limit_expire_min"], int, "指値の有効は分で入力してください")
+    if limit_expire_min < 1:
+        raise ValueError("指値の有効は1以上で入力してください")
+
+    bb_enabled = _to_bool(raw["bb_enabled"])
+    ma_dev_enabled = _to_bool(raw["ma_dev_enabled"])
+    bb_period = None
+    bb_sigma = None
+    ma_period = None
+    ma_threshold = None
+    if bb_enabled:
+        bb_period = _to_number(raw["bb_period"], int, "ボリンジャーバンドの期間は数値で入力してください")
+        if bb_period < 2:
+            raise ValueError("ボリンジャーバンドの期間は2以上で入力してください")
+        bb_sigma = _to_number(raw["bb_sigma"], float, "ボリンジャーバンドのシグマは数値で入力してください")
+        if bb_sigma <= 0:
+            raise ValueError("ボリンジャーバンドのシグマは0より大きくしてください")
+    if ma_dev_enabled:
+        ma_period = _to_number(raw["ma_period"], int, "移動平均乖離率の期間は数値で入力してください")
+        if ma_period < 2:
+            raise ValueError("移動平均乖離率の期間は2以上で入力してください")
+        ma_threshold = _to_number(raw["ma_threshold"], float, "移動平均乖離率のしきい値は数値で入力してください")
+        if ma_threshold < 0:
+            raise ValueError("移動平均乖離率のしきい値は0以上で入力してください")
+
+    bar_gap_min = _to_number(raw["bar_gap_min"], int, "足の欠けの許容は分で入力してください")
+    if bar_gap_min < 0:
+        raise ValueError("足の欠けの許容は0以上で入力してください")
+
+    indicator_tf = str(raw["indicator_tf"]).strip().upper()
+    if indicator_tf not in TIMEFRAMES:
+        raise ValueError(f"値動きの時間足は {' / '.join(TIMEFRAMES)} から選んでください")
+
+    tags = raw["tags"]
+    if tags:
+        unknown = [key for key in tags if key not in REASON_LABELS]
+        if unknown:
+            raise ValueError(f"理由の指定が不明です: {', '.join(unknown)}")
+        tags = list(tags)
+    else:
+        tags = None
+
+    return {
+        "stop_pips": stop_pips,
+        "limit_pips": limit_pips,
+        "spread_pips": spread_pips,
+        "stop_limit_enabled": stop_limit_enabled,
+        "time_limit_enabled": time_limit_enabled,
+        "time_limit_min": time_limit_min,
+        "allow_same_dir": _to_bool(raw["allow_same_dir"]),
+        "allow_opp_dir": _to_bool(raw["allow_opp_dir"]),
+        "max_positions": max_positions,
+        "max_per_direction": max_per_direction,
+        "netting": _to_bool(raw["netting"]),
+        "limit_offset_pips": limit_offset_pips,
+        "limit_expire_min": limit_expire_min,
+        "bb_enabled": bb_enabled,
+        "bb_period": bb_period,
+        "bb_sigma": bb_sigma,
+        "ma_dev_enabled": ma_dev_enabled,
+        "ma_period": ma_period,
+        "ma_threshold": ma_threshold,
+        "bar_gap_min": bar_gap_min,
+        "indicator_tf": indicator_tf,
+        "tags": tags,
+    }
+
+
+def read_signal_file(path):
+    """サインのCSVを1ファイル読み、ファイル内の並びのまま Signals にする"""
+    signals = Signals()
+    source_name = os.path.basename(path)
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames:
+            return signals
+
+        # 新フォーマットか旧フォーマットかを判定
+        # 新フォーマット: datetime,side,entry_type,entry_price,reason
+        # 旧フォーマット: datetime,symbol,side,entry_type,entry_price,is_entry,...
+        is_new_format = "reason" in reader.fieldnames
+
+        for row in reader:
+            dt_text = row.get("datetime") or row.get("time") or row.get("日時")
+            action = row.get("action") or row.get("side") or row.get("売買")
+            entry_type = normalize_entry_type(row.get("entry_type"))
+            entry_price_text = row.get("entry_price")
+            entry_price = None
+            if entry_price_text not in (None, ""):
+                try:
+                    entry_price = float(entry_price_text)
+                except ValueError:
+                    entry_price = None
+
+            # 旧フォーマットのみsymbolをチェック
+            if not is_new_format:
+                symbol = row.get("symbol") or row.get("通貨")
+                if symbol and symbol.strip().upper() != "USDJPY":
+                    continue
+
+            minutes_jst = parse_datetime_minutes(dt_text, DATETIME_FORMATS)
+            if minutes_jst is None:
+                continue
+            action_norm = normalize_action(action)
+            if not action_norm:
+                continue
+
+            # フォーマットに応じて理由のビットを作る
+            if is_new_format:
+                tags = parse_reason_to_mask(row.get("reason"))
+            else:
+                # 旧フォーマット: is_付きのカラム名 → is_なしのキーに変換
+                tags = tags_to_mask(key for key in TAG_KEYS if parse_flag(row.get("is_" + key)))
+            signals.append(
+                minutes_jst - JST_OFFSET_MIN,
+                SIDE_BUY if action_norm == "BUY" else SIDE_SELL,
+                ENTRY_LIMIT if entry_type == "LIMIT" else ENTRY_INSTANT,
+                entry_price,
+                tags,
+                row.get("source") or source_name,
+            )
+    return signals
+
+
+# フォルダごとの読み込み結果（変わったファイルだけ読み直す）
+_signal_stores = {}
+
+
+def load_signals(csv_dir):
+    """サインを時刻順の Signals で返す。2回目以降は更新されたファイルだけ読み直す"""
+    key = os.path.abspath(csv_dir)
+    store = _signal_stores.get(key)
+    if store is None:
+        store = SignalStore(csv_dir, read_signal_file)
+        _signal_stores[key] = store
+    return store.load()
+
+
+def iter_dates(start_date, end_date):
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def load_ohlc_range(data_dir, start_utc, end_utc, cache_dir=CACHE_DIR, timeframe="M1"):
+    """期間の足（Bars）と、その時刻の索引（TimeIndex）を読む。時間足ごとにキャッシュする"""
+    if not os.path.isdir(data_dir):
+        bars = Bars()
+        return bars, TimeIndex(bars.times), ["足データの場所が見つかりません"]
+
+    # 日ごとの列キャッシュ（元CSVの更新時刻とサイズで自動更新）から読む
+    columns, errors = load_range(
+        data_dir,
+        iter_dates(start_utc.date(), end_utc.date()),
+        datetime_to_minutes(start_utc),
+        datetime_to_minutes(end_utc),
+        cache_dir,
+        timeframe,
+    )
+    bars = Bars.from_columns(columns)
+    return bars, TimeIndex(bars.times), errors
+
+
+def resample_bars(bars, timeframe):
+    """読み込み済みの1分足を指定の時間足にまとめる（1分足ならそのまま返す）"""
+    if TIMEFRAMES[timeframe] == 1:
+        return bars
+    return Bars.from_columns(resample(bars, TIMEFRAMES[timeframe]), bars.version)
+
+
+def indicator_lookback(params):
+    """値動きの絞り込みに使う最長の期間（本数）。絞り込みが無ければ0"""
+    periods = [0]
+    if params.get("bb_enabled"):
+        periods.append(params["bb_period"])
+    if params.get("ma_dev_enabled"):
+        periods.append(params["ma_period"])
+    return max(periods)
+
+
+def load_indicator_bars(data_dir, start_utc, end_utc, timeframe, lookback, cache_dir=CACHE_DIR):
+    """1分足以外で絞り込む場合に、期間の前の計算に要る分も含めてその時間足を読む（不要ならNone）"""
+    span = TIMEFRAMES[timeframe]
+    if span == 1 or lookback <= 0:
+        return None, []
+    # 週末の欠けを見込んで、必要な本数の2倍の時間をさかのぼる
+    warmup = timedelta(minutes=lookback * span * 2)
+    bars, _time_index, errors = load_ohlc_range(data_dir, start_utc - warmup, end_utc, cache_dir, timeframe)
+    return bars, errors
+
+
+def find_limit_entry(
+    bars,
+    start_idx,
+    end_idx,
+    direction,
+    limit_price,
+    spread,
+    limit_expire_min,
+    extremes=None,
+):
+    half = spread / 2.0
+    current_mid = bars.closes[start_idx]
+    if direction == "BUY":
+        if current_mid <= limit_price:
+            entry_price = current_mid + half
+            return start_idx, current_mid, entry_price
+    else:
+        if current_mid >= limit_price:
+            entry_price = current_mid - half
+            return start_idx, current_mid, entry_price
+    if limit_expire_min is None:
+        last_idx = end_idx
+    else:
+        last_idx = start_idx + limit_expire_min
+        if last_idx > end_idx:
+            last_idx = end_idx
+    if start_idx >= last_idx:
+        return None
+    if extremes is None:
+        extremes = ExtremeIndex.from_bars(bars)
+
+    # 有効期間を1本ずつ回さず、指値に最初に触れる足を探す
+    if direction == "BUY":
+        idx = extremes.first_low_at_or_below(start_idx + 1, last_idx, limit_price)
+        if idx is not None:
+            return idx, limit_price, limit_price + half
+    else:
+        idx = extremes.first_high_at_or_above(start_idx + 1, last_idx, limit_price)
+        if idx is not None:
+            return idx, limit_price, limit_price - half
+    return None
+
+
+def simulate_trade(
+    bars,
+    start_idx,
+    end_idx,
+    direction,
+    stop,
+    limit,
+    spread,
+    stop_limit_enabled,
+    time_limit_enabled,
+    time_limit_min,
+    entry_mid=None,
+    extremes=None,
+):
+    if extremes is None:
+        extremes = ExtremeIndex.from_bars(bars)
+    half = spread / 2.0
+    if entry_mid is None:
+        entry_mid = bars.closes[start_idx]
+    time_idx = None
+    if time_limit_enabled and time_limit_min is not None:
+        time_idx = max(start_idx + time_limit_min, start_idx + 1)
+        if time_idx > end_idx:
+            time_idx = None
+    last_idx = end_idx if time_idx is None else time_idx
+    use_stop = stop_limit_enabled and stop > 0
+    use_limit = stop_limit_enabled and limit > 0
+
+    # 足ごとに回さず、ストップ・リミットそれぞれ最初に触れる足を探す
+    if direction == "BUY":
+        entry_price = entry_mid + half
+        stop_price = entry_price - stop
+        limit_price = entry_price + limit
+        stop_idx = (
+            extremes.first_low_at_or_below(start_idx + 1, last_idx, stop_price + half) if use_stop else None
+        )
+        limit_end = last_idx if stop_idx is None else stop_idx
+        limit_idx = (
+            extremes.first_high_at_or_above(start_idx + 1, limit_end, limit_price + half) if use_limit else None
+        )
+        close_sign = -1
+    else:
+        entry_price = entry_mid - half
+        stop_price = entry_price + stop
+        limit_price = entry_price - limit
+        stop_idx = (
+            extremes.first_high_at_or_above(start_idx + 1, last_idx, stop_price - half) if use_stop else None
+        )
+        limit_end = last_idx if stop_idx is None else stop_idx
+        limit_idx = (
+            extremes.first_low_at_or_below(start_idx + 1, limit_end, limit_price - half) if use_limit else None
+        )
+        close_sign = 1
+
+    # 同じ足で両方に触れた場合はストップを優先
+    if limit_idx is not None and (stop_idx is None or limit_idx < stop_idx):
+        return {
+            "exit_reason": "limit",
+            "exit_price": limit_price,
+            "exit_time": bars.time_at(limit_idx),
+        }
+    if stop_idx is not None:
+        return {
+            "exit_reason": "stop",
+            "exit_price": stop_price,
+            "exit_time": bars.time_at(stop_idx),
+        }
+    if time_idx is not None:
+        return {
+            "exit_reason": "time",
+            "exit_price": bars.closes[time_idx] + close_sign * half,
+            "exit_time": bars.time_at(time_idx),
+        }
+    return {
+        "exit_reason": "end",
+        "exit_price": bars.closes[end_idx] + close_sign * half,
+        "exit_time": bars.time_at(end_idx),
+    }
+
+
+
+def filter_signals_by_tags(signals, selected):
+    """選んだ理由のどれかを持つサインに絞る"""
+    if not selected:
+        return signals
+    return signals.with_tags(tags_to_mask(selected))
+
+
+def locate_signals(signals, time_index, max_gap=0):
+    """各サインの足の位置（その分の足、欠けていれば max_gap 分以内の次の足）をまとめて求める"""
+    return time_index.locate_all(signals.times, max_gap)
+
+
+def _indicator_position(bars, idx, indicator_index, span):
+    """サインの足に対応する指標の位置。1分足以外は、その時点で確定している足を使う"""
+    if indicator_index is None:
+        return idx
+    return indicator_index.locate_closed(bars.times[idx], span)
+
+
+def filter_signals_by_bollinger(
+    signals, bars, time_index, means, stds, sigma, max_gap=0, indicator_index=None, span=1
+):
+    sides = signals.sides
+    kept = []
+    for pos, idx in enumerate(locate_signals(signals, time_index, max_gap)):
+        if idx is None:
+            kept.append(pos)
+            continue
+        ind_idx = _indicator_position(bars, idx, indicator_index, span)
+        if ind_idx is None:
+            continue
+        mean = means[ind_idx]
+        std = stds[ind_idx]
+        if mean is None or std is None:
+            continue
+        upper = mean + sigma * std
+        lower = mean - sigma * std
+        if sides[pos] == SIDE_BUY:
+            if bars.lows[idx] <= lower:
+                kept.append(pos)
+        else:
+            if bars.highs[idx] >= upper:
+                kept.append(pos)
+    return signals.take(kept)
+
+
+def filter_signals_by_ma_dev(
+    signals, bars, time_index, means, threshold, max_gap=0, indicator_index=None, span=1
+):
+    if threshold <= 0:
+        return signals
+    sides = signals.sides
+    kept = []
+    for pos, idx in enumerate(locate_signals(signals, time_index, max_gap)):
+        if idx is None:
+            kept.append(pos)
+            continue
+        ind_idx = _indicator_position(bars, idx, indicator_index, span)
+        mean = means[ind_idx] if ind_idx is not None else None
+        if mean is None or mean == 0:
+            continue
+        # サインの足の終値と移動平均との乖離率(%)
+        dev = (bars.closes[idx] - mean) / mean * 100.0
+        if sides[pos] == SIDE_BUY:
+            if dev <= -threshold:
+                kept.append(pos)
+        else:
+            if dev >= threshold:
+                kept.append(pos)
+    return signals.take(kept)
+
+
+def apply_indicator_filters(bars, time_index, signals, params, stats_cache=None, indicator_bars=None):
+    """ボリンジャーバンドと移動平均乖離率で絞り込む。絞り込み後のサインと記録用の文を返す
+
+    indicator_bars は指標の時間足の足（load_indicator_bars）。省略時は読み込み済みの1分足からまとめる
+    """
+    messages = []
+    if not (params.get("bb_enabled") or params.get("ma_dev_enabled")):
+        return signals, messages
+    if stats_cache is None:
+        stats_cache = shared_cache
+    max_gap = params.get("bar_gap_min", 0)
+    timeframe = params.get("indicator_tf", "M1")
+    span = TIMEFRAMES[timeframe]
+    if span == 1:
+        indicator_bars = bars
+        indicator_index = None
+        tf_label = ""
+    else:
+        if indicator_bars is None:
+            indicator_bars = resample_bars(bars, timeframe)
+        indicator_index = TimeIndex(indicator_bars.times)
+        tf_label = f"{timeframe} "
+
+    def get_stats(period):
+        return stats_cache.get(indicator_bars, timeframe, "mean_std", period)
+
+    if params.get("bb_enabled"):
+        bb_period = params["bb_period"]
+        bb_sigma = params["bb_sigma"]
+        bb_means, bb_stds = get_stats(bb_period)
+        signals = filter_signals_by_bollinger(
+            signals, bars, time_index, bb_means, bb_stds, bb_sigma, max_gap, indicator_index, span
+        )
+        messages.append(f"ボリンジャーバンド絞り込み: {tf_label}期間{bb_period} シグマ{bb_sigma} -> {len(signals)}")
+    if params.get("ma_dev_enabled"):
+        ma_period = params["ma_period"]
+        ma_threshold = params["ma_threshold"]
+        ma_means, _ma_stds = get_stats(ma_period)
+        signals = filter_signals_by_ma_dev(
+            signals, bars, time_index, ma_means, ma_threshold, max_gap, indicator_index, span
+        )
+        messages.append(f"移動平均乖離率絞り込み: {tf_label}期間{ma_period} しきい値{ma_threshold}% -> {len(signals)}")
+    return signals, messages
+
+
+def run_trades(bars, time_index, signals, params, extremes=None):
+    """サインから約定・保有制限・決済までを計算する。結果と除外件数を返す"""
+    stop_limit_enabled = bool(params.get("stop_limit_enabled", True))
+    time_limit_enabled = bool(params.get("time_limit_enabled", True))
+    stop = params.get("stop_pips", 0.0) * PIP_SIZE if stop_limit_enabled else 0.0
+    limit = params.get("limit_pips", 0.0) * PIP_SIZE if stop_limit_enabled else 0.0
+    spread = params.get("spread_pips", 0.0) * PIP_SIZE
+    limit_offset = params.get("limit_offset_pips", 0.0) * PIP_SIZE
+    limit_expire_min = params.get("limit_expire_min")
+    time_limit_min = params.get("time_limit_min") if time_limit_enabled else None
+    allow_same_dir = bool(params.get("allow_same_dir", True))
+    allow_opp_dir = bool(params.get("allow_opp_dir", True))
+    max_positions = params.get("max_positions") or 0
+    max_per_direction = params.get("max_per_direction") or 0
+    netting = bool(params.get("netting", False))
+    max_gap = params.get("bar_gap_min", 0)
+
+    counts = {
+        "missing": 0,
+        "limit_missing": 0,
+        "limit_cancelled": 0,
+        "skip_same": 0,
+        "skip_opp": 0,
+        "skip_max": 0,
+        "skip_dir_max": 0,
+        "netted": 0,
+    }
+    results = []
+    if not bars:
+        return results, counts
+    end_idx = len(bars) - 1
+    if extremes is None:
+        extremes = ExtremeIndex.from_bars(bars)
+    candidates = []
+
+    plan_bits = TAG_BITS["entry_plan"] | TAG_BITS["tp_plan"]
+    signal_indexes = locate_signals(signals, time_index, max_gap)
+    for order, idx in enumerate(signal_indexes):
+        if idx is None:
+            counts["missing"] += 1
+            continue
+        direction = signals.action_at(order)
+        tag_mask = signals.tags[order]
+        entry_idx = idx
+        entry_mid = None
+        entry_price = None
+        if signals.entry_types[order] == ENTRY_LIMIT:
+            base_price = signals.price_at(order)
+            if base_price is None:
+                counts["limit_missing"] += 1
+                continue
+            use_plan_offset = bool(tag_mask & plan_bits)
+            if direction == "BUY":
+                limit_price = base_price + limit_offset if use_plan_offset else base_price - limit_offset
+            else:
+                limit_price = base_price - limit_offset if use_plan_offset else base_price + limit_offset
+            found = find_limit_entry(
+                bars,
+                idx,
+                end_idx,
+                direction,
+                limit_price,
+                spread,
+                limit_expire_min,
+                extremes,
+            )
+            if not found:
+                counts["limit_cancelled"] += 1
+                continue
+            entry_idx, entry_mid, entry_price = found
+        else:
+            entry_mid = bars.closes[entry_idx]
+            half = spread / 2.0
+            entry_price = entry_mid + half if direction == "BUY" else entry_mid - half
+
+        candidates.append(
+            {
+                "order": order,
+                "direction": direction,
+                "entry_idx": entry_idx,
+                "entry_time": bars.time_at(entry_idx),
+                "entry_mid": entry_mid,
+                "entry_price": entry_price,
+                "tag_mask": tag_mask,
+            }
+        )
+
+    candidates.sort(key=lambda item: (item["entry_time"], item["order"]))
+    book = PositionBook(allow_same_dir, allow_opp_dir, max_positions, max_per_direction, netting)
+    for item in candidates:
+        entry_time = item["entry_time"]
+        direction = item["direction"]
+        book.expire(entry_time)
+        target = book.net_target(direction)
+        if target is not None:
+            # 逆方向のポジションをこのサインの約定価格で閉じ、新規には持たない
+            book.net(target)
+            result = target["data"]
+            exit_price = item["entry_price"]
+            result["exit_time"] = entry_time
+            result["exit_price"] = exit_price
+            result["exit_reason"] = "net"
+            result["pnl"] = (
+                exit_price - result["entry_price"]
+                if result["action"] == "BUY"
+                else result["entry_price"] - exit_price
+            )
+            counts["netted"] += 1
+            continue
+        reason = book.check(direction)
+        if reason:
+            counts[reason] += 1
+            continue
+
+        trade = simulate_trade(
+            bars,
+            item["entry_idx"],
+            end_idx,
+            item["direction"],
+            stop,
+            limit,
+            spread,
+            stop_limit_enabled,
+            time_limit_enabled,
+            time_limit_min,
+            entry_mid=item["entry_mid"],
+            extremes=extremes,
+        )
+        entry_price = item["entry_price"]
+        pnl = (
+            trade["exit_price"] - entry_price
+            if item["direction"] == "BUY"
+            else entry_price - trade["exit_price"]
+        )
+        result = {
+            "action": item["direction"],
+            "entry_time": item["entry_time"],
+            "entry_price": entry_price,
+            "exit_time": trade["exit_time"],
+            "exit_price": trade["exit_price"],
+            "exit_reason": trade["exit_reason"],
+            "pnl": pnl,
+            "tags": mask_to_tags(item["tag_mask"]),
+        }
+        results.append(result)
+        book.add(direction, trade["exit_time"], result)
+
+    return results, counts
+
+
+def calc_stats(results):
+    """決済時刻順に並べた損益から、総損益・最大ドローダウン・勝率・PFを計算する"""
+    results_sorted = sorted(results, key=lambda item: item["exit_time"])
+    pips_list = [r["pnl"] / PIP_SIZE for r in results_sorted]
+    total = len(pips_list)
+    wins = sum(1 for p in pips_list if p > 0)
+    losses = sum(1 for p in pips_list if p < 0)
+    profit_sum = sum(p for p in pips_list if p > 0)
+    loss_sum = sum(p for p in pips_list if p < 0)
+
+    equity = 0.0
+    max_dd = 0.0
+    peak = 0.0
+    for p in pips_list:
+        equity += p
+        if equity > peak:
+            peak = equity
+        dd = peak - equity
+        if dd > max_dd:
+            max_dd = dd
+
+    return {
+        "trades": total,
+        "total_pips": sum(pips_list),
+        "max_dd": max_dd,
+        "wins": wins,
+        "losses": losses,
+        "win_rate": wins / total * 100 if total else 0.0,
+        # 負けが無い場合は計算不可としてNone
+        "pf": profit_sum / abs(loss_sum) if loss_sum != 0 else None,
+    }
+
+
+def evaluate(bars, time_index, signals, params, extremes=None, stats_cache=None, indicator_bars=None):
+    """期間内サインに理由・値動きの絞り込みをかけてから売買し、結果と統計を返す"""
+    signals = filter_signals_by_tags(signals, params.get("tags"))
+    signals, _messages = apply_indicator_filters(bars, time_index, signals, params, stats_cache, indicator_bars)
+    results, counts = run_trades(bars, time_index, signals, params, extremes)
+    return results, counts, calc_stats(results)
@@ -0,0 +1,130 @@
+from collections import OrderedDict, deque
+
+
+# 結果を残す件数（古く使われていないものから捨てる）
+CACHE_MAX_ENTRIES = 64
+
+
+def rolling_mean_std(values, period):
+    """期間 period の移動平均と標準偏差（母分散）。足りない所はNone"""
+    # 入る値・抜ける値だけで平均と偏差平方和を更新する（Welford法の窓版）。
+    # E[x²]−E[x]² のように大きな数どうしを引かないので、157.xxx のような価格でも桁落ちしない
+    count = len(values)
+    means = [None] * count
+    stds = [None] * count
+    if period <= 0:
+        return means, stds
+    mean = 0.0
+    m2 = 0.0
+    for idx in range(count):
+        value = values[idx]
+        if idx < period:
+            delta = value - mean
+            mean += delta / (idx + 1)
+            m2 += delta * (value - mean)
+        else:
+            old = values[idx - period]
+            new_mean = mean + (value - old) / period
+            m2 += (value - old) * (value - new_mean + old - mean)
+            mean = new_mean
+        if idx >= period - 1:
+            if m2 < 0:
+                m2 = 0.0
+            means[idx] = mean
+            stds[idx] = (m2 / period) ** 0.5
+    return means, stds
+
+
+def ema(values, period):
+    """指数移動平均。最初の値は期間の単純平均から始める"""
+    count = len(values)
+    result = [None] * count
+    if period <= 0 or count < period:
+        return result
+    alpha = 2.0 / (period + 1)
+    value = sum(values[:period]) / period
+    result[period - 1] = value
+    for idx in range(period, count):
+        value += alpha * (values[idx] - value)
+        result[idx] = value
+    return result
+
+
+def atr(highs, lows, closes, period):
+    """ATR（真の値幅のワイルダー平滑）"""
+    count = len(closes)
+    result = [None] * count
+    if period <= 0 or count < period:
+        return result
+    ranges = [highs[0] - lows[0]]
+    for idx in range(1, count):
+        prev_close = closes[idx - 1]
+        ranges.append(max(highs[idx] - lows[idx], abs(highs[idx] - prev_close), abs(lows[idx] - prev_close)))
+    value = sum(ranges[:period]) / period
+    result[period - 1] = value
+    for idx in range(period, count):
+        value = (value * (period - 1) + ranges[idx]) / period
+        result[idx] = value
+    return result
+
+
+def _rolling_extreme(values, period, better):
+    count = len(values)
+    result = [None] * count
+    if period <= 0:
+        return result
+    # 窓の中で、後から来た値に負けていない位置だけを残す
+    window = deque()
+    for idx in range(count):
+        value = values[idx]
+        while window and not better(values[window[-1]], value):
+            window.pop()
+        window.append(idx)
+        if window[0] <= idx - period:
+            window.popleft()
+        if idx >= period - 1:
+            result[idx] = values[window[0]]
+    return result
+
+
+def rolling_max(values, period):
+    """期間 period の最大値"""
+    return _rolling_extreme(values, period, lambda kept, new: kept > new)
+
+
+def rolling_min(values, period):
+    """期間 period の最小値"""
+    return _rolling_extreme(values, period, lambda kept, new: kept < new)
+
+
+# 名前と、足（Bars）から計算する関数
+INDICATORS = {
+    "mean_std": lambda bars, period: rolling_mean_std(bars.closes, period),
+    "ema": lambda bars, period: ema(bars.closes, period),
+    "atr": lambda bars, period: atr(bars.highs, bars.lows, bars.closes, period),
+    "highest": lambda bars, period: rolling_max(bars.highs, period),
+    "lowest": lambda bars, period: rolling_min(bars.lows, period),
+}
+
+
+class IndicatorCache:
+    """指標の計算結果を (データの版, 時間足, 指標, 設定) ごとに持つ。絞り込みとチャートで共用する"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, bars, timeframe, name, *params):
+        key = (bars.version, timeframe, name, params)
+        value = self.entries.get(key)
+        if value is None:
+            value = INDICATORS[name](bars, *params)
+            self.entries[key] = value
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return value
+
+
+shared_cache = IndicatorCache()
@@ -0,0 +1,146 @@
+import math
+import operator
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+
+from engine import PIP_SIZE
+
+
+DEFAULT_RUNS = 10000
+# 乱数の種を分ける単位（プロセス数が変わっても同じ種なら同じ結果になる）
+CHUNK_RUNS = 1000
+MODES = ("bootstrap", "shuffle")
+
+
+def trade_pips(results):
+    """決済順の損益(pips)の並び"""
+    return [item["pnl"] / PIP_SIZE for item in sorted(results, key=lambda item: item["exit_time"])]
+
+
+def _simulate_chunk(pips, runs, mode, seed):
+    """runs 回分の (最大ドローダウン, 最終損益, PF) を返す。PFは負けが無ければinf"""
+    rng = random.Random(seed)
+    count = len(pips)
+    max_dds = []
+    finals = []
+    pfs = []
+    sample = list(pips)
+    for _ in range(runs):
+        if mode == "shuffle":
+            rng.shuffle(sample)
+        else:
+            # 同じ取引を重複も許して同じ件数だけ引き直す
+            sample = rng.choices(pips, k=count)
+        # 損益曲線・その時点までの最高値・ドローダウンを、組み込み関数だけで求める
+        equity = list(accumulate(sample))
+        peaks = accumulate(equity, max, initial=0.0)
+        next(peaks)
+        max_dd = max(0.0, max(map(operator.sub, peaks, equity)))
+        total = equity[-1]
+        gross = sum(map(abs, sample))
+        profit = (gross + total) / 2
+        loss = (gross - total) / 2
+        max_dds.append(max_dd)
+        finals.append(total)
+        pfs.append(profit / loss if loss > 1e-9 else math.inf)
+    return max_dds, finals, pfs
+
+
+def _percentile(sorted_values, fraction):
+    """並べ替え済みの値の分位点（線形補間）"""
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * fraction
+    low = int(pos)
+    if pos == low:
+        return sorted_values[low]
+    high = low + 1
+    if sorted_values[high] == math.inf:
+        return math.inf
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+def _interval(values, confidence):
+    """下限・中央値・上限・平均。infになった所は計算不可としてNoneにする"""
+    values = sorted(values)
+    tail = (1.0 - confidence) / 2
+    finite = [value for value in values if value != math.inf]
+    result = {
+        "low": _percentile(values, tail),
+        "median": _percentile(values, 0.5),
+        "high": _percentile(values, 1.0 - tail),
+        "mean": sum(finite) / len(finite) if finite else None,
+    }
+    return {key: None if value == math.inf else value for key, value in result.items()}
+
+
+def run_monte_carlo(results, runs=DEFAULT_RUNS, mode="bootstrap", confidence=0.95, seed=None, workers=None):
+    """取引結果を引き直し（bootstrap）または並べ替え（shuffle）て、最大DD・最終損益・PFの信頼区間を返す
+
+    取引が無ければNone。PFは負けの無い回を無限大として分位点に含める（平均からは除く）
+    """
+    if mode not in MODES:
+        raise ValueError(f"方式は {' / '.join(MODES)} から選んでください")
+    if runs < 1:
+        raise ValueError("回数は1以上にしてください")
+    if not 0 < confidence < 1:
+        raise ValueError("信頼度は0より大きく1より小さくしてください")
+    pips = trade_pips(results)
+    if not pips:
+        return None
+    if seed is None:
+        seed = random.randrange(1 << 30)
+
+    chunks = []
+    start = 0
+    while start < runs:
+        size = min(CHUNK_RUNS, runs - start)
+        chunks.append((pips, size, mode, seed + len(chunks)))
+        start += size
+    if workers == 1 or len(chunks) <= 1:
+        parts = [_simulate_chunk(*chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            parts = list(executor.map(_simulate_chunk, *zip(*chunks)))
+
+    max_dds = []
+    finals = []
+    pfs = []
+    for part_dds, part_finals, part_pfs in parts:
+        max_dds.extend(part_dds)
+        finals.extend(part_finals)
+        pfs.extend(part_pfs)
+    return {
+        "runs": runs,
+        "mode": mode,
+        "confidence": confidence,
+        "seed": seed,
+        "trades": len(pips),
+        "max_dd": _interval(max_dds, confidence),
+        "final": _interval(finals, confidence),
+        "pf": _interval(pfs, confidence),
+        # 最終損益がマイナスになった割合
+        "loss_ratio": sum(1 for value in finals if value < 0) / runs,
+    }
+
+
+def format_report(report):
+    """信頼区間を画面・ログ用の文にする"""
+    if report is None:
+        return "取引がありません"
+
+    def value(number):
+        return "-" if number is None else f"{number:.2f}"
+
+    percent = round(report["confidence"] * 100)
+    mode_label = "並べ替え" if report["mode"] == "shuffle" else "引き直し"
+    lines = [f"{mode_label} {report['runs']}回 / {report['trades']}取引 / {percent}%区間"]
+    for key, label in (("final", "最終損益(pips)"), ("max_dd", "最大DD(pips)"), ("pf", "PF")):
+        item = report[key]
+        lines.append(
+            f"{label}: {value(item['low'])} ～ {value(item['high'])} (中央値 {value(item['median'])})"
+        )
+    lines.append(f"最終損益がマイナスになる割合: {report['loss_ratio'] * 100:.1f}%")
+    return "\n".join(lines)
@@ -0,0 +1,85 @@
+import heapq
+from collections import deque
+
+
+DIRECTIONS = ("BUY", "SELL")
+
+
+def opposite(direction):
+    return "SELL" if direction == "BUY" else "BUY"
+
+
+class PositionBook:
+    """保有中のポジションを決済時刻の順に持ち、方向ごとの件数を数える
+
+    max_positions / max_per_direction は同時保有の上限（0なら無制限）。
+    netting が有効なら、逆方向のサインは新規に持たず、最も古い逆方向のポジションを相殺して閉じる
+    """
+
+    def __init__(self, allow_same_dir=True, allow_opp_dir=True, max_positions=0, max_per_direction=0, netting=False):
+        self.allow_same_dir = allow_same_dir
+        self.allow_opp_dir = allow_opp_dir
+        self.max_positions = max_positions or 0
+        self.max_per_direction = max_per_direction or 0
+        self.netting = netting
+        # (決済時刻, 通し番号, ポジション) の最小ヒープ。相殺で閉じたものは取り出す時に読み飛ばす
+        self.heap = []
+        # 方向ごとに建てた順で並べる（相殺で最も古いものを選ぶため）
+        self.queues = {direction: deque() for direction in DIRECTIONS}
+        self.counts = {direction: 0 for direction in DIRECTIONS}
+        self.total = 0
+        self.seq = 0
+
+    def __len__(self):
+        return self.total
+
+    def _close(self, position):
+        position["open"] = False
+        self.counts[position["direction"]] -= 1
+        self.total -= 1
+
+    def expire(self, now):
+        """now までに決済されたポジションを外す"""
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            _exit_time, _seq, position = heapq.heappop(heap)
+            if position["open"]:
+                self._close(position)
+
+    def check(self, direction):
+        """新規に持てるなら None、持てないなら除外理由（件数のキー）を返す"""
+        same = self.counts[direction]
+        opp = self.total - same
+        if not self.allow_same_dir and same:
+            return "skip_same"
+        if not self.allow_opp_dir and opp:
+            return "skip_opp"
+        if self.max_positions and self.total >= self.max_positions:
+            return "skip_max"
+        if self.max_per_direction and same >= self.max_per_direction:
+            return "skip_dir_max"
+        return None
+
+    def net_target(self, direction):
+        """相殺の対象になる、最も古い逆方向のポジション（相殺しない設定や無い場合はNone）"""
+        if not self.netting:
+            return None
+        queue = self.queues[opposite(direction)]
+        while queue and not queue[0]["open"]:
+            queue.popleft()
+        return queue[0] if queue else None
+
+    def net(self, position):
+        """相殺でポジションを閉じる（ヒープ側は取り出す時に読み飛ばす）"""
+        self._close(position)
+
+    def add(self, direction, exit_time, data=None):
+        """ポジションを登録して返す。data には取引結果など任意の値を持たせる"""
+        position = {"direction": direction, "exit_time": exit_time, "data": data, "open": True}
+        self.seq += 1
+        heapq.heappush(self.heap, (exit_time, self.seq, position))
+        if self.netting:
+            self.queues[direction].append(position)
+        self.counts[direction] += 1
+        self.total += 1
+        return position
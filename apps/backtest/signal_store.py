@@ -0,0 +1,200 @@
+import glob
+import math
+import os
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+APPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APPS_DIR not in sys.path:
+    sys.path.insert(0, APPS_DIR)
+
+from common.timeutil import JST_OFFSET_MIN, datetime_to_minutes, minutes_to_datetime
+
+
+SIDE_BUY = 1
+SIDE_SELL = -1
+SIDE_ACTIONS = {SIDE_BUY: "BUY", SIDE_SELL: "SELL"}
+ENTRY_INSTANT = 0
+ENTRY_LIMIT = 1
+ENTRY_TYPES = {ENTRY_INSTANT: "INSTANT", ENTRY_LIMIT: "LIMIT"}
+
+# 理由ごとのビット（engine.REASON_ITEMS と同じ並び）
+TAG_KEYS = (
+    "entry",
+    "entry_plan",
+    "boast",
+    "fear",
+    "fear_plan",
+    "greed",
+    "stop",
+    "stop_plan",
+    "lc",
+    "lc_plan",
+    "tp",
+    "tp_plan",
+)
+TAG_BITS = {key: 1 << bit for bit, key in enumerate(TAG_KEYS)}
+
+
+def tags_to_mask(keys):
+    """理由のキーの並びをビットの和にする（未知のキーは無視）"""
+    mask = 0
+    for key in keys:
+        mask |= TAG_BITS.get(key, 0)
+    return mask
+
+
+def mask_to_tags(mask):
+    """ビットの和を、全キーを持つ tags の辞書に戻す"""
+    return {key: bool(mask & bit) for key, bit in TAG_BITS.items()}
+
+
+class Signals:
+    """サインを列ごとの配列で持つ（時刻はUTCの経過分の昇順）
+
+    side は 1=買い / -1=売り、entry_type は 0=成行 / 1=指値、価格が無い場合は NaN
+    """
+
+    __slots__ = ("times", "sides", "entry_types", "prices", "tags", "sources")
+
+    def __init__(self, times=None, sides=None, entry_types=None, prices=None, tags=None, sources=None):
+        self.times = times if times is not None else array("q")
+        self.sides = sides if sides is not None else array("b")
+        self.entry_types = entry_types if entry_types is not None else array("b")
+        self.prices = prices if prices is not None else array("d")
+        self.tags = tags if tags is not None else array("H")
+        self.sources = sources if sources is not None else []
+
+    def __len__(self):
+        return len(self.times)
+
+    def columns(self):
+        return (self.times, self.sides, self.entry_types, self.prices, self.tags, self.sources)
+
+    def append(self, minutes, side, entry_type, price, tags, source):
+        self.times.append(minutes)
+        self.sides.append(side)
+        self.entry_types.append(entry_type)
+        self.prices.append(math.nan if price is None else price)
+        self.tags.append(tags)
+        self.sources.append(source)
+
+    def extend(self, other):
+        for column, values in zip(self.columns(), other.columns()):
+            column.extend(values)
+
+    def take(self, indexes):
+        """指定した位置のサインだけを並び順どおりに取り出す"""
+        return Signals(
+            *(
+                array(column.typecode, (column[i] for i in indexes))
+                if isinstance(column, array)
+                else [column[i] for i in indexes]
+                for column in self.columns()
+            )
+        )
+
+    def slice(self, start, end):
+        return Signals(*(column[start:end] for column in self.columns()))
+
+    def sorted(self):
+        """時刻の昇順に並べ替えたサイン（同じ時刻は元の並び順を保つ）"""
+        times = self.times
+        if all(times[i] <= times[i + 1] for i in range(len(times) - 1)):
+            return self
+        return self.take(sorted(range(len(times)), key=times.__getitem__))
+
+    def between(self, start_utc, end_utc):
+        """UTCの start〜end（両端を含む）のサイン"""
+        lo = bisect_left(self.times, datetime_to_minutes(start_utc))
+        hi = bisect_right(self.times, datetime_to_minutes(end_utc))
+        return self.slice(lo, hi)
+
+    def with_tags(self, mask):
+        """理由のビットのどれかを持つサイン"""
+        tags = self.tags
+        return self.take([i for i in range(len(tags)) if tags[i] & mask])
+
+    def action_at(self, idx):
+        return SIDE_ACTIONS[self.sides[idx]]
+
+    def price_at(self, idx):
+        price = self.prices[idx]
+        return None if math.isnan(price) else price
+
+    def time_utc(self, idx):
+        return minutes_to_datetime(self.times[idx])
+
+    def time_jst(self, idx):
+        return minutes_to_datetime(self.times[idx] + JST_OFFSET_MIN)
+
+    def row(self, idx):
+        """1件分を従来どおりの辞書で返す（表示や書き出し用）"""
+        return {
+            "time_jst": self.time_jst(idx),
+            "time_utc": self.time_utc(idx),
+            "action": self.action_at(idx),
+            "entry_type": ENTRY_TYPES[self.entry_types[idx]],
+            "entry_price": self.price_at(idx),
+            "source": self.sources[idx],
+            "tags": mask_to_tags(self.tags[idx]),
+        }
+
+
+class SignalStore:
+    """サインのフォルダを読み、ファイルごとの読み取り結果を更新時刻とサイズで使い回す
+
+    read_file(path) は1ファイル分の Signals を返す関数（失敗時は例外）
+    """
+
+    def __init__(self, csv_dir, read_file):
+        self.csv_dir = csv_dir
+        self.read_file = read_file
+        # パス -> ((更新時刻, サイズ), Signals)
+        self.files = {}
+        self.merged_key = None
+        self.merged = None
+
+    def load(self):
+        """全ファイルを時刻順にまとめたサインとエラー文を返す。変わったファイルだけ読み直す"""
+        if not os.path.isdir(self.csv_dir):
+            return Signals(), ["サインの場所が見つかりません"]
+        paths = sorted(glob.glob(os.path.join(self.csv_dir, "*.csv")))
+        if not paths:
+            return Signals(), ["サインのファイルがありません"]
+
+        errors = []
+        parts = []
+        keys = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError as exc:
+                errors.append(f"{os.path.basename(path)} の読み込み失敗: {exc}")
+                continue
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            cached = self.files.get(path)
+            if cached is None or cached[0] != stamp:
+                try:
+                    cached = (stamp, self.read_file(path))
+                except Exception as exc:
+                    self.files.pop(path, None)
+                    errors.append(f"{os.path.basename(path)} の読み込み失敗: {exc}")
+                    continue
+                self.files[path] = cached
+            parts.append(cached[1])
+            keys.append((path, stamp))
+
+        # 消えたファイルの分は持ち続けない
+        for path in set(self.files) - set(paths):
+            del self.files[path]
+
+        merged_key = tuple(keys)
+        if merged_key != self.merged_key:
+            merged = Signals()
+            for part in parts:
+                merged.extend(part)
+            self.merged = merged.sorted()
+            self.merged_key = merged_key
+        return self.merged, errors
@@ -0,0 +1,239 @@
+import argparse
+import csv
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from bar_series import ExtremeIndex
+from cli import load_config
+from engine import (
+    CACHE_DIR,
+    CSV_DIR,
+    DATA_DIR,
+    JST_OFFSET,
+    build_params,
+    evaluate,
+    indicator_lookback,
+    load_indicator_bars,
+    load_ohlc_range,
+    load_signals,
+    parse_period,
+)
+
+
+# 総当たりで振る項目（画面の入力と同じ単位）
+SWEEP_KEYS = (
+    "stop_pips",
+    "limit_pips",
+    "spread_pips",
+    "time_limit_min",
+    "limit_offset_pips",
+    "limit_expire_min",
+    "bb_period",
+    "bb_sigma",
+    "ma_period",
+    "ma_threshold",
+)
+RESULT_COLUMNS = ("total_pips", "pf", "win_rate", "max_dd", "trades")
+# 振っても結果が変わらないよう、使う条件がオフの時は振れない項目
+SWEEP_ENABLE_FLAGS = {
+    "stop_pips": "stop_limit_enabled",
+    "limit_pips": "stop_limit_enabled",
+    "time_limit_min": "time_limit_enabled",
+    "bb_period": "bb_enabled",
+    "bb_sigma": "bb_enabled",
+    "ma_period": "ma_dev_enabled",
+    "ma_threshold": "ma_dev_enabled",
+}
+
+# 各プロセスで一度だけ受け取る足とサイン
+_worker_state = {}
+
+
+def expand_values(spec):
+    """[1, 2, 3] または {"start": 10, "stop": 30, "step": 5} を値の並びにする"""
+    if isinstance(spec, dict):
+        start = spec["start"]
+        stop = spec["stop"]
+        step = spec.get("step", 1)
+        if step <= 0:
+            raise ValueError("step は0より大きくしてください")
+        values = []
+        value = start
+        while value <= stop + 1e-9:
+            values.append(round(value, 10))
+            value += step
+        return values
+    if isinstance(spec, (list, tuple)):
+        return list(spec)
+    return [spec]
+
+
+def expand_grid(grid):
+    """項目ごとの候補から全組み合わせを作る"""
+    keys = [key for key in SWEEP_KEYS if key in grid]
+    unknown = sorted(set(grid) - set(SWEEP_KEYS))
+    if unknown:
+        raise ValueError(f"対象外の項目です: {', '.join(unknown)}")
+    value_lists = [expand_values(grid[key]) for key in keys]
+    return [dict(zip(keys, values)) for values in itertools.product(*value_lists)]
+
+
+def build_sweep_params(base_params, grid):
+    """全組み合わせと、それぞれを build_params で確かめた設定を返す。誤りはValueError"""
+    combos = expand_grid(grid)
+    base_params = build_params(base_params)
+    disabled = sorted(
+        key for key in grid if key in SWEEP_ENABLE_FLAGS and not base_params[SWEEP_ENABLE_FLAGS[key]]
+    )
+    if disabled:
+        flags = sorted({SWEEP_ENABLE_FLAGS[key] for key in disabled})
+        raise ValueError(f"{', '.join(disabled)} を振るには {', '.join(flags)} を有効にしてください")
+    params_list = []
+    for combo in combos:
+        try:
+            params_list.append(build_params(dict(base_params, **combo)))
+        except ValueError as exc:
+            values = ", ".join(f"{key}={value}" for key, value in combo.items())
+            raise ValueError(f"{values}: {exc}") from None
+    return combos, params_list
+
+
+def check_sort_key(key, grid):
+    """並べ替えの項目が結果の列か振る項目かを確かめる。誤りはValueError"""
+    choices = list(RESULT_COLUMNS) + [name for name in SWEEP_KEYS if name in grid]
+    if key not in choices:
+        raise ValueError(f"並べ替えの項目は {' / '.join(choices)} から選んでください")
+
+
+def _init_worker(bars, time_index, signals, indicator_bars=None):
+    _worker_state["bars"] = bars
+    _worker_state["time_index"] = time_index
+    _worker_state["signals"] = signals
+    _worker_state["indicator_bars"] = indicator_bars
+    _worker_state["extremes"] = ExtremeIndex.from_bars(bars)
+
+
+def _evaluate_combo(params):
+    _results, _counts, stats = evaluate(
+        _worker_state["bars"],
+        _worker_state["time_index"],
+        _worker_state["signals"],
+        params,
+        extremes=_worker_state["extremes"],
+        indicator_bars=_worker_state["indicator_bars"],
+    )
+    return {key: stats[key] for key in RESULT_COLUMNS}
+
+
+def run_sweep(bars, time_index, signals, base_params, grid, workers=None, indicator_bars=None):
+    """足とサインを一度だけ読み込んだ状態で、全組み合わせを並列に評価する"""
+    combos, params_list = build_sweep_params(base_params, grid)
+    if workers == 1 or len(params_list) <= 1:
+        _init_worker(bars, time_index, signals, indicator_bars)
+        stats_list = [_evaluate_combo(params) for params in params_list]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(bars, time_index, signals, indicator_bars),
+        ) as executor:
+            chunksize = max(1, len(params_list) // ((workers or os.cpu_count() or 1) * 4))
+            stats_list = list(executor.map(_evaluate_combo, params_list, chunksize=chunksize))
+    return [dict(combo, **stats) for combo, stats in zip(combos, stats_list)]
+
+
+def sort_rows(rows, key="total_pips", descending=True):
+    # PFが計算不可(None)の行は常に最後に回す
+    present = [row for row in rows if row.get(key) is not None]
+    missing = [row for row in rows if row.get(key) is None]
+    present.sort(key=lambda row: row[key], reverse=descending)
+    return present + missing
+
+
+def format_table(rows, limit=None):
+    if not rows:
+        return "結果なし"
+    columns = [key for key in rows[0] if key not in RESULT_COLUMNS] + list(RESULT_COLUMNS)
+
+    def cell(value):
+        if value is None:
+            return "-"
+        if isinstance(value, float):
+            return f"{value:.2f}"
+        return str(value)
+
+    shown = rows if limit is None else rows[:limit]
+    table = [columns] + [[cell(row.get(key)) for key in columns] for row in shown]
+    widths = [max(len(line[idx]) for line in table) for idx in range(len(columns))]
+    return "\n".join("  ".join(text.rjust(width) for text, width in zip(line, widths)) for line in table)
+
+
+def write_csv(rows, path):
+    if not rows:
+        return
+    columns = list(rows[0].keys())
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="バックテストの設定を総当たりで評価します")
+    parser.add_argument("config", help="設定ファイル(JSON/TOML)のパス")
+    parser.add_argument("--workers", type=int, default=None, help="同時に動かすプロセス数")
+    parser.add_argument("--sort", default="total_pips", help="並べ替えの項目")
+    parser.add_argument("--ascending", action="store_true", help="小さい順に並べる")
+    parser.add_argument("--top", type=int, default=30, help="画面に出す件数")
+    parser.add_argument("--out", default=None, help="全件をCSVで保存する場合のパス")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    try:
+        start_jst, end_jst = parse_period(config.get("start"), config.get("end"))
+        base_params = build_params(config.get("params", {}))
+        grid = config.get("grid", {})
+        combos, params_list = build_sweep_params(config.get("params", {}), grid)
+        check_sort_key(args.sort, grid)
+    except ValueError as exc:
+        print(f"エラー: {exc}", file=sys.stderr)
+        return 1
+    start_utc = start_jst - JST_OFFSET
+    end_utc = end_jst - JST_OFFSET
+
+    data_dir = config.get("data_dir", DATA_DIR)
+    cache_dir = config.get("cache_dir", CACHE_DIR)
+    bars, time_index, errors = load_ohlc_range(data_dir, start_utc, end_utc, cache_dir)
+    for item in errors:
+        print(item, file=sys.stderr)
+    if not bars:
+        print("足データが読み込めません", file=sys.stderr)
+        return 1
+    # 期間を振る場合も足りるよう、組み合わせの中で最長の期間に合わせて読む
+    lookback = max(indicator_lookback(params) for params in params_list) if params_list else 0
+    indicator_bars, errors = load_indicator_bars(
+        data_dir, start_utc, end_utc, base_params["indicator_tf"], lookback, cache_dir
+    )
+    for item in errors:
+        print(item, file=sys.stderr)
+
+    signals, errors = load_signals(config.get("csv_dir", CSV_DIR))
+    for item in errors:
+        print(item, file=sys.stderr)
+    signals = signals.between(start_utc, end_utc)
+    print(f"足: {len(bars)}本 サイン: {len(signals)}件 組み合わせ: {len(combos)}件")
+
+    rows = run_sweep(bars, time_index, signals, base_params, grid, args.workers, indicator_bars)
+    rows = sort_rows(rows, args.sort, descending=not args.ascending)
+    print(format_table(rows, args.top))
+    if args.out:
+        write_csv(rows, args.out)
+        print(f"保存: {args.out} ({len(rows)}件)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
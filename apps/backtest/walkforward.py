@@ -0,0 +1,216 @@
+import argparse
+import statistics
+import sys
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
+from bar_series import TimeIndex
+from cli import load_config
+from engine import (
+    CACHE_DIR,
+    CSV_DIR,
+    DATA_DIR,
+    JST_OFFSET,
+    apply_indicator_filters,
+    build_params,
+    evaluate,
+    filter_signals_by_tags,
+    indicator_lookback,
+    load_indicator_bars,
+    load_ohlc_range,
+    load_signals,
+    parse_period,
+)
+from sweep import RESULT_COLUMNS, format_table, write_csv
+from common.timeutil import JST_OFFSET_MIN, MINUTES_PER_DAY, minutes_to_date
+
+
+DEFAULT_WINDOW_DAYS = 5
+DEFAULT_STEP_DAYS = 1
+# 安定性を見る項目
+SUMMARY_COLUMNS = ("pf", "total_pips", "max_dd", "win_rate")
+
+# 各プロセスで一度だけ受け取る足とサイン
+_worker_state = {}
+
+
+def trading_days(bars):
+    """足のある日（日本時間）ごとに (日付, 最初の位置, 最後の次の位置) を返す"""
+    days = []
+    times = bars.times
+    start = 0
+    count = len(times)
+    while start < count:
+        day_start = (times[start] + JST_OFFSET_MIN) // MINUTES_PER_DAY * MINUTES_PER_DAY - JST_OFFSET_MIN
+        end = bisect_left(times, day_start + MINUTES_PER_DAY, start)
+        days.append((minutes_to_date(day_start + JST_OFFSET_MIN), start, end))
+        start = end
+    return days
+
+
+def build_windows(days, window_days, step_days):
+    """足のある日を window_days 日ずつ、step_days 日ずらしながら区切る（日数が足りない最後は除く）"""
+    if window_days < 1 or step_days < 1:
+        raise ValueError("期間とずらす日数は1以上にしてください")
+    windows = []
+    for first in range(0, len(days) - window_days + 1, step_days):
+        last = first + window_days - 1
+        windows.append(
+            {
+                "start_day": days[first][0].isoformat(),
+                "end_day": days[last][0].isoformat(),
+                "lo": days[first][1],
+                "hi": days[last][2],
+            }
+        )
+    return windows
+
+
+def prefilter_signals(bars, signals, params, indicator_bars=None):
+    """理由と値動きの絞り込みを、読み込んだ全期間の足で先にかける
+
+    期間ごとに切り出した足で指標を計算すると、各期間の頭の期間-1本は値が無くサインが落ちるため。
+    残ったサインと、絞り込みを済ませた扱いにした設定を返す
+    """
+    signals = filter_signals_by_tags(signals, params.get("tags"))
+    signals, _messages = apply_indicator_filters(
+        bars, TimeIndex(bars.times), signals, params, indicator_bars=indicator_bars
+    )
+    return signals, dict(params, tags=None, bb_enabled=False, ma_dev_enabled=False)
+
+
+def _init_worker(bars, signals, params):
+    _worker_state["bars"] = bars
+    _worker_state["signals"] = signals
+    _worker_state["params"] = params
+
+
+def _evaluate_window(window):
+    bars = _worker_state["bars"].slice(window["lo"], window["hi"])
+    minutes = _worker_state["signals"].times
+    lo = bisect_left(minutes, bars.times[0])
+    hi = bisect_right(minutes, bars.times[-1])
+    _results, _counts, stats = evaluate(
+        bars,
+        TimeIndex(bars.times),
+        _worker_state["signals"].slice(lo, hi),
+        _worker_state["params"],
+    )
+    return {key: stats[key] for key in RESULT_COLUMNS}
+
+
+def run_walk_forward(bars, signals, params, windows, workers=None, indicator_bars=None):
+    """読み込み済みの足とサインを期間ごとに切り出し、各期間を並列に評価する"""
+    signals, params = prefilter_signals(bars, signals, params, indicator_bars)
+    if workers == 1 or len(windows) <= 1:
+        _init_worker(bars, signals, params)
+        stats_list = [_evaluate_window(window) for window in windows]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(bars, signals, params),
+        ) as executor:
+            stats_list = list(executor.map(_evaluate_window, windows))
+    return [
+        dict({"start_day": window["start_day"], "end_day": window["end_day"]}, **stats)
+        for window, stats in zip(windows, stats_list)
+    ]
+
+
+def summarize(rows):
+    """期間ごとの結果から、項目ごとの平均・標準偏差・最小・最大をまとめる（PFが計算不可の期間は除く）"""
+    summary = {
+        "windows": len(rows),
+        "positive": sum(1 for row in rows if row["total_pips"] > 0),
+    }
+    for key in SUMMARY_COLUMNS:
+        values = [row[key] for row in rows if row[key] is not None]
+        if not values:
+            summary[key] = None
+            continue
+        summary[key] = {
+            "mean": statistics.fmean(values),
+            "stdev": statistics.stdev(values) if len(values) > 1 else 0.0,
+            "min": min(values),
+            "max": max(values),
+            "count": len(values),
+        }
+    return summary
+
+
+def format_summary(summary):
+    lines = [f"期間数: {summary['windows']} うちプラス: {summary['positive']}"]
+    for key in SUMMARY_COLUMNS:
+        item = summary[key]
+        if item is None:
+            lines.append(f"{key}: -")
+            continue
+        lines.append(
+            f"{key}: 平均 {item['mean']:.2f} 標準偏差 {item['stdev']:.2f} "
+            f"最小 {item['min']:.2f} 最大 {item['max']:.2f} ({item['count']}期間)"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="期間をずらしながらバックテストを繰り返し、結果の安定性を見ます")
+    parser.add_argument("config", help="設定ファイル(JSON/TOML)のパス")
+    parser.add_argument("--window", type=int, default=None, help="1期間の日数（足のある日で数える）")
+    parser.add_argument("--step", type=int, default=None, help="ずらす日数")
+    parser.add_argument("--workers", type=int, default=None, help="同時に動かすプロセス数")
+    parser.add_argument("--out", default=None, help="期間ごとの結果をCSVで保存する場合のパス")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    window_days = args.window or config.get("window_days", DEFAULT_WINDOW_DAYS)
+    step_days = args.step or config.get("step_days", DEFAULT_STEP_DAYS)
+    try:
+        start_jst, end_jst = parse_period(config.get("start"), config.get("end"))
+        params = build_params(config.get("params", {}))
+    except ValueError as exc:
+        print(f"エラー: {exc}", file=sys.stderr)
+        return 1
+    start_utc = start_jst - JST_OFFSET
+    end_utc = end_jst - JST_OFFSET
+
+    data_dir = config.get("data_dir", DATA_DIR)
+    cache_dir = config.get("cache_dir", CACHE_DIR)
+    bars, _time_index, errors = load_ohlc_range(data_dir, start_utc, end_utc, cache_dir)
+    for item in errors:
+        print(item, file=sys.stderr)
+    if not bars:
+        print("足データが読み込めません", file=sys.stderr)
+        return 1
+    indicator_bars, errors = load_indicator_bars(
+        data_dir, start_utc, end_utc, params["indicator_tf"], indicator_lookback(params), cache_dir
+    )
+    for item in errors:
+        print(item, file=sys.stderr)
+
+    signals, errors = load_signals(config.get("csv_dir", CSV_DIR))
+    for item in errors:
+        print(item, file=sys.stderr)
+    signals = signals.between(start_utc, end_utc)
+
+    try:
+        windows = build_windows(trading_days(bars), window_days, step_days)
+    except ValueError as exc:
+        print(f"エラー: {exc}", file=sys.stderr)
+        return 1
+    if not windows:
+        print(f"足のある日が{window_days}日に足りません", file=sys.stderr)
+        return 1
+    print(f"足: {len(bars)}本 サイン: {len(signals)}件 期間: {window_days}日ずつ{step_days}日ずらしで{len(windows)}件")
+
+    rows = run_walk_forward(bars, signals, params, windows, args.workers, indicator_bars)
+    print(format_table(rows))
+    print(format_summary(summarize(rows)))
+    if args.out:
+        write_csv(rows, args.out)
+        print(f"保存: {args.out} ({len(rows)}件)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
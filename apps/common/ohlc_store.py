@@ -0,0 +1,320 @@
+import csv
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+from common.timeutil import EPOCH_ORDINAL, JST_OFFSET_MIN, MINUTES_PER_DAY, datetime_to_minutes
+
+
+# キャッシュのヘッダ: 識別子, 元CSVの更新時刻(ns), 元CSVのサイズ, 本数, 始値の小数桁数
+CACHE_MAGIC = b"OHLCM1v2"
+CACHE_HEADER = struct.Struct("<8sqqqq")
+
+# 時間足の名前と1本の分数（区切りはUTC基準）
+TIMEFRAMES = {
+    "M1": 1,
+    "M5": 5,
+    "M15": 15,
+    "H1": 60,
+    "H4": 240,
+    "D1": 1440,
+}
+
+
+class OhlcColumns:
+    """1分足を列ごとの配列で持つ（時刻はUTCの経過分）
+
+    price_decimals は元CSVの始値の小数桁数（全行で同じ場合。混在や不明なら -1）
+    """
+
+    COLUMNS = ("times", "opens", "highs", "lows", "closes")
+    __slots__ = COLUMNS + ("price_decimals",)
+
+    def __init__(self):
+        self.times = array("q")
+        self.opens = array("d")
+        self.highs = array("d")
+        self.lows = array("d")
+        self.closes = array("d")
+        self.price_decimals = -1
+
+    def __len__(self):
+        return len(self.times)
+
+    def append(self, minutes, open_, high, low, close):
+        self.times.append(minutes)
+        self.opens.append(open_)
+        self.highs.append(high)
+        self.lows.append(low)
+        self.closes.append(close)
+
+    def extend(self, other):
+        # 小数桁数は、空に足す時は相手のものを使い、違う桁のものを足したら混在(-1)にする
+        other_decimals = getattr(other, "price_decimals", -1)
+        if not len(self):
+            self.price_decimals = other_decimals
+        elif len(other) and self.price_decimals != other_decimals:
+            self.price_decimals = -1
+        self.times.extend(other.times)
+        self.opens.extend(other.opens)
+        self.highs.extend(other.highs)
+        self.lows.extend(other.lows)
+        self.closes.extend(other.closes)
+
+    def columns(self):
+        return (self.times, self.opens, self.highs, self.lows, self.closes)
+
+    def is_sorted(self):
+        times = self.times
+        return all(times[i] <= times[i + 1] for i in range(len(times) - 1))
+
+    def sort(self):
+        order = sorted(range(len(self.times)), key=self.times.__getitem__)
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, (column[i] for i in order)))
+
+
+def resample(data, minutes):
+    """1分足の列を minutes 分足にまとめる（時刻は各足の始まり）"""
+    if minutes <= 1:
+        return data
+    result = OhlcColumns()
+    result.price_decimals = getattr(data, "price_decimals", -1)
+    times, opens, highs, lows, closes = data.columns()
+    count = len(times)
+    idx = 0
+    while idx < count:
+        bucket = times[idx] - times[idx] % minutes
+        # 足の終わりを二分探索し、高値・安値は配列の切り出しでまとめて求める
+        end = bisect_left(times, bucket + minutes, idx)
+        result.append(bucket, opens[idx], max(highs[idx:end]), min(lows[idx:end]), closes[end - 1])
+        idx = end
+    return result
+
+
+def merge_same_times(data):
+    """同じ時刻の足を1本にまとめる（日ごとのファイルの境目で分かれた足をつなぐ）"""
+    times = data.times
+    if all(times[i] < times[i + 1] for i in range(len(times) - 1)):
+        return data
+    result = OhlcColumns()
+    result.price_decimals = getattr(data, "price_decimals", -1)
+    for minutes, open_, high, low, close in zip(*data.columns()):
+        if len(result) and result.times[-1] == minutes:
+            if high > result.highs[-1]:
+                result.highs[-1] = high
+            if low < result.lows[-1]:
+                result.lows[-1] = low
+            result.closes[-1] = close
+        else:
+            result.append(minutes, open_, high, low, close)
+    return result
+
+
+def _first_value(row, indexes):
+    for idx in indexes:
+        if idx < len(row) and row[idx]:
+            return row[idx]
+    return 0
+
+
+def parse_m1_csv(path):
+    """1分足CSVを読み込んで列データにする（新旧フォーマット両対応）"""
+    result = OhlcColumns()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        # 最初の行を読んでフォーマットを判定
+        first_line = f.readline()
+        f.seek(0)
+
+        # デリミタを判定（カンマかタブ）
+        delimiter = "," if "," in first_line else "\t"
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, None)
+        if not header:
+            return result
+
+        def find(*names):
+            return [header.index(name) for name in names if name in header]
+
+        open_idx = find("Open", "open")
+        high_idx = find("High", "high")
+        low_idx = find("Low", "low")
+        close_idx = find("Close", "close")
+
+        # 新フォーマット: "Local time"列がある（GMT+0900 の日本時間）
+        # 旧フォーマット: "time"または"Time"列がある（UTC）
+        is_new_format = "Local time" in header
+        time_idx = find("Local time") if is_new_format else find("time", "Time")
+        day_cache = {}
+        # 始値の小数桁数（None=まだ無い、-1=混在）
+        decimals = None
+
+        for row in reader:
+            time_text = _first_value(row, time_idx)
+            if not time_text:
+                continue
+            if is_new_format:
+                minutes = parse_local_time_minutes(time_text, day_cache)
+                if minutes is None:
+                    continue
+                # JSTとして扱い、UTCに変換
+                minutes -= JST_OFFSET_MIN
+            else:
+                minutes = parse_legacy_time_minutes(time_text)
+                if minutes is None:
+                    continue
+            open_text = _first_value(row, open_idx)
+            try:
+                result.append(
+                    minutes,
+                    float(open_text),
+                    float(_first_value(row, high_idx)),
+                    float(_first_value(row, low_idx)),
+                    float(_first_value(row, close_idx)),
+                )
+            except ValueError:
+                continue
+            if decimals != -1 and isinstance(open_text, str):
+                dot = open_text.find(".")
+                digits = len(open_text) - dot - 1 if dot >= 0 else 0
+                if decimals is None:
+                    decimals = digits
+                elif decimals != digits:
+                    decimals = -1
+    if decimals is not None:
+        result.price_decimals = decimals
+    return result
+
+
+def parse_local_time_minutes(text, day_cache=None):
+    """"01.01.2026 00:00:00.000 GMT+0900" 形式を経過分に変換"""
+    # 定型の並びなら文字位置で切り出す（strptimeより大幅に速い）
+    if len(text) >= 19 and text[2] == "." and text[5] == "." and text[10] == " " and text[13] == ":":
+        day_key = text[:10]
+        days = day_cache.get(day_key) if day_cache is not None else None
+        try:
+            if days is None:
+                days = date(int(text[6:10]), int(text[3:5]), int(text[0:2])).toordinal() - EPOCH_ORDINAL
+                if day_cache is not None:
+                    day_cache[day_key] = days
+            return days * MINUTES_PER_DAY + int(text[11:13]) * 60 + int(text[14:16])
+        except ValueError:
+            pass
+    # "GMT+0900"部分を削除してからパース
+    text_clean = text.split("GMT")[0].strip()
+    try:
+        return datetime_to_minutes(datetime.strptime(text_clean, "%d.%m.%Y %H:%M:%S.%f"))
+    except ValueError:
+        return None
+
+
+def parse_legacy_time_minutes(text):
+    """"2026.01.16 00:00" 形式を経過分に変換"""
+    try:
+        return datetime_to_minutes(datetime.strptime(text.strip(), "%Y.%m.%d %H:%M"))
+    except ValueError:
+        return None
+
+
+def read_cache(cache_path, src_stat):
+    """元CSVと更新時刻・サイズが一致するキャッシュだけを読む"""
+    try:
+        with open(cache_path, "rb") as f:
+            header = f.read(CACHE_HEADER.size)
+            if len(header) != CACHE_HEADER.size:
+                return None
+            magic, mtime_ns, size, count, decimals = CACHE_HEADER.unpack(header)
+            if magic != CACHE_MAGIC or mtime_ns != src_stat.st_mtime_ns or size != src_stat.st_size:
+                return None
+            result = OhlcColumns()
+            result.price_decimals = decimals
+            for column in result.columns():
+                column.fromfile(f, count)
+            return result
+    except (OSError, EOFError, struct.error):
+        return None
+
+
+def write_cache(cache_path, src_stat, data):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(CACHE_HEADER.pack(CACHE_MAGIC, src_stat.st_mtime_ns, src_stat.st_size, len(data), data.price_decimals))
+        for column in data.columns():
+            column.tofile(f)
+    os.replace(tmp_path, cache_path)
+
+
+def day_csv_path(data_dir, day):
+    return os.path.join(data_dir, f"{day.year:04d}", f"{day:%Y-%m-%d}.csv")
+
+
+def day_cache_path(cache_dir, day, timeframe="M1"):
+    if timeframe != "M1":
+        # 1分足以外は時間足ごとのフォルダに分ける
+        cache_dir = os.path.join(cache_dir, timeframe)
+    return os.path.join(cache_dir, f"{day.year:04d}", f"{day:%Y-%m-%d}.bin")
+
+
+def load_day(data_dir, day, cache_dir=None, timeframe="M1"):
+    """1日分の足を読む。キャッシュが古ければ作り直す。ファイルが無ければNone"""
+    path = day_csv_path(data_dir, day)
+    try:
+        src_stat = os.stat(path)
+    except OSError:
+        return None
+    cache_path = day_cache_path(cache_dir, day, timeframe) if cache_dir else None
+    if cache_path:
+        cached = read_cache(cache_path, src_stat)
+        if cached is not None:
+            return cached
+    if timeframe != "M1":
+        # 1分足（そのキャッシュ）から作る。キャッシュは元CSVの更新時刻で見分ける
+        data = load_day(data_dir, day, cache_dir)
+        data = resample(data, TIMEFRAMES[timeframe])
+    else:
+        data = parse_m1_csv(path)
+        if not data.is_sorted():
+            data.sort()
+    if cache_path:
+        try:
+            write_cache(cache_path, src_stat, data)
+        except OSError:
+            pass
+    return data
+
+
+def load_range(data_dir, days, start_min=None, end_min=None, cache_dir=None, timeframe="M1"):
+    """複数日の足をまとめて読み、指定範囲（経過分）で絞り込む。範囲の始まりを含む足も残す"""
+    result = OhlcColumns()
+    errors = []
+    if start_min is not None:
+        start_min -= start_min % TIMEFRAMES[timeframe]
+    for day in days:
+        try:
+            data = load_day(data_dir, day, cache_dir, timeframe)
+        except Exception as exc:
+            errors.append(f"{day_csv_path(data_dir, day)} の読み込み失敗: {exc}")
+            continue
+        if data is None or not len(data):
+            continue
+        times = data.times
+        lo = bisect_left(times, start_min) if start_min is not None else 0
+        hi = bisect_right(times, end_min) if end_min is not None else len(times)
+        if lo == 0 and hi == len(times):
+            result.extend(data)
+            continue
+        part = OhlcColumns()
+        part.price_decimals = data.price_decimals
+        for name in OhlcColumns.COLUMNS:
+            setattr(part, name, getattr(data, name)[lo:hi])
+        result.extend(part)
+    if not result.is_sorted():
+        result.sort()
+    if timeframe != "M1":
+        # ファイルは日本時間の日ごとなので、4時間足・日足などは境目で2本に分かれる
+        result = merge_same_times(result)
+    return result, errors
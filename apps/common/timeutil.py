@@ -0,0 +1,189 @@
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+MINUTES_PER_DAY = 1440
+JST_OFFSET_MIN = 9 * 60
+
+
+def datetime_to_minutes(dt):
+    """datetimeを1970-01-01からの経過分に変換（秒以下は切り捨て）"""
+    return (dt.toordinal() - EPOCH_ORDINAL) * MINUTES_PER_DAY + dt.hour * 60 + dt.minute
+
+
+def minutes_to_datetime(minutes):
+    """経過分をdatetimeに戻す"""
+    return EPOCH + timedelta(minutes=int(minutes))
+
+
+def date_to_minutes(day):
+    """日付の0:00を経過分に変換"""
+    return (day.toordinal() - EPOCH_ORDINAL) * MINUTES_PER_DAY
+
+
+def minutes_to_date(minutes):
+    """経過分から日付を取り出す"""
+    return date.fromordinal(int(minutes) // MINUTES_PER_DAY + EPOCH_ORDINAL)
+
+
+# 投稿日時（例: 2026年1月16日 23:59）。年が無い形や秒付きも受け付ける
+POSTED_AT_RE = re.compile(r"(?:(\d{4})年)?\s*(\d{1,2})月\s*(\d{1,2})日\s*(\d{1,2}):(\d{2})(?::(\d{2}))?")
+ALT_POSTED_AT_RE = re.compile(r"(\d{4})[./-](\d{1,2})[./-](\d{1,2})\s*(\d{1,2}):(\d{2})(?::(\d{2}))?")
+POSTED_DATE_RE = re.compile(r"(?:(\d{4})年)?\s*(\d{1,2})月(\d{1,2})日")
+# AIの出力やサインの日時（例: 26.01.16 23:59）
+AI_DATETIME_RE = re.compile(r"^(\d{2})[.\-\/](\d{2})[.\-\/](\d{2})\s+(\d{2}):(\d{2})(?::(\d{2}))?$")
+NUMERIC_DATETIME_RE = re.compile(r"^(\d{4}|\d{2})([-/.])(\d{2})\2(\d{2}) (\d{2}):(\d{2})$")
+# 同じ分の文字列は何度も現れるので、読んだ結果を覚えておく件数
+PARSE_CACHE_SIZE = 65536
+
+
+def civil_to_minutes(year, month, day, hour, minute, second=0):
+    """年月日と時刻を経過分にする（存在しない日時はNone）"""
+    if not (0 <= hour < 24 and 0 <= minute < 60 and 0 <= second < 60):
+        return None
+    try:
+        ordinal = date(year, month, day).toordinal()
+    except ValueError:
+        return None
+    return (ordinal - EPOCH_ORDINAL) * MINUTES_PER_DAY + hour * 60 + minute
+
+
+def _canonical_posted_minutes(text):
+    """正規の形（YYYY年M月D日 HH:MM）だけを正規表現を使わずに読む。形が違えばNone"""
+    year, sep, rest = text.partition("年")
+    if not sep or len(year) != 4 or not year.isdigit():
+        return None
+    month, sep, rest = rest.partition("月")
+    if not sep or not 1 <= len(month) <= 2 or not month.isdigit():
+        return None
+    day, sep, rest = rest.partition("日 ")
+    if not sep or not 1 <= len(day) <= 2 or not day.isdigit():
+        return None
+    hour, sep, minute = rest.partition(":")
+    if not sep or not 1 <= len(hour) <= 2 or len(minute) != 2 or not hour.isdigit() or not minute.isdigit():
+        return None
+    return civil_to_minutes(int(year), int(month), int(day), int(hour), int(minute))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_posted_minutes(text, missing_year=None):
+    """投稿日時の文字列を経過分にする（秒は切り捨て）。年が無ければ missing_year を使う。読めなければNone"""
+    if not text:
+        return None
+    minutes = _canonical_posted_minutes(text)
+    if minutes is not None:
+        return minutes
+
+    match = POSTED_AT_RE.search(text)
+    if match:
+        year_text, month_text, day_text, hour_text, minute_text, second_text = match.groups()
+        year = int(year_text) if year_text else missing_year
+        if not year:
+            return None
+        return civil_to_minutes(
+            year, int(month_text), int(day_text), int(hour_text), int(minute_text), int(second_text or 0)
+        )
+
+    match = ALT_POSTED_AT_RE.search(text)
+    if match:
+        year_text, month_text, day_text, hour_text, minute_text, second_text = match.groups()
+        return civil_to_minutes(
+            int(year_text), int(month_text), int(day_text), int(hour_text), int(minute_text), int(second_text or 0)
+        )
+    return None
+
+
+def parse_posted_at(text, missing_year=None):
+    """投稿日時の文字列をdatetimeにする（読めなければNone）"""
+    minutes = parse_posted_minutes(text, missing_year)
+    return None if minutes is None else minutes_to_datetime(minutes)
+
+
+def posted_minutes_to_ts(minutes):
+    """投稿の日本時間の経過分を、ログに保存する ts（UNIX時間の秒）にする"""
+    return (minutes - JST_OFFSET_MIN) * 60
+
+
+def ts_to_posted_minutes(ts):
+    """ログの ts（UNIX時間の秒）を日本時間の経過分に戻す"""
+    return ts // 60 + JST_OFFSET_MIN
+
+
+def post_minutes(item, missing_year=None):
+    """ログ1行分の投稿日時（日本時間の経過分）。ts があればそれを使い、無ければ posted_at を読む"""
+    ts = item.get("ts")
+    if isinstance(ts, int) and not isinstance(ts, bool):
+        return ts_to_posted_minutes(ts)
+    posted_at = item.get("posted_at")
+    if not isinstance(posted_at, str):
+        return None
+    return parse_posted_minutes(posted_at, missing_year)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_posted_date(text, missing_year=None):
+    """投稿日時の文字列から日付だけを取り出す（時刻が無くてもよい）"""
+    if not text:
+        return None
+    minutes = parse_posted_minutes(text, missing_year)
+    if minutes is not None:
+        return minutes_to_date(minutes)
+    match = POSTED_DATE_RE.search(text)
+    if not match:
+        return None
+    year_text, month_text, day_text = match.groups()
+    year = int(year_text) if year_text else missing_year
+    if not year:
+        return None
+    try:
+        return date(year, int(month_text), int(day_text))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_ai_minutes(text):
+    """AIの出力の日時（YY.MM.DD HH:MM、秒は無視）を経過分にする（読めなければNone）"""
+    match = AI_DATETIME_RE.match(text or "")
+    if not match:
+        return None
+    yy, mm, dd, hh, mi, _ss = match.groups()
+    return civil_to_minutes(2000 + int(yy), int(mm), int(dd), int(hh), int(mi))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_datetime_minutes(text, formats):
+    """formats（strptimeの書式の並び）のどれかで読み、経過分にする（読めなければNone）
+
+    数字の日付と時刻（例: 26.01.16 23:59）は strptime を通さずに読む
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    match = NUMERIC_DATETIME_RE.match(text)
+    if match:
+        year_text, sep, month_text, day_text, hour_text, minute_text = match.groups()
+        year_fmt = "%Y" if len(year_text) == 4 else "%y"
+        if f"{year_fmt}{sep}%m{sep}%d %H:%M" in formats:
+            year = int(year_text)
+            if len(year_text) == 2:
+                # strptime の %y と同じく 69〜99 は1900年代
+                year += 1900 if year >= 69 else 2000
+            minutes = civil_to_minutes(year, int(month_text), int(day_text), int(hour_text), int(minute_text))
+            if minutes is not None:
+                return minutes
+    for fmt in formats:
+        try:
+            return datetime_to_minutes(datetime.strptime(text, fmt))
+        except ValueError:
+            pass
+    return None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def minutes_to_text(minutes, fmt="%Y-%m-%d %H:%M"):
+    """経過分を書式どおりの文字列にする"""
+    return minutes_to_datetime(minutes).strftime(fmt)
@@ -4,11 +4,30 @@ from datetime import date, datetime, timedelta
 import calendar
 import json
 import os
-import re
+import sys
 import threading
 import urllib.request
 import urllib.error
 
+APPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APPS_DIR not in sys.path:
+    sys.path.insert(0, APPS_DIR)
+
+from common.ohlc_store import load_day
+from common.timeutil import (
+    JST_OFFSET_MIN,
+    MINUTES_PER_DAY,
+    datetime_to_minutes,
+    minutes_to_date,
+    minutes_to_text,
+    parse_ai_minutes,
+    parse_datetime_minutes,
+    post_minutes,
+)
+from dispatcher import RateLimiter, estimate_tokens, iter_ordered
+from log_index import PostIndex
+from response_cache import ResponseCache
+
 class LogAnalyzerApp:
     def __init__(self, root):
         self.root = root
@@ -18,14 +37,20 @@ class LogAnalyzerApp:
 
         # ログディレクトリのパス
         self.logs_dir = r"C:\Users\USER\Desktop\FXlog\logs"
+        # ログの日別索引（ログディレクトリ内の .posts_index.json）
+        self.post_index = None
         # レートデータのパス（1分足）
         self.rates_dir = r"C:\Users\USER\Desktop\FXlog\data\usdjpy\m1"
+        # 1分足の列キャッシュ
+        self.rates_cache_dir = r"C:\Users\USER\Desktop\FXlog\data\usdjpy\m1_cache"
         # CSV出力先
         self.csv_dir = r"C:\Users\USER\Desktop\FXlog\csv"
         # プロンプトのパス
         self.prompt_path = os.path.join(os.path.dirname(__file__), "docs", "prompt.md")
         # アプリのパス
         self.app_dir = os.path.dirname(__file__)
+        # AI応答のキャッシュ（同じモデル・プロンプト・投稿内容なら再送しない）
+        self.response_cache = ResponseCache(os.path.join(self.app_dir, "response_cache"))
 
         # 処理中フラグ
         self.is_processing = False
@@ -51,6 +76,9 @@ class LogAnalyzerApp:
         # バッチ情報
         self.batch_job_name = ""
         self.batch_responses_file = ""
+        # バッチ送信時のキャッシュ: 送ったまとまりのキャッシュキーと、キャッシュから取れた本文
+        self.batch_cache_keys = {}
+        self.batch_cached_texts = {}
         # CSV自動保存
         self.auto_save_csv = tk.BooleanVar(value=True)
         # CSV既存ファイルの扱い
@@ -61,6 +89,10 @@ class LogAnalyzerApp:
         self.request_timeout = tk.IntVar(value=300)
         # 自動再試行の回数
         self.retry_count = tk.IntVar(value=3)
+        # 一括送信で同時に待つリクエスト数と1分あたりの上限（0は無制限）
+        self.max_in_flight = tk.IntVar(value=1)
+        self.rpm_limit = tk.IntVar(value=0)
+        self.tpm_limit = tk.IntVar(value=0)
         # 一括送信の開始まとまり
         self.auto_start_index = tk.IntVar(value=1)
         # 再開用に直近の失敗まとまりを記録
@@ -221,6 +253,37 @@ class LogAnalyzerApp:
             command=self.set_auto_start_from_current
         ).grid(row=3, column=6, sticky=tk.W, pady=(5, 0))
 
+        # 一括送信の同時数と上限
+        ttk.Label(condition_frame, text="同時送信数:").grid(row=4, column=0, sticky=tk.W, pady=(5, 0))
+        in_flight_spin = ttk.Spinbox(
+            condition_frame,
+            from_=1,
+            to=32,
+            textvariable=self.max_in_flight,
+            width=6
+        )
+        in_flight_spin.grid(row=4, column=1, padx=5, sticky=tk.W, pady=(5, 0))
+
+        ttk.Label(condition_frame, text="1分の回数上限:").grid(row=4, column=2, sticky=tk.W, pady=(5, 0))
+        rpm_spin = ttk.Spinbox(
+            condition_frame,
+            from_=0,
+            to=10000,
+            textvariable=self.rpm_limit,
+            width=6
+        )
+        rpm_spin.grid(row=4, column=3, padx=5, sticky=tk.W, pady=(5, 0))
+
+        ttk.Label(condition_frame, text="1分のトークン上限:").grid(row=4, column=4, sticky=tk.W, pady=(5, 0))
+        tpm_spin = ttk.Spinbox(
+            condition_frame,
+            from_=0,
+            to=100000000,
+            textvariable=self.tpm_limit,
+            width=10
+        )
+        tpm_spin.grid(row=4, column=5, padx=5, sticky=tk.W, pady=(5, 0))
+
         # 設定確認（1行）
         self.info_var = tk.StringVar(value="")
         info_label = ttk.Label(main_frame, textvariable=self.info_var)
@@ -229,6 +292,9 @@ class LogAnalyzerApp:
         # ステータス表示
         self.status_label = ttk.Label(main_frame, text="", foreground="blue")
         self.status_label.pack(pady=(0, 5))
+        self.cache_stats_var = tk.StringVar(value="")
+        ttk.Label(main_frame, textvariable=self.cache_stats_var).pack(pady=(0, 5))
+        self.update_cache_stats()
 
         # 変更時に自動更新
         for var in (
@@ -242,6 +308,7 @@ class LogAnalyzerApp:
             self.csv_mode,
             self.request_timeout,
             self.retry_count,
+            self.max_in_flight,
             self.auto_start_index,
         ):
             var.trace_add("write", lambda *_: self.update_info())
@@ -431,6 +498,7 @@ class LogAnalyzerApp:
             f"CSV自動保存: {'ON' if self.auto_save_csv.get() else 'OFF'}  "
             f"待ち時間: {self.request_timeout.get()}秒  "
             f"再試行: {self.retry_count.get()}回  "
+            f"同時送信: {self.max_in_flight.get()}  "
             f"開始まとまり: {self.auto_start_index.get()}"
         )
         self.info_var.set(info)
@@ -469,12 +537,10 @@ class LogAnalyzerApp:
                 parts = post.split("\t", 1)
                 if not parts:
                     continue
-                dt_text = parts[0].strip()
-                try:
-                    dt = datetime.strptime(dt_text, "%y-%m-%d %H:%M")
-                except ValueError:
+                post_min = parse_datetime_minutes(parts[0], ("%y-%m-%d %H:%M",))
+                if post_min is None:
                     continue
-                date_keys.add(dt.strftime("%Y%m%d"))
+                date_keys.add(minutes_to_text(post_min, "%Y%m%d"))
         return date_keys
 
     def _has_existing_csv_for_batches(self, start_idx):
@@ -641,7 +707,7 @@ class LogAnalyzerApp:
 
     def load_and_filter_posts(self):
         """ログを読み込んでフィルタリング"""
-        posts_with_dt = []  # (datetime, formatted_text) のタプルで保持
+        posts_with_dt = []  # (経過分, formatted_text) のタプルで保持
 
         # 開始日・終了日をdatetimeに変換
         try:
@@ -652,59 +718,47 @@ class LogAnalyzerApp:
         except ValueError:
             messagebox.showerror("エラー", "日付フォーマットが正しくありません")
             return []
+        # 投稿日時は経過分のまま整数で比べる
+        start_min = datetime_to_minutes(start_dt)
+        end_min = datetime_to_minutes(end_dt)
 
-        # 対象期間に関係しそうなファイルだけを拾う（ファイル名は参考にしない）
-        log_files = []
-        for f in os.listdir(self.logs_dir):
-            if not f.endswith(".jsonl"):
-                continue
-            file_path = os.path.join(self.logs_dir, f)
-            max_dt = self.get_file_max_date(file_path)
-            # ファイル内の最新日時が開始日より前なら除外
-            if max_dt and max_dt < start_dt:
-                continue
-            log_files.append(f)
-
-        for log_file in log_files:
-
-            file_path = os.path.join(self.logs_dir, log_file)
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if not line.strip():
-                        continue
+        # 索引を更新し、対象期間の日に当たる行だけを読む
+        if self.post_index is None or self.post_index.logs_dir != self.logs_dir:
+            self.post_index = PostIndex(self.logs_dir)
+        self.post_index.refresh()
 
-                    try:
-                        data = json.loads(line)
-                        posted_at = data.get('posted_at', '')
-                        text = data.get('text', '')
+        for line in self.post_index.iter_lines(start_dt, end_dt):
+            try:
+                data = json.loads(line)
+                text = data.get('text', '')
 
-                        # 日時をパース
-                        post_dt = self.parse_posted_at(posted_at)
-                        if post_dt is None:
-                            continue
+                # 日時（ts があれば文字列は読まない）
+                post_min = post_minutes(data)
+                if post_min is None:
+                    continue
 
-                        # 開始日より前ならスキップ
-                        if post_dt < start_dt:
-                            continue
+                # 開始日より前ならスキップ
+                if post_min < start_min:
+                    continue
 
-                        # 終了日より後なら除外（ファイルは新しい順のことがあるため終了しない）
-                        if post_dt > end_dt:
-                            continue
+                # 終了日より後なら除外（ファイルは新しい順のことがあるため終了しない）
+                if post_min > end_min:
+                    continue
 
-                        # 土日除外チェック
-                        if self.exclude_weekends.get():
-                            if not self.is_weekday_hour(post_dt):
-                                continue
+                # 土日除外チェック
+                if self.exclude_weekends.get():
+                    if not self.is_weekday_hour(post_min):
+                        continue
 
-                        # レートを取得（その時点の始値）
-                        open_rate = self.get_open_rate(post_dt)
+                # レートを取得（その時点の始値）
+                open_rate = self.get_open_rate(post_min)
 
-                        # フォーマット変換: YY-MM-DD HH:MM\t本文\t始値
-                        formatted = self.format_post(post_dt, text, open_rate)
-                        posts_with_dt.append((post_dt, formatted))
+                # フォーマット変換: YY-MM-DD HH:MM\t本文\t始値
+                formatted = self.format_post(post_min, text, open_rate)
+                posts_with_dt.append((post_min, formatted))
 
-                    except (json.JSONDecodeError, KeyError):
-                        continue
+            except (json.JSONDecodeError, KeyError):
+                continue
 
         # 日付順（古い順）にソート
         posts_with_dt.sort(key=lambda x: x[0])
@@ -712,37 +766,11 @@ class LogAnalyzerApp:
         # フォーマット済みテキストのみを返す
         return [formatted for _, formatted in posts_with_dt]
 
-    def parse_posted_at(self, posted_at):
-        """posted_atをdatetimeに変換 (例: '2026年1月16日 23:59')"""
-        match = re.search(r'(\d{4})年(\d{1,2})月(\d{1,2})日\s+(\d{1,2}):(\d{2})', posted_at)
-        if match:
-            year, month, day, hour, minute = match.groups()
-            return datetime(int(year), int(month), int(day), int(hour), int(minute))
-        return None
-
-    def get_file_max_date(self, file_path):
-        """ファイル内の最新日時を取得（最初の有効行）"""
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    if not line.strip():
-                        continue
-                    try:
-                        data = json.loads(line)
-                    except json.JSONDecodeError:
-                        continue
-                    posted_at = data.get("posted_at", "")
-                    post_dt = self.parse_posted_at(posted_at)
-                    if post_dt:
-                        return post_dt
-        except OSError:
-            return None
-        return None
-
-    def is_weekday_hour(self, post_dt):
-        """月7:00〜土6:59の範囲内か判定"""
-        weekday = post_dt.weekday()  # 0=月, 1=火, 2=水, 3=木, 4=金, 5=土, 6=日
-        hour = post_dt.hour
+    def is_weekday_hour(self, post_min):
+        """月7:00〜土6:59の範囲内か判定（post_min は日本時間の経過分）"""
+        # 1970-01-01 は木曜
+        weekday = (post_min // MINUTES_PER_DAY + 3) % 7  # 0=月, 1=火, 2=水, 3=木, 4=金, 5=土, 6=日
+        hour = post_min // 60 % 24
 
         # 月: 7:00以降
         if weekday == 0 and hour >= 7:
@@ -756,62 +784,39 @@ class LogAnalyzerApp:
         # 他は除外（月0:00〜6:59、日曜、土7:00以降）
         return False
 
-    def format_post(self, post_dt, text, open_rate):
+    def format_post(self, post_min, text, open_rate):
         """レスをフォーマット: YY-MM-DD HH:MM\t本文\t始値"""
-        date_str = post_dt.strftime("%y-%m-%d %H:%M")
+        date_str = minutes_to_text(post_min, "%y-%m-%d %H:%M")
         # 改行をスペースに置換（1行=1レスを維持）
         cleaned_text = text.replace('\n', ' ').replace('\r', ' ')
         rate_str = open_rate if open_rate else ""
         return f"{date_str}\t{cleaned_text}\t{rate_str}"
 
-    def get_open_rate(self, post_dt):
+    def get_open_rate(self, post_min):
         """投稿時点の始値を取得"""
-        date_key = post_dt.strftime("%Y-%m-%d")
-        minute_key = post_dt.strftime("%Y-%m-%d %H:%M")
+        date_key = post_min // MINUTES_PER_DAY
 
         if date_key not in self.rate_cache:
-            self.rate_cache[date_key] = self.load_rates_for_date(post_dt)
-
-        return self.rate_cache[date_key].get(minute_key, "")
-
-    def load_rates_for_date(self, post_dt):
-        """指定日の1分足データを読み込む"""
-        year_dir = post_dt.strftime("%Y")
-        date_str = post_dt.strftime("%Y-%m-%d")
-        file_path = os.path.join(self.rates_dir, year_dir, f"{date_str}.csv")
+            self.rate_cache[date_key] = self.load_rates_for_date(minutes_to_date(post_min))
 
-        rates = {}
-        if not os.path.exists(file_path):
-            return rates
+        return self.rate_cache[date_key].get(post_min, "")
 
+    def load_rates_for_date(self, day):
+        """指定日の1分足データを読み込む（日本時間の経過分 -> 始値の文字列）"""
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                header_skipped = False
-                for line in f:
-                    if not header_skipped:
-                        header_skipped = True
-                        continue
-                    line = line.strip()
-                    if not line:
-                        continue
-                    parts = line.split(",")
-                    if len(parts) < 2:
-                        continue
-                    time_raw = parts[0]
-                    open_rate = parts[1]
-
-                    # "01.01.2026 00:00:00.000 GMT+0900" -> "01.01.2026 00:00:00.000"
-                    time_main = time_raw.split(" GMT")[0]
-                    try:
-                        dt = datetime.strptime(time_main, "%d.%m.%Y %H:%M:%S.%f")
-                    except ValueError:
-                        continue
-                    minute_key = dt.strftime("%Y-%m-%d %H:%M")
-                    rates[minute_key] = open_rate
-        except OSError:
+            data = load_day(self.rates_dir, day, self.rates_cache_dir)
+        except Exception:
+            return {}
+        if data is None:
             return {}
 
-        return rates
+        # キャッシュはUTCで持っているので日本時間に戻す
+        # 始値は元のCSVと同じ表記にする（桁数が揃っていればその桁で、混在なら最短の表記で）
+        decimals = data.price_decimals
+        return {
+            minutes + JST_OFFSET_MIN: f"{open_rate:.{decimals}f}" if decimals >= 0 else repr(open_rate)
+            for minutes, open_rate in zip(data.times, data.opens)
+        }
 
     def show_results(self, posts):
         """結果を同一ウィンドウ内に表示"""
@@ -1028,7 +1033,6 @@ class LogAnalyzerApp:
 
         batch = self.batches[self.current_batch_index]
         batch_text = "\n".join(batch)
-        full_text = f"{prompt_text}\n\n【投稿内容】\n{batch_text}"
         timeout_seconds = max(30, int(self.request_timeout.get()))
 
         self.is_sending = True
@@ -1039,7 +1043,7 @@ class LogAnalyzerApp:
 
         thread = threading.Thread(
             target=self._send_to_gemini_thread,
-            args=(full_text, model, api_key, timeout_seconds)
+            args=(prompt_text, batch_text, model, api_key, timeout_seconds)
         )
         thread.start()
 
@@ -1157,81 +1161,98 @@ class LogAnalyzerApp:
         self.status_label.config(text="自動送信: 停止要求を受け付けました")
 
     def _auto_send_thread(self, prompt_text, model, api_key, start_idx):
-        """自動送信（バックグラウンド）"""
+        """自動送信（バックグラウンド）。複数を並行で送り、CSVはまとまりの順に書く"""
         total = len(self.batches)
         saved_rows_total = 0
         error_count_total = 0
         timeout_seconds = max(30, int(self.request_timeout.get()))
         retry_limit = max(0, int(self.retry_count.get()))
-
-        for idx in range(start_idx, total + 1):
-            if self.auto_stop_requested:
-                break
-
-            batch = self.batches[idx - 1]
-            self.root.after(0, lambda i=idx, t=total: self._show_auto_sending(i, t))
-            self.root.after(0, self.start_request_timer)
-            batch_text = "\n".join(batch)
-            full_text = f"{prompt_text}\n\n【投稿内容】\n{batch_text}"
-
+        max_in_flight = max(1, int(self.max_in_flight.get()))
+        limiter = RateLimiter(self.rpm_limit.get(), self.tpm_limit.get())
+        # 失敗で打ち切ったとき、送信中の他のまとまりの再試行も止める
+        aborted = threading.Event()
+
+        def should_stop():
+            return self.auto_stop_requested or aborted.is_set()
+
+        def request_batch(idx, batch_text):
+            """1まとまりを送る（再試行込み）。停止されたらNone"""
+            cache_key = self.response_cache.make_key(model, prompt_text, batch_text)
+            cached = self.response_cache.get(cache_key)
+            self.root.after(0, self.update_cache_stats)
+            if cached is not None:
+                return cached
+            full_text = self.build_full_text(prompt_text, batch_text)
             last_error = None
-            result_text = ""
             for attempt in range(1, retry_limit + 2):
-                if self.auto_stop_requested:
-                    break
+                if should_stop():
+                    return None
                 if attempt > 1:
                     self.root.after(
                         0,
                         lambda i=idx, t=total, a=attempt, r=retry_limit:
                         self._show_auto_retry(i, t, a, r)
                     )
-                    self.root.after(0, self.start_request_timer)
+                if not limiter.acquire(estimate_tokens(full_text), should_stop):
+                    return None
+                self.root.after(0, lambda i=idx, t=total: self._show_auto_sending(i, t))
                 try:
-                    result_text = self.call_gemini_api(
-                        full_text,
-                        model,
-                        api_key,
-                        timeout_seconds
-                    )
-                    last_error = None
-                    break
+                    result_text = self.call_gemini_api(full_text, model, api_key, timeout_seconds)
                 except Exception as e:
                     last_error = e
+                    continue
+                self.response_cache.put(cache_key, result_text)
+                return result_text
+            raise last_error
 
-            if self.auto_stop_requested:
-                break
-
-            if last_error is not None:
-                self.root.after(0, self.stop_request_timer)
-                self.root.after(0, lambda i=idx: self._update_auto_start_after_failure(i))
-                self.root.after(0, lambda: self._show_ai_error(str(last_error)))
-                return
+        def iter_tasks():
+            for idx in range(start_idx, total + 1):
+                yield idx, "\n".join(self.batches[idx - 1])
 
-            self.root.after(0, self.stop_request_timer)
-            rows, error_count = self.parse_ai_output(result_text)
-            error_count_total += error_count
-            saved_rows = 0
-            if self.auto_save_csv.get():
-                try:
-                    _, saved_rows = self.append_rows_to_csv(
-                        rows,
-                        self.csv_mode.get(),
-                        self.csv_touched_dates
-                    )
-                    saved_rows_total += saved_rows
-                except Exception as e:
+        self.root.after(0, self.start_request_timer)
+        results = iter_ordered(iter_tasks(), request_batch, max_in_flight, should_stop)
+        try:
+            for idx, result_text, error in results:
+                if error is not None:
+                    aborted.set()
+                    self.root.after(0, self.stop_request_timer)
                     self.root.after(0, lambda i=idx: self._update_auto_start_after_failure(i))
-                    self.root.after(0, lambda: self._show_ai_error(str(e)))
+                    self.root.after(0, lambda msg=str(error): self._show_ai_error(msg))
                     return
+                if result_text is None:
+                    # 停止要求で送らなかった分。ここから再開する
+                    break
 
-            next_start = min(idx + 1, total) if total > 0 else 1
-            self.root.after(0, lambda n=next_start: self._update_auto_start_after_success(n))
-            self.root.after(
-                0,
-                lambda res=result_text, i=idx, t=total, saved=saved_rows_total, err=error_count_total:
-                self._show_auto_progress(res, i, t, saved, err)
-            )
+                rows, error_count = self.parse_ai_output(result_text)
+                error_count_total += error_count
+                if self.auto_save_csv.get():
+                    try:
+                        _, saved_rows = self.append_rows_to_csv(
+                            rows,
+                            self.csv_mode.get(),
+                            self.csv_touched_dates
+                        )
+                        saved_rows_total += saved_rows
+                    except Exception as e:
+                        aborted.set()
+                        self.root.after(0, self.stop_request_timer)
+                        self.root.after(0, lambda i=idx: self._update_auto_start_after_failure(i))
+                        self.root.after(0, lambda msg=str(e): self._show_ai_error(msg))
+                        return
+
+                next_start = min(idx + 1, total) if total > 0 else 1
+                self.root.after(0, lambda n=next_start: self._update_auto_start_after_success(n))
+                self.root.after(
+                    0,
+                    lambda res=result_text, i=idx, t=total, saved=saved_rows_total, err=error_count_total:
+                    self._show_auto_progress(res, i, t, saved, err)
+                )
+                # 次のまとまりの応答待ちを計り直す
+                self.root.after(0, self.start_request_timer)
+        finally:
+            results.close()
 
+        self.root.after(0, self.stop_request_timer)
         self.root.after(0, self._finish_auto_send)
 
     def _show_auto_progress(self, text, index, total, saved_rows, error_rows):
@@ -1311,7 +1332,14 @@ class LogAnalyzerApp:
         """バッチ送信処理（バックグラウンド）"""
         jsonl_path = ""
         try:
-            jsonl_path = self.create_batch_jsonl(prompt_text)
+            pending = self.prepare_batch_cache(prompt_text, model)
+            self.root.after(0, self.update_cache_stats)
+            if not pending:
+                # 全てキャッシュにあるのでバッチは作らずに結果を出す
+                result_text = self.merge_batch_outputs([])
+                self.root.after(0, lambda: self._show_batch_result(result_text, "キャッシュ"))
+                return
+            jsonl_path = self.create_batch_jsonl(prompt_text, pending)
             file_name = self.upload_batch_file(jsonl_path, api_key)
             batch_name = self.create_batch_job(file_name, model, api_key)
             self.root.after(0, lambda: self._show_batch_created(batch_name))
@@ -1418,11 +1446,14 @@ class LogAnalyzerApp:
             response = job.get("response", {}) if isinstance(job, dict) else {}
             if response_file:
                 raw_text = self.download_batch_file(response_file, api_key)
-                result_text = self.parse_batch_output(raw_text)
+                result_text = self.merge_batch_outputs(self.collect_batch_output(raw_text))
             elif isinstance(response, dict) and response.get("inlinedResponses"):
-                result_text = self.format_inline_responses(response.get("inlinedResponses"))
+                result_text = self.merge_batch_outputs(
+                    self.collect_inline_responses(response.get("inlinedResponses"))
+                )
             else:
                 result_text = json.dumps(job, ensure_ascii=False, indent=2)
+            self.root.after(0, self.update_cache_stats)
 
             self.root.after(0, lambda: self._show_batch_result(result_text, state))
         except Exception as e:
@@ -1443,15 +1474,64 @@ class LogAnalyzerApp:
         self.stop_request_timer()
         self.update_batch_buttons()
 
-    def create_batch_jsonl(self, prompt_text):
-        """バッチ用のJSONLを作成"""
+    def build_full_text(self, prompt_text, batch_text):
+        """AIに送る本文を組み立てる"""
+        return f"{prompt_text}\n\n【投稿内容】\n{batch_text}"
+
+    def update_cache_stats(self):
+        """キャッシュの利用状況を表示"""
+        hits, misses = self.response_cache.stats()
+        self.cache_stats_var.set(f"応答キャッシュ: 利用 {hits}件 / 新規 {misses}件")
+
+    def prepare_batch_cache(self, prompt_text, model):
+        """キャッシュにあるまとまりを先に取り出し、送る必要がある番号を返す"""
+        self.batch_cache_keys = {}
+        self.batch_cached_texts = {}
+        pending = []
+        for idx, batch in enumerate(self.batches, start=1):
+            key = f"batch_{idx}"
+            cache_key = self.response_cache.make_key(model, prompt_text, "\n".join(batch))
+            cached = self.response_cache.get(cache_key)
+            if cached is None:
+                self.batch_cache_keys[key] = cache_key
+                pending.append(idx)
+            else:
+                self.batch_cached_texts[key] = cached
+        return pending
+
+    def merge_batch_outputs(self, outputs):
+        """バッチの結果にキャッシュ分を合わせ、まとまり番号順に整形する"""
+        entries = []
+        fetched_keys = set()
+        for key, text, ok in outputs:
+            if key:
+                fetched_keys.add(key)
+            if ok and key in self.batch_cache_keys:
+                self.response_cache.put(self.batch_cache_keys[key], text)
+            entries.append((key, text))
+        for key, text in self.batch_cached_texts.items():
+            if key not in fetched_keys:
+                entries.append((key, text))
+
+        def order(entry):
+            key = entry[0] or ""
+            suffix = key.rsplit("_", 1)[-1]
+            return (0, int(suffix)) if suffix.isdigit() else (1, 0)
+
+        entries.sort(key=order)
+        return "\n\n".join(f"[{key}] {text}" if key else text for key, text in entries)
+
+    def create_batch_jsonl(self, prompt_text, indexes=None):
+        """バッチ用のJSONLを作成（indexes を渡すとその番号のまとまりだけ）"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         file_path = os.path.join(self.app_dir, f"batch_requests_{timestamp}.jsonl")
+        if indexes is None:
+            indexes = range(1, len(self.batches) + 1)
 
         with open(file_path, "w", encoding="utf-8") as f:
-            for idx, batch in enumerate(self.batches, start=1):
-                batch_text = "\n".join(batch)
-                full_text = f"{prompt_text}\n\n【投稿内容】\n{batch_text}"
+            for idx in indexes:
+                batch_text = "\n".join(self.batches[idx - 1])
+                full_text = self.build_full_text(prompt_text, batch_text)
                 request = {
                     "contents": [
                         {
@@ -1619,60 +1699,56 @@ class LogAnalyzerApp:
             raise Exception(error_body) from e
         return body
 
-    def parse_batch_output(self, raw_text):
-        """バッチ結果のJSONLを整形"""
-        lines = raw_text.splitlines()
+    def collect_batch_output(self, raw_text):
+        """バッチ結果のJSONLを (キー, 本文, 成功したか) の並びにする"""
         outputs = []
 
-        for line in lines:
+        for line in raw_text.splitlines():
             if not line.strip():
                 continue
             try:
                 item = json.loads(line)
             except json.JSONDecodeError:
-                outputs.append(line)
+                outputs.append((None, line, False))
                 continue
 
             key = item.get("key")
             if not key and isinstance(item.get("metadata"), dict):
                 key = item.get("metadata", {}).get("key")
 
+            ok = False
             if "error" in item:
                 message = item.get("error", {}).get("message", "不明なエラー")
                 text = f"エラー: {message}"
             else:
                 response = item.get("response") if isinstance(item.get("response"), dict) else item
                 text = self.extract_response_text(response)
+                ok = bool(text)
                 if not text:
                     text = json.dumps(item, ensure_ascii=False)
+            outputs.append((key, text, ok))
 
-            if key:
-                outputs.append(f"[{key}] {text}")
-            else:
-                outputs.append(text)
-
-        return "\n\n".join(outputs)
+        return outputs
 
-    def format_inline_responses(self, responses):
-        """インライン結果を整形"""
+    def collect_inline_responses(self, responses):
+        """インライン結果を (キー, 本文, 成功したか) の並びにする"""
         outputs = []
         for item in responses:
             key = None
             if isinstance(item, dict) and isinstance(item.get("metadata"), dict):
                 key = item.get("metadata", {}).get("key")
+            ok = False
             if isinstance(item, dict) and "error" in item:
                 message = item.get("error", {}).get("message", "不明なエラー")
                 text = f"エラー: {message}"
             else:
                 response = item.get("response") if isinstance(item, dict) else {}
                 text = self.extract_response_text(response)
+                ok = bool(text)
                 if not text:
                     text = json.dumps(item, ensure_ascii=False)
-            if key:
-                outputs.append(f"[{key}] {text}")
-            else:
-                outputs.append(text)
-        return "\n\n".join(outputs)
+            outputs.append((key, text, ok))
+        return outputs
 
     def extract_response_text(self, response):
         """応答から本文を取り出す"""
@@ -1689,13 +1765,19 @@ class LogAnalyzerApp:
                 texts.append(part.get("text", ""))
         return "".join(texts).strip()
 
-    def _send_to_gemini_thread(self, full_text, model, api_key, timeout_seconds):
+    def _send_to_gemini_thread(self, prompt_text, batch_text, model, api_key, timeout_seconds):
         """送信処理（バックグラウンド）"""
         try:
-            result_text = self.call_gemini_api(full_text, model, api_key, timeout_seconds)
+            cache_key = self.response_cache.make_key(model, prompt_text, batch_text)
+            result_text = self.response_cache.get(cache_key)
+            if result_text is None:
+                full_text = self.build_full_text(prompt_text, batch_text)
+                result_text = self.call_gemini_api(full_text, model, api_key, timeout_seconds)
+                self.response_cache.put(cache_key, result_text)
+            self.root.after(0, self.update_cache_stats)
             self.root.after(0, lambda: self._show_ai_result(result_text))
         except Exception as e:
-            self.root.after(0, lambda: self._show_ai_error(str(e)))
+            self.root.after(0, lambda msg=str(e): self._show_ai_error(msg))
 
     def _show_ai_result(self, text):
         """送信結果を表示"""
@@ -1870,23 +1952,10 @@ class LogAnalyzerApp:
 
     def parse_ai_datetime(self, dt_raw):
         """AI出力の日時を解析"""
-        match = re.match(r"^(\d{2})[.\-\/](\d{2})[.\-\/](\d{2})\s+(\d{2}):(\d{2})(?::(\d{2}))?$", dt_raw)
-        if not match:
+        minutes = parse_ai_minutes(dt_raw)
+        if minutes is None:
             return None
-        yy, mm, dd, hh, mi, _ = match.groups()
-        try:
-            year = 2000 + int(yy)
-            month = int(mm)
-            day = int(dd)
-            hour = int(hh)
-            minute = int(mi)
-            datetime(int(year), month, day, hour, minute)
-        except ValueError:
-            return None
-
-        date_key = f"{year:04d}{month:02d}{day:02d}"
-        datetime_str = f"{int(yy):02d}.{month:02d}.{day:02d} {hour:02d}:{minute:02d}"
-        return {"date_key": date_key, "datetime": datetime_str}
+        return {"date_key": minutes_to_text(minutes, "%Y%m%d"), "datetime": minutes_to_text(minutes, "%y.%m.%d %H:%M")}
 
     def load_prompt_text(self):
         """プロンプトを読み込む"""
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+WINDOW_SECONDS = 60.0
+
+
+def estimate_tokens(text):
+    """送信文のトークン数の見積もり（日本語が中心なので1文字≒1トークンと多めに見る）"""
+    return max(1, len(text))
+
+
+class RateLimiter:
+    """直近1分間のリクエスト数とトークン数を上限内に収める（0は無制限）"""
+
+    def __init__(self, rpm=0, tpm=0):
+        self.rpm = max(0, int(rpm))
+        self.tpm = max(0, int(tpm))
+        self.lock = threading.Lock()
+        self.history = deque()  # (送信時刻, トークン数)
+        self.tokens_in_window = 0
+
+    def _expire(self, now):
+        while self.history and now - self.history[0][0] >= WINDOW_SECONDS:
+            _, tokens = self.history.popleft()
+            self.tokens_in_window -= tokens
+
+    def _wait_seconds(self, now, tokens):
+        """今送れるなら0、そうでなければ枠が空くまでの秒数"""
+        waits = [0.0]
+        if self.rpm and len(self.history) >= self.rpm:
+            waits.append(self.history[len(self.history) - self.rpm][0] + WINDOW_SECONDS - now)
+        if self.tpm and self.history and self.tokens_in_window + tokens > self.tpm:
+            # 古い順に抜けていったときに収まる時刻を探す（1件で上限を超える場合は空になるまで待つ）
+            remaining = self.tokens_in_window
+            for sent_at, sent_tokens in self.history:
+                remaining -= sent_tokens
+                if remaining + tokens <= self.tpm:
+                    break
+            waits.append(sent_at + WINDOW_SECONDS - now)
+        return max(waits)
+
+    def acquire(self, tokens, should_stop=None):
+        """枠が空くまで待って記録する。停止されたらFalse"""
+        while True:
+            if should_stop and should_stop():
+                return False
+            with self.lock:
+                now = time.monotonic()
+                self._expire(now)
+                wait = self._wait_seconds(now, tokens)
+                if wait <= 0:
+                    self.history.append((now, tokens))
+                    self.tokens_in_window += tokens
+                    return True
+            # 停止に気付けるよう細かく区切って待つ
+            time.sleep(min(wait, 0.5))
+
+
+def iter_ordered(tasks, func, max_in_flight, should_stop=None):
+    """tasks の (key, 引数) を最大 max_in_flight 件ずつ並行で func(key, 引数) に渡し、
+    投入順に (key, 結果, 例外) を返す。停止後は新しく投入せず、投入済みの分だけ返す
+    """
+    tasks = iter(tasks)
+    max_in_flight = max(1, int(max_in_flight))
+    in_flight = deque()
+    executor = ThreadPoolExecutor(max_workers=max_in_flight)
+    try:
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < max_in_flight:
+                if should_stop and should_stop():
+                    exhausted = True
+                    break
+                try:
+                    key, arg = next(tasks)
+                except StopIteration:
+                    exhausted = True
+                    break
+                in_flight.append((key, executor.submit(func, key, arg)))
+            if not in_flight:
+                return
+            key, future = in_flight.popleft()
+            try:
+                yield key, future.result(), None
+            except Exception as exc:
+                yield key, None, exc
+    finally:
+        # 途中で打ち切られた場合、まだ始まっていない分は取り消す
+        for _, future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=False)
@@ -0,0 +1,142 @@
+import json
+import os
+from datetime import timedelta
+
+from common.timeutil import minutes_to_text, post_minutes
+
+
+INDEX_FILE_NAME = ".posts_index.json"
+INDEX_VERSION = 1
+
+
+def scan_log_file(file_path, stat):
+    """1ファイルを読み、投稿日ごとのバイト範囲と最古・最新の日時をまとめる"""
+    days = {}
+    lines = 0
+    min_key = None
+    max_key = None
+    offset = 0
+    with open(file_path, "rb") as f:
+        for raw in f:
+            start = offset
+            offset += len(raw)
+            if not raw.strip():
+                continue
+            try:
+                data = json.loads(raw)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            if not isinstance(data, dict):
+                continue
+            post_min = post_minutes(data)
+            if post_min is None:
+                continue
+            lines += 1
+            dt_key = minutes_to_text(post_min)
+            if min_key is None or dt_key < min_key:
+                min_key = dt_key
+            if max_key is None or dt_key > max_key:
+                max_key = dt_key
+            # 同じ日の行が続く間は1つの範囲にまとめる
+            spans = days.setdefault(dt_key[:10], [])
+            if spans and spans[-1][1] == start:
+                spans[-1][1] = offset
+            else:
+                spans.append([start, offset])
+    return {
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "lines": lines,
+        "min": min_key,
+        "max": max_key,
+        "days": days,
+    }
+
+
+class PostIndex:
+    """ログファイルごとの投稿日範囲と日別のバイト位置を保持する索引"""
+
+    def __init__(self, logs_dir, index_path=None):
+        self.logs_dir = logs_dir
+        self.index_path = index_path or os.path.join(logs_dir, INDEX_FILE_NAME)
+        self.files = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION:
+            self.files = data.get("files", {})
+
+    def save(self):
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "files": self.files}, f, ensure_ascii=True)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # 書けない場所でも今回の抽出には使える
+            pass
+
+    def refresh(self):
+        """更新・追加・削除されたファイルだけ索引を作り直す。作り直した件数を返す"""
+        names = sorted(f for f in os.listdir(self.logs_dir) if f.endswith(".jsonl"))
+        changed = 0
+        for name in names:
+            file_path = os.path.join(self.logs_dir, name)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            entry = self.files.get(name)
+            if entry and entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size:
+                continue
+            self.files[name] = scan_log_file(file_path, stat)
+            changed += 1
+        removed = [name for name in self.files if name not in names]
+        for name in removed:
+            del self.files[name]
+        if changed or removed:
+            self.save()
+        return changed + len(removed)
+
+    def iter_lines(self, start_dt, end_dt):
+        """期間内の日に当たる行だけをファイルから切り出して返す（bytes）"""
+        start_key = start_dt.strftime("%Y-%m-%d %H:%M")
+        end_key = end_dt.strftime("%Y-%m-%d %H:%M")
+        day_keys = []
+        day = start_dt.date()
+        while day <= end_dt.date():
+            day_keys.append(day.strftime("%Y-%m-%d"))
+            day += timedelta(days=1)
+
+        for name in sorted(self.files):
+            entry = self.files[name]
+            if not entry.get("lines") or entry["max"] < start_key or entry["min"] > end_key:
+                continue
+            file_path = os.path.join(self.logs_dir, name)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            if entry.get("mtime_ns") != stat.st_mtime_ns or entry.get("size") != stat.st_size:
+                # 索引を作った後に書き換えられていれば、その場で作り直す
+                entry = scan_log_file(file_path, stat)
+                self.files[name] = entry
+                self.save()
+            spans = []
+            for key in day_keys:
+                spans.extend(entry["days"].get(key, ()))
+            if not spans:
+                continue
+            spans.sort()
+            with open(file_path, "rb") as f:
+                for start, end in spans:
+                    f.seek(start)
+                    chunk = f.read(end - start)
+                    for line in chunk.splitlines():
+                        if line.strip():
+                            yield line
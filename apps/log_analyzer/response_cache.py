@@ -0,0 +1,110 @@
+import hashlib
+import os
+import threading
+
+
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+# 上限を超えたら、この割合まで古いものから消す
+EVICT_TARGET_RATIO = 0.9
+
+
+class ResponseCache:
+    """AIの応答本文を (モデル, プロンプト, 投稿内容) のハッシュで保存する"""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = None
+
+    @staticmethod
+    def make_key(model, prompt_text, batch_text):
+        digest = hashlib.sha256()
+        for part in (model, prompt_text, batch_text):
+            data = part.encode("utf-8")
+            # 区切り位置が変わっても同じキーにならないよう長さも混ぜる
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".txt")
+
+    def get(self, key):
+        """保存済みなら本文を返す（使った時刻を更新して消されにくくする）"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            with self.lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self.lock:
+            self.hits += 1
+        return text
+
+    def put(self, key, text):
+        path = self._path(key)
+        data = text.encode("utf-8")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = self._scan_size()
+            else:
+                self.total_bytes += len(data) - old_size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _iter_files(self):
+        try:
+            subdirs = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for sub in subdirs:
+            sub_path = os.path.join(self.cache_dir, sub)
+            if not os.path.isdir(sub_path):
+                continue
+            for name in os.listdir(sub_path):
+                if name.endswith(".txt"):
+                    path = os.path.join(sub_path, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat
+
+    def _scan_size(self):
+        return sum(stat.st_size for _, stat in self._iter_files())
+
+    def _evict(self):
+        files = sorted(self._iter_files(), key=lambda item: item[1].st_mtime)
+        total = sum(stat.st_size for _, stat in files)
+        target = int(self.max_bytes * EVICT_TARGET_RATIO)
+        for path, stat in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= stat.st_size
+        self.total_bytes = total
+
+    def stats(self):
+        with self.lock:
+            return self.hits, self.misses
@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Iterable, Optional
+
+APPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APPS_DIR not in sys.path:
+    sys.path.insert(0, APPS_DIR)
+
+from common.timeutil import parse_posted_minutes, posted_minutes_to_ts
+
+
+def iter_log_paths(inputs: Iterable[str]) -> Iterable[Path]:
+    for text in inputs:
+        path = Path(text)
+        if path.is_dir():
+            yield from sorted(path.rglob("*.jsonl"))
+        elif path.exists():
+            yield path
+        else:
+            raise SystemExit(f"入力が見つかりません: {path}")
+
+
+def add_ts_to_file(path: Path, missing_year: Optional[int], dry_run: bool) -> tuple[int, int]:
+    """ts の無い行に ts を足す。足した行数と、日時が読めなかった行数を返す"""
+    added = 0
+    failed = 0
+    lines = []
+    with path.open("r", encoding="utf-8", newline="") as f:
+        for raw in f:
+            body = raw.rstrip("\r\n")
+            ending = raw[len(body):]
+            bom = ""
+            if not lines and body.startswith("\ufeff"):
+                bom = "\ufeff"
+                body = body[1:]
+            try:
+                obj = json.loads(body) if body.strip() else None
+            except json.JSONDecodeError:
+                obj = None
+            if not isinstance(obj, dict) or "ts" in obj:
+                lines.append(raw)
+                continue
+            minutes = parse_posted_minutes(str(obj.get("posted_at") or ""), missing_year)
+            if minutes is None:
+                failed += 1
+                lines.append(raw)
+                continue
+            obj["ts"] = posted_minutes_to_ts(minutes)
+            lines.append(bom + json.dumps(obj, ensure_ascii=False) + (ending or "\n"))
+            added += 1
+
+    if added and not dry_run:
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8", newline="") as f:
+            f.writelines(lines)
+        os.replace(tmp_path, path)
+    return added, failed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="保存済みのjsonlログに日時の数値(ts)を書き足します")
+    parser.add_argument("inputs", nargs="+", help="jsonlファイルまたはフォルダ(複数可)")
+    parser.add_argument("--missing-year", type=int, default=None, help="年が無い場合の年(省略時はその行を飛ばす)")
+    parser.add_argument("--dry-run", action="store_true", help="書き換えずに件数だけ表示する")
+    args = parser.parse_args()
+
+    files = 0
+    changed = 0
+    total_added = 0
+    total_failed = 0
+    for path in iter_log_paths(args.inputs):
+        files += 1
+        added, failed = add_ts_to_file(path, args.missing_year, args.dry_run)
+        total_added += added
+        total_failed += failed
+        if added:
+            changed += 1
+        if failed:
+            print(f"日時が読めない行: {path} {failed}行")
+
+    print(f"対象ファイル数: {files}")
+    print(f"{'書き換え予定' if args.dry_run else '書き換え'}ファイル数: {changed}")
+    print(f"ts を足した行数: {total_added}")
+    if total_failed:
+        print(f"日時が読めない行数: {total_failed}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,18 +1,29 @@
 import calendar
+import glob
 import json
 import os
 import queue
 import random
 import re
+import sys
 import threading
 import time
+import urllib.error
 import urllib.parse
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
-from html.parser import HTMLParser
 import tkinter as tk
 from tkinter import ttk
 
+APPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APPS_DIR not in sys.path:
+    sys.path.insert(0, APPS_DIR)
+
+from common.timeutil import parse_posted_date, parse_posted_minutes, posted_minutes_to_ts
+from comment_parser import parse_comments
+from http_pool import ConnectionPool
+from page_archive import PageArchive
+
 
 LISTVIEW_URL = "https://finance.yahoo.co.jp/cm/ds/comment/listview"
 THREAD_URL = "https://finance.yahoo.co.jp/cm/message/552023129/usdjpy/{part}"
@@ -24,6 +35,10 @@ MISSING_YEAR_DEFAULT = 2026
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 LOG_DIR = os.path.join(BASE_DIR, "logs")
+# 取得途中の状態（番号ごとの位置と取得済みコメント）
+CHECKPOINT_DIR = os.path.join(LOG_DIR, "partial")
+# 取得したページの断片（生データ保存をオンにした場合）
+ARCHIVE_DIR = os.path.join(LOG_DIR, "archive")
 SETTINGS_PATH = os.path.join(BASE_DIR, "settings.json")
 SLEEP_MIN_DEFAULT = 0.2
 SLEEP_MAX_DEFAULT = 0.3
@@ -33,113 +48,14 @@ EXTRA2_SLEEP_MIN_DEFAULT = 15
 EXTRA2_SLEEP_MAX_DEFAULT = 30
 EXTRA_PAGES_DEFAULT = 50
 EXTRA2_PAGES_DEFAULT = 200
-
-
-class CommentParser(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.comments = []
-        self._in_comment = False
-        self._comment_depth = 0
-        self._current = None
-        self._capture_com_num = False
-        self._capture_text = False
-        self._capture_time = False
-        self._text_parts = []
-        self._num_parts = []
-        self._time_parts = []
-
-    def handle_starttag(self, tag, attrs):
-        attr = dict(attrs)
-        if tag == "li":
-            li_id = attr.get("id", "")
-            if (not self._in_comment) and li_id.startswith("c") and li_id[1:].isdigit():
-                self._in_comment = True
-                self._comment_depth = 1
-                self._current = {"comment_no": int(li_id[1:])}
-            elif self._in_comment:
-                self._comment_depth += 1
-
-        if not self._in_comment:
-            return
-
-        if tag == "div" and "comment" in attr.get("class", ""):
-            comment_id = attr.get("data-comment")
-            if comment_id:
-                self._current.setdefault("comment_id", comment_id)
-
-        if tag == "span" and attr.get("class") == "comNum":
-            self._capture_com_num = True
-            self._num_parts = []
-
-        if tag == "p" and attr.get("class") == "comText":
-            self._capture_text = True
-            self._text_parts = []
-
-        if tag == "a":
-            user_id = attr.get("data-user")
-            if user_id:
-                self._current.setdefault("user_id", user_id)
-            parent_comment = attr.get("data-parent_comment")
-            if parent_comment:
-                self._current.setdefault("reply_to", parent_comment)
-            cl_params = attr.get("data-cl-params", "")
-            if "dt" in cl_params:
-                self._capture_time = True
-                self._time_parts = []
-
-        if tag == "br" and self._capture_text:
-            self._text_parts.append("\n")
-
-    def handle_endtag(self, tag):
-        if self._in_comment and tag == "li":
-            self._comment_depth -= 1
-            if self._comment_depth <= 0:
-                self._finalize_comment()
-                return
-
-        if not self._in_comment:
-            return
-
-        if tag == "span" and self._capture_com_num:
-            num_text = "".join(self._num_parts).strip()
-            if num_text.isdigit():
-                self._current["comment_no"] = int(num_text)
-            self._capture_com_num = False
-
-        if tag == "p" and self._capture_text:
-            text = "".join(self._text_parts).strip()
-            self._current["text"] = text
-            self._capture_text = False
-
-        if tag == "a" and self._capture_time:
-            time_text = "".join(self._time_parts).strip()
-            if time_text:
-                self._current["posted_at"] = time_text
-            self._capture_time = False
-
-    def handle_data(self, data):
-        if not self._in_comment:
-            return
-        if self._capture_com_num:
-            self._num_parts.append(data)
-        if self._capture_text:
-            self._text_parts.append(data)
-        if self._capture_time:
-            self._time_parts.append(data)
-
-    def _finalize_comment(self):
-        if self._current:
-            self.comments.append(self._current)
-        self._in_comment = False
-        self._comment_depth = 0
-        self._current = None
-        self._capture_com_num = False
-        self._capture_text = False
-        self._capture_time = False
-        self._text_parts = []
-        self._num_parts = []
-        self._time_parts = []
+WORKERS_DEFAULT = 1
+WORKERS_MAX = 8
+RETRY_MAX = 5
+RETRY_WAIT_BASE = 2.0
+RETRY_WAIT_MAX = 60.0
+HTTP_TIMEOUT = 30
+# 接続を使い回す（ホストごと。取得の間の待ちより長く空いた接続は作り直す）
+HTTP_POOL = ConnectionPool(timeout=HTTP_TIMEOUT)
 
 
 def fetch_text(url, extra_headers=None):
@@ -149,9 +65,7 @@ def fetch_text(url, extra_headers=None):
     }
     if extra_headers:
         headers.update(extra_headers)
-    req = urllib.request.Request(url, headers=headers)
-    with urllib.request.urlopen(req, timeout=30) as res:
-        return res.read().decode("utf-8", errors="replace")
+    return HTTP_POOL.get(url, headers).decode("utf-8", errors="replace")
 
 
 def get_latest_comment_no(part):
@@ -203,84 +117,250 @@ def pick_sleep(min_sec, max_sec):
     return random.uniform(min_sec, max_sec)
 
 
-def collect_comments(
-    part,
-    stop_event,
-    log_fn,
-    sleep_min,
-    sleep_max,
-    extra_enabled,
-    extra_pages,
-    extra_sleep_min,
-    extra_sleep_max,
-    extra2_enabled,
-    extra2_pages,
-    extra2_sleep_min,
-    extra2_sleep_max,
-):
-    latest = get_latest_comment_no(part)
-    page = 2
-    offset = latest
-    all_comments = []
-    seen = set()
-    log_fn(f"開始 part={part} 最新={latest}")
+class RequestThrottle:
+    """全ワーカー共通のリクエスト間隔。次に送ってよい時刻を順番に予約して守る"""
 
-    pages_fetched = 0
+    def __init__(
+        self,
+        sleep_min,
+        sleep_max,
+        extra_pages=0,
+        extra_sleep_min=0.0,
+        extra_sleep_max=0.0,
+        extra2_pages=0,
+        extra2_sleep_min=0.0,
+        extra2_sleep_max=0.0,
+    ):
+        self.sleep_min = sleep_min
+        self.sleep_max = sleep_max
+        self.extra_pages = extra_pages
+        self.extra_sleep_min = extra_sleep_min
+        self.extra_sleep_max = extra_sleep_max
+        self.extra2_pages = extra2_pages
+        self.extra2_sleep_min = extra2_sleep_min
+        self.extra2_sleep_max = extra2_sleep_max
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+        self.requests = 0
+
+    def wait(self, stop_event, log_fn):
+        """自分の番まで待つ。停止された場合はFalse"""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_time)
+            self.next_time = slot + pick_sleep(self.sleep_min, self.sleep_max)
+            self.requests += 1
+            # 追加休止は全体のリクエスト数で数え、全ワーカーをまとめて休ませる
+            if self.extra_pages > 0 and self.requests % self.extra_pages == 0:
+                extra_sleep = pick_sleep(self.extra_sleep_min, self.extra_sleep_max)
+                log_fn(f"追加休止: {extra_sleep:.2f}秒")
+                self.next_time += extra_sleep
+            if self.extra2_pages > 0 and self.requests % self.extra2_pages == 0:
+                extra2_sleep = pick_sleep(self.extra2_sleep_min, self.extra2_sleep_max)
+                log_fn(f"追加休止2: {extra2_sleep:.2f}秒")
+                self.next_time += extra2_sleep
+        delay = slot - now
+        if delay > 0:
+            return not stop_event.wait(delay)
+        return not stop_event.is_set()
+
+
+def is_retryable(exc):
+    """一時的な失敗か（4xxは429以外は再試行しない）"""
+    if isinstance(exc, urllib.error.HTTPError):
+        return exc.code == 429 or exc.code >= 500
+    return True
+
+
+def call_with_retry(func, stop_event, log_fn, throttle):
+    """間隔を守って呼び出し、一時的な失敗は待ち時間を倍にしながら再試行する。停止されたらNone"""
+    attempt = 0
     while True:
-        if stop_event.is_set():
-            log_fn("停止しました")
-            break
+        if not throttle.wait(stop_event, log_fn):
+            return None
         try:
-            content = fetch_page(part, offset, page)
+            return func()
         except Exception as exc:
-            log_fn(f"取得失敗: {exc}")
-            break
+            attempt += 1
+            if attempt > RETRY_MAX or not is_retryable(exc):
+                raise
+            wait = min(RETRY_WAIT_MAX, RETRY_WAIT_BASE * (2 ** (attempt - 1)))
+            wait += random.uniform(0, wait / 2)
+            log_fn(f"再試行 {attempt}/{RETRY_MAX}: {exc} ({wait:.1f}秒後)")
+            if stop_event.wait(wait):
+                return None
 
-        if not content or "<li" not in content:
-            log_fn("終了: これ以上ありません")
-            break
 
-        parser = CommentParser()
-        parser.feed(content)
-        if not parser.comments:
-            log_fn("終了: コメントがありません")
-            break
+def checkpoint_paths(part):
+    base = os.path.join(CHECKPOINT_DIR, f"usdjpy_{part}")
+    return base + ".state.json", base + ".comments.jsonl"
+
 
-        new_count = 0
-        for item in parser.comments:
+def load_checkpoint(part):
+    """途中の状態と取得済みコメントを読む。無ければ (None, [])"""
+    state_path, comments_path = checkpoint_paths(part)
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None, []
+    comments = []
+    seen = set()
+    try:
+        with open(comments_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:
+                    # 書き込み途中で止まった行は捨てる
+                    continue
+                num = item.get("comment_no")
+                if num is None or num in seen:
+                    continue
+                seen.add(num)
+                comments.append(item)
+    except OSError:
+        pass
+    return state, comments
+
+
+def save_checkpoint(part, state, new_items):
+    """今回のページ分を追記してから位置を書き換える"""
+    state_path, comments_path = checkpoint_paths(part)
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    if new_items:
+        with open(comments_path, "a", encoding="utf-8") as f:
+            for item in new_items:
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=True)
+    os.replace(tmp_path, state_path)
+
+
+def clear_checkpoint(part):
+    for path in checkpoint_paths(part):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def fetch_latest(part, stop_event, log_fn, throttle):
+    """スレの最新のレス番号。失敗や停止ならNone（ログは出し済み）"""
+    try:
+        latest = call_with_retry(lambda: get_latest_comment_no(part), stop_event, log_fn, throttle)
+    except Exception as exc:
+        log_fn(f"取得失敗: {exc}")
+        return None
+    if latest is None:
+        log_fn("停止しました")
+    return latest
+
+
+def collect_comments(part, stop_event, log_fn, throttle, stop_no=None, fast_parse=True, archive=None):
+    """コメントを古い方へ向かって集める。(コメント, 最後まで取れたか) を返す
+
+    stop_no を渡すと、その番号以下に届いた時点で終える（新着のみの取得）
+    archive（PageArchive）を渡すと、取得したページの断片をそのまま残す
+
+    取得は区間（offset から floor の番号まで下る）の並びで進め、途中の状態に区間ごと残す。
+    再開時にスレの最新が前回より進んでいれば、その間を取る区間を先頭に足す
+    """
+    state, all_comments = load_checkpoint(part)
+    if state:
+        latest = state["latest"]
+        stop_no = state.get("stop_no")
+        # 区間を持たない古い形式の途中状態は、1つの区間として読む
+        segments = state.get("segments") or [{"offset": state["offset"], "page": state["page"], "floor": stop_no}]
+        log_fn(f"再開 part={part} 最新={latest} 位置={segments[0]['offset']} 取得済み={len(all_comments)}")
+        head = fetch_latest(part, stop_event, log_fn, throttle)
+        if head is None:
+            return all_comments, False
+        if head > latest:
+            log_fn(f"中断後の新着あり 最新={head} 前回の最新={latest}")
+            segments.insert(0, {"offset": head, "page": 2, "floor": latest})
+            latest = head
+    else:
+        latest = fetch_latest(part, stop_event, log_fn, throttle)
+        if latest is None:
+            return all_comments, False
+        if stop_no is not None and latest <= stop_no:
+            log_fn(f"新着なし part={part} 最新={latest}")
+            return all_comments, True
+        segments = [{"offset": latest, "page": 2, "floor": stop_no}]
+        log_fn(f"開始 part={part} 最新={latest}" + (f" 保存済み={stop_no}" if stop_no is not None else ""))
+    seen = {item.get("comment_no") for item in all_comments}
+
+    while segments:
+        segment = segments[0]
+        offset = segment["offset"]
+        page = segment["page"]
+        floor = segment["floor"]
+        try:
+            content = call_with_retry(lambda: fetch_page(part, offset, page), stop_event, log_fn, throttle)
+        except Exception as exc:
+            log_fn(f"取得失敗: {exc}")
+            return all_comments, False
+        if content is None:
+            log_fn("停止しました")
+            return all_comments, False
+        if archive is not None and content:
+            archive.add(part, page, offset, content)
+
+        comments_on_page = parse_comments(content, fast_parse) if content and "<li" in content else []
+        new_items = []
+        for item in comments_on_page:
             num = item.get("comment_no")
             if num is None or num in seen:
                 continue
+            if stop_no is not None and num <= stop_no:
+                continue
             item["part"] = part
             all_comments.append(item)
             seen.add(num)
-            new_count += 1
+            new_items.append(item)
 
-        nums = [c.get("comment_no") for c in parser.comments if c.get("comment_no") is not None]
-        if not nums:
+        nums = [c.get("comment_no") for c in comments_on_page if c.get("comment_no") is not None]
+        min_no = min(nums) if nums else None
+        done = True
+        if not content or "<li" not in content:
+            log_fn("終了: これ以上ありません")
+        elif not comments_on_page:
+            log_fn("終了: コメントがありません")
+        elif min_no is None:
             log_fn("終了: 番号が取れません")
-            break
-
-        min_no = min(nums)
-        if min_no >= offset:
+        elif floor is not None and min_no <= floor:
+            if floor == stop_no:
+                log_fn(f"終了: 保存済みの番号に届きました 取得={len(new_items)} 合計={len(all_comments)}")
+            else:
+                log_fn(f"新着分の取得終了: 前回の最新に届きました 取得={len(new_items)} 合計={len(all_comments)}")
+        elif min_no >= offset:
             log_fn("終了: 進みません")
-            break
-
-        log_fn(f"ページ={page} 取得={new_count} 最小={min_no} 合計={len(all_comments)}")
-        offset = min_no - 1
-        page += 1
-        pages_fetched += 1
-        time.sleep(pick_sleep(sleep_min, sleep_max))
-        if extra_enabled and extra_pages > 0 and pages_fetched % extra_pages == 0:
-            extra_sleep = pick_sleep(extra_sleep_min, extra_sleep_max)
-            log_fn(f"追加休止: {extra_sleep:.2f}秒")
-            time.sleep(extra_sleep)
-        if extra2_enabled and extra2_pages > 0 and pages_fetched % extra2_pages == 0:
-            extra2_sleep = pick_sleep(extra2_sleep_min, extra2_sleep_max)
-            log_fn(f"追加休止2: {extra2_sleep:.2f}秒")
-            time.sleep(extra2_sleep)
+        else:
+            done = False
+            log_fn(f"ページ={page} 取得={len(new_items)} 最小={min_no} 合計={len(all_comments)}")
+            segment["offset"] = min_no - 1
+            segment["page"] = page + 1
+        if done:
+            segments.pop(0)
+            if not segments:
+                break
+        save_checkpoint(
+            part,
+            {
+                "part": part,
+                "latest": latest,
+                "offset": segments[0]["offset"],
+                "page": segments[0]["page"],
+                "segments": segments,
+                "min_no": min_no,
+                "stop_no": stop_no,
+            },
+            new_items,
+        )
 
-    return all_comments
+    return all_comments, True
 
 
 def save_jsonl(path, comments, missing_year=None):
@@ -292,6 +372,10 @@ def save_jsonl(path, comments, missing_year=None):
             posted_at = item.get("posted_at", "")
             if missing_year and posted_at and "年" not in posted_at:
                 item["posted_at"] = f"{missing_year}年{posted_at}"
+            # 読む側が文字列を解析しなくて済むよう、日時を ts（UNIX時間の秒）でも持たせる
+            minutes = parse_posted_minutes(item.get("posted_at", ""), missing_year)
+            if minutes is not None:
+                item["ts"] = posted_minutes_to_ts(minutes)
             f.write(json.dumps(item, ensure_ascii=False) + "\n")
 
 
@@ -307,20 +391,6 @@ def parse_date(text):
     raise ValueError("date format error")
 
 
-def parse_posted_date(text, missing_year):
-    if not text:
-        return None
-    m = re.search(r"(?:(\d{4})年)?\s*(\d{1,2})月(\d{1,2})日", text)
-    if not m:
-        return None
-    year_text, month_text, day_text = m.groups()
-    year = int(year_text) if year_text else missing_year
-    try:
-        return date(year, int(month_text), int(day_text))
-    except ValueError:
-        return None
-
-
 def determine_file_date(comments, missing_year):
     if not comments:
         return None
@@ -338,8 +408,30 @@ def determine_file_date(comments, missing_year):
     return min(candidates)
 
 
-def build_log_path(part, day):
-    return os.path.join(LOG_DIR, f"usdjpy_{part}_{day.strftime('%Y%m%d')}.jsonl")
+def build_log_path(part, day, log_dir=LOG_DIR):
+    return os.path.join(log_dir, f"usdjpy_{part}_{day.strftime('%Y%m%d')}.jsonl")
+
+
+def find_part_logs(part):
+    return sorted(glob.glob(os.path.join(LOG_DIR, f"usdjpy_{part}_" + "[0-9]" * 8 + ".jsonl")))
+
+
+def load_part_logs(paths):
+    """保存済みのコメントを番号で重複なく読む"""
+    comments = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                num = item.get("comment_no")
+                if num is not None:
+                    comments.setdefault(num, item)
+    return comments
 
 
 class CalendarDialog(tk.Toplevel):
@@ -425,7 +517,6 @@ class App:
         self.queue = queue.Queue()
         self.worker = None
         self.stop_event = threading.Event()
-        self.current_label = None
 
         self.start_part_var = tk.StringVar(value=str(PART_START_DEFAULT))
         self.end_part_var = tk.StringVar(value=str(PART_END_DEFAULT))
@@ -440,6 +531,10 @@ class App:
         self.extra2_pages_var = tk.StringVar(value=str(EXTRA2_PAGES_DEFAULT))
         self.extra2_sleep_min_var = tk.StringVar(value=str(EXTRA2_SLEEP_MIN_DEFAULT))
         self.extra2_sleep_max_var = tk.StringVar(value=str(EXTRA2_SLEEP_MAX_DEFAULT))
+        self.workers_var = tk.StringVar(value=str(WORKERS_DEFAULT))
+        self.incremental_enabled = tk.BooleanVar(value=False)
+        self.fast_parse_enabled = tk.BooleanVar(value=True)
+        self.archive_enabled = tk.BooleanVar(value=False)
 
         self.load_settings()
 
@@ -469,6 +564,11 @@ class App:
         ttk.Entry(frm, textvariable=self.extra_sleep_min_var, width=6).grid(row=1, column=4, sticky="w", padx=(5, 5))
         ttk.Label(frm, text="〜").grid(row=1, column=5, sticky="w")
         ttk.Entry(frm, textvariable=self.extra_sleep_max_var, width=6).grid(row=1, column=6, sticky="w", padx=(5, 15))
+        ttk.Label(frm, text="同時取得数").grid(row=1, column=7, sticky="w")
+        ttk.Entry(frm, textvariable=self.workers_var, width=6).grid(row=1, column=8, columnspan=2, sticky="w", padx=(5, 15))
+        ttk.Checkbutton(frm, text="生データ保存", variable=self.archive_enabled).grid(row=1, column=10, columnspan=2, sticky="w")
+        ttk.Checkbutton(frm, text="新着のみ", variable=self.incremental_enabled).grid(row=2, column=7, columnspan=3, sticky="w")
+        ttk.Checkbutton(frm, text="高速解析", variable=self.fast_parse_enabled).grid(row=2, column=10, columnspan=2, sticky="w")
 
         ttk.Checkbutton(frm, text="追加休止2", variable=self.extra2_enabled).grid(row=2, column=0, sticky="w")
         ttk.Label(frm, text="間隔(ページ)").grid(row=2, column=1, sticky="w")
@@ -492,10 +592,10 @@ class App:
         self.root.after(200, self.flush_log)
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
-    def log(self, message):
+    def log(self, message, label=None):
         prefix = ""
-        if self.current_label:
-            prefix = f"[{self.current_label}] "
+        if label:
+            prefix = f"[{label}] "
         self.queue.put(prefix + message)
 
     def flush_log(self):
@@ -551,6 +651,10 @@ class App:
         set_text(self.extra2_pages_var, "extra2_pages")
         set_text(self.extra2_sleep_min_var, "extra2_sleep_min")
         set_text(self.extra2_sleep_max_var, "extra2_sleep_max")
+        set_text(self.workers_var, "workers")
+        set_flag(self.incremental_enabled, "incremental_enabled")
+        set_flag(self.fast_parse_enabled, "fast_parse_enabled")
+        set_flag(self.archive_enabled, "archive_enabled")
 
     def save_settings(self):
         data = {
@@ -567,6 +671,10 @@ class App:
             "extra2_pages": self.extra2_pages_var.get().strip(),
             "extra2_sleep_min": self.extra2_sleep_min_var.get().strip(),
             "extra2_sleep_max": self.extra2_sleep_max_var.get().strip(),
+            "workers": self.workers_var.get().strip(),
+            "incremental_enabled": bool(self.incremental_enabled.get()),
+            "fast_parse_enabled": bool(self.fast_parse_enabled.get()),
+            "archive_enabled": bool(self.archive_enabled.get()),
         }
         try:
             with open(SETTINGS_PATH, "w", encoding="utf-8") as f:
@@ -643,6 +751,23 @@ class App:
             extra2_pages = 0
             extra2_sleep_min = 0.0
             extra2_sleep_max = 0.0
+        try:
+            workers = int(self.workers_var.get().strip())
+            if workers < 1 or workers > WORKERS_MAX:
+                raise ValueError
+        except ValueError:
+            self.log(f"同時取得数は1～{WORKERS_MAX}で入力してください")
+            return
+        throttle = RequestThrottle(
+            sleep_min,
+            sleep_max,
+            extra_pages,
+            extra_sleep_min,
+            extra_sleep_max,
+            extra2_pages,
+            extra2_sleep_min,
+            extra2_sleep_max,
+        )
 
         self.save_settings()
         self.stop_event.clear()
@@ -654,14 +779,11 @@ class App:
                 start_part,
                 end_part,
                 missing_year,
-                sleep_min,
-                sleep_max,
-                extra_pages,
-                extra_sleep_min,
-                extra_sleep_max,
-                extra2_pages,
-                extra2_sleep_min,
-                extra2_sleep_max,
+                workers,
+                throttle,
+                bool(self.incremental_enabled.get()),
+                bool(self.fast_parse_enabled.get()),
+                bool(self.archive_enabled.get()),
             ),
             daemon=True,
         )
@@ -675,76 +797,98 @@ class App:
         if self.worker and self.worker.is_alive():
             self.root.after(300, self.check_worker)
             return
+        # 次に開始するまで空くので、持っている接続は閉じておく
+        HTTP_POOL.close_all()
         self.start_btn.configure(state="normal")
         self.stop_btn.configure(state="disabled")
         self.log("処理が終わりました")
 
-    def run(
-        self,
-        start_part,
-        end_part,
-        missing_year,
-        sleep_min,
-        sleep_max,
-        extra_pages,
-        extra_sleep_min,
-        extra_sleep_max,
-        extra2_pages,
-        extra2_sleep_min,
-        extra2_sleep_max,
-    ):
+    def run(self, start_part, end_part, missing_year, workers, throttle, incremental=False, fast_parse=True, archive=False):
         total_parts = abs(end_part - start_part) + 1
-        self.current_label = None
         self.log(f"番号: {start_part} ～ {end_part} ({total_parts}件)")
         self.log(f"年なしの年: {missing_year}年")
-        self.log(f"待ち時間: {sleep_min}～{sleep_max}秒")
-        if extra_pages > 0:
-            self.log(f"追加休止: {extra_pages}ページごとに{extra_sleep_min}～{extra_sleep_max}秒")
-        if extra2_pages > 0:
-            self.log(f"追加休止2: {extra2_pages}ページごとに{extra2_sleep_min}～{extra2_sleep_max}秒")
+        self.log(f"待ち時間: {throttle.sleep_min}～{throttle.sleep_max}秒（全体で共通）")
+        if throttle.extra_pages > 0:
+            self.log(
+                f"追加休止: {throttle.extra_pages}ページごとに"
+                f"{throttle.extra_sleep_min}～{throttle.extra_sleep_max}秒"
+            )
+        if throttle.extra2_pages > 0:
+            self.log(
+                f"追加休止2: {throttle.extra2_pages}ページごとに"
+                f"{throttle.extra2_sleep_min}～{throttle.extra2_sleep_max}秒"
+            )
+        self.log(f"同時取得数: {workers}")
+        if incremental:
+            self.log("新着のみ: 保存済みの番号より新しいコメントだけを取得して追加します")
+        if not fast_parse:
+            self.log("高速解析: 使わない（HTMLParser で読みます）")
+        page_archive = None
+        if archive:
+            page_archive = PageArchive(ARCHIVE_DIR)
+            self.log(f"生データ保存: {ARCHIVE_DIR}")
 
         step = 1 if end_part >= start_part else -1
-        part = start_part
-        while True:
-            self.current_label = f"part={part}"
-            if self.stop_event.is_set():
-                self.log("停止しました")
-                break
-            if part <= 0:
-                self.log(f"対象外: part={part}")
+        parts = list(range(start_part, end_part + step, step))
+        if workers <= 1:
+            for part in parts:
+                if self.stop_event.is_set():
+                    self.log("停止しました")
+                    break
+                self.fetch_part(part, missing_year, throttle, incremental, fast_parse, page_archive)
+            return
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for part in parts:
+                executor.submit(self.fetch_part, part, missing_year, throttle, incremental, fast_parse, page_archive)
+
+    def fetch_part(self, part, missing_year, throttle, incremental=False, fast_parse=True, archive=None):
+        """1つの番号を取得して保存する（ログにはその番号の見出しを付ける）"""
+        label = f"part={part}"
+
+        def part_log(message):
+            self.log(message, label)
+
+        if self.stop_event.is_set():
+            return
+        if part <= 0:
+            part_log(f"対象外: part={part}")
+            return
+        part_log(f"対象番号: {part} の取得中")
+        try:
+            old_paths = find_part_logs(part) if incremental else []
+            stored = load_part_logs(old_paths)
+            stop_no = max(stored) if stored else None
+            comments, complete = collect_comments(part, self.stop_event, part_log, throttle, stop_no, fast_parse, archive)
+            if not complete:
+                part_log(f"途中までのため保存しません（次回は続きから取得します） 取得済み={len(comments)}")
+                return
+            if stored:
+                if not comments:
+                    clear_checkpoint(part)
+                    part_log(f"追加なし 件数={len(stored)}")
+                    return
+                added = len(comments)
+                merged = dict(stored)
+                for item in comments:
+                    merged[item["comment_no"]] = item
+                comments = list(merged.values())
+                part_log(f"新着={added} 保存済み={len(stored)}")
+            file_day = determine_file_date(comments, missing_year)
+            if not file_day:
+                part_log("日付が取れないため保存を中止しました")
             else:
-                self.log(f"対象番号: {part} の取得中")
-                try:
-                    comments = collect_comments(
-                        part,
-                        self.stop_event,
-                        self.log,
-                        sleep_min,
-                        sleep_max,
-                        extra_pages > 0,
-                        extra_pages,
-                        extra_sleep_min,
-                        extra_sleep_max,
-                        extra2_pages > 0,
-                        extra2_pages,
-                        extra2_sleep_min,
-                        extra2_sleep_max,
-                    )
-                    file_day = determine_file_date(comments, missing_year)
-                    if not file_day:
-                        self.log("日付が取れないため保存を中止しました")
-                    else:
-                        self.current_label = f"{file_day.year}年{file_day.month}月{file_day.day}日 part={part}"
-                        path = build_log_path(part, file_day)
-                        save_jsonl(path, comments, missing_year)
-                        self.log(f"保存: {path} 件数={len(comments)}")
-                except Exception as exc:
-                    self.log(f"失敗: part={part} {exc}")
-
-            if part == end_part:
-                break
-            part += step
-        self.current_label = None
+                label = f"{file_day.year}年{file_day.month}月{file_day.day}日 part={part}"
+                path = build_log_path(part, file_day)
+                save_jsonl(path, comments, missing_year)
+                clear_checkpoint(part)
+                part_log(f"保存: {path} 件数={len(comments)}")
+                # 日付の判定が変わって別名になった場合は古いファイルを残さない
+                for old_path in old_paths:
+                    if os.path.normcase(old_path) != os.path.normcase(path):
+                        os.remove(old_path)
+                        part_log(f"削除: {old_path}")
+        except Exception as exc:
+            part_log(f"失敗: part={part} {exc}")
 
 
 
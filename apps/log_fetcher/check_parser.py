@@ -0,0 +1,81 @@
+import argparse
+import time
+from pathlib import Path
+from typing import Iterable
+
+from comment_parser import parse_comments
+from comment_scan import scan_comments
+from page_archive import PACK_RE, PageArchive
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+def iter_archive_pages(path: Path) -> Iterable[tuple[str, str]]:
+    """生データ保存の pack から (見出し, 断片) を取り出す"""
+    m = PACK_RE.search(path.name)
+    if not m:
+        raise SystemExit(f"pack のファイル名ではありません: {path}")
+    archive = PageArchive(str(path.parent))
+    for page, offset, content in archive.iter_pages(int(m.group(1))):
+        yield f"{path} page={page} offset={offset}", content
+
+
+def iter_fragments(inputs: Iterable[str]) -> Iterable[tuple[str, str]]:
+    """html ファイル・pack ファイル・フォルダ（中の両方）から (見出し, 断片) を取り出す"""
+    for text in inputs:
+        path = Path(text)
+        if path.is_dir():
+            paths = sorted(list(path.rglob("*.html")) + list(path.rglob("*.pack")))
+        elif path.exists():
+            paths = [path]
+        else:
+            raise SystemExit(f"入力が見つかりません: {path}")
+        for item in paths:
+            if item.suffix == ".pack":
+                yield from iter_archive_pages(item)
+            else:
+                yield str(item), item.read_text(encoding="utf-8", errors="replace")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="ページの断片で、高速解析と HTMLParser 版の結果が同じかを確かめます")
+    parser.add_argument(
+        "inputs",
+        nargs="*",
+        help="htmlファイル・生データ保存のpackファイル・フォルダ(複数可。省略時は同梱の fixtures)",
+    )
+    args = parser.parse_args()
+
+    fragments = 0
+    comments = 0
+    mismatched = 0
+    old_sec = 0.0
+    new_sec = 0.0
+    for label, content in iter_fragments(args.inputs or [str(FIXTURES_DIR)]):
+        fragments += 1
+        started = time.perf_counter()
+        expected = parse_comments(content, fast_parse=False)
+        old_sec += time.perf_counter() - started
+        started = time.perf_counter()
+        try:
+            actual = scan_comments(content)
+        except Exception as exc:
+            actual = f"例外: {exc}"
+        new_sec += time.perf_counter() - started
+        comments += len(expected)
+        if actual != expected:
+            mismatched += 1
+            print(f"不一致: {label}")
+
+    print(f"断片の数: {fragments}")
+    print(f"コメント数: {comments}")
+    print(f"不一致: {mismatched}")
+    print(f"解析時間: HTMLParser {old_sec:.3f}秒 / 高速解析 {new_sec:.3f}秒")
+    if not fragments:
+        print("断片がありません")
+        return 1
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
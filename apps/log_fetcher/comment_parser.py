@@ -0,0 +1,122 @@
+from html.parser import HTMLParser
+
+from comment_scan import scan_comments
+
+
+class CommentParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.comments = []
+        self._in_comment = False
+        self._comment_depth = 0
+        self._current = None
+        self._capture_com_num = False
+        self._capture_text = False
+        self._capture_time = False
+        self._text_parts = []
+        self._num_parts = []
+        self._time_parts = []
+
+    def handle_starttag(self, tag, attrs):
+        attr = dict(attrs)
+        if tag == "li":
+            li_id = attr.get("id", "")
+            if (not self._in_comment) and li_id.startswith("c") and li_id[1:].isdigit():
+                self._in_comment = True
+                self._comment_depth = 1
+                self._current = {"comment_no": int(li_id[1:])}
+            elif self._in_comment:
+                self._comment_depth += 1
+
+        if not self._in_comment:
+            return
+
+        if tag == "div" and "comment" in attr.get("class", ""):
+            comment_id = attr.get("data-comment")
+            if comment_id:
+                self._current.setdefault("comment_id", comment_id)
+
+        if tag == "span" and attr.get("class") == "comNum":
+            self._capture_com_num = True
+            self._num_parts = []
+
+        if tag == "p" and attr.get("class") == "comText":
+            self._capture_text = True
+            self._text_parts = []
+
+        if tag == "a":
+            user_id = attr.get("data-user")
+            if user_id:
+                self._current.setdefault("user_id", user_id)
+            parent_comment = attr.get("data-parent_comment")
+            if parent_comment:
+                self._current.setdefault("reply_to", parent_comment)
+            cl_params = attr.get("data-cl-params", "")
+            if "dt" in cl_params:
+                self._capture_time = True
+                self._time_parts = []
+
+        if tag == "br" and self._capture_text:
+            self._text_parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if self._in_comment and tag == "li":
+            self._comment_depth -= 1
+            if self._comment_depth <= 0:
+                self._finalize_comment()
+                return
+
+        if not self._in_comment:
+            return
+
+        if tag == "span" and self._capture_com_num:
+            num_text = "".join(self._num_parts).strip()
+            if num_text.isdigit():
+                self._current["comment_no"] = int(num_text)
+            self._capture_com_num = False
+
+        if tag == "p" and self._capture_text:
+            text = "".join(self._text_parts).strip()
+            self._current["text"] = text
+            self._capture_text = False
+
+        if tag == "a" and self._capture_time:
+            time_text = "".join(self._time_parts).strip()
+            if time_text:
+                self._current["posted_at"] = time_text
+            self._capture_time = False
+
+    def handle_data(self, data):
+        if not self._in_comment:
+            return
+        if self._capture_com_num:
+            self._num_parts.append(data)
+        if self._capture_text:
+            self._text_parts.append(data)
+        if self._capture_time:
+            self._time_parts.append(data)
+
+    def _finalize_comment(self):
+        if self._current:
+            self.comments.append(self._current)
+        self._in_comment = False
+        self._comment_depth = 0
+        self._current = None
+        self._capture_com_num = False
+        self._capture_text = False
+        self._capture_time = False
+        self._text_parts = []
+        self._num_parts = []
+        self._time_parts = []
+
+
+def parse_comments(content, fast_parse=True):
+    """ページの断片からコメントを取り出す。高速版で失敗したら HTMLParser 版で読み直す"""
+    if fast_parse:
+        try:
+            return scan_comments(content)
+        except Exception:
+            pass
+    parser = CommentParser()
+    parser.feed(content)
+    return parser.comments
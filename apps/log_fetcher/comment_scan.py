@@ -0,0 +1,165 @@
+import re
+from html import unescape
+
+
+# listview の断片を、タグ・コメント・宣言の区切りだけで読み進める
+TOKEN_RE = re.compile(
+    r"<(?:"
+    r"(?P<end>/)?(?P<tag>[a-zA-Z][^\s/>]*)(?P<attrs>(?:[^>\"']|\"[^\"]*\"|'[^']*')*)>"
+    r"|!--.*?-->"
+    r"|[!?][^>]*>"
+    r")",
+    re.S,
+)
+ATTR_RE = re.compile(r"([^\s/>=][^\s/>=]*)(?:\s*=+\s*(?:\"([^\"]*)\"|'([^']*)'|([^\s>]*)))?")
+# 中身をタグとして読まないタグ（HTMLParser と同じ）
+RAW_TEXT_TAGS = ("script", "style")
+# 属性を見るタグと、見る値があるなら必ず含まれる文字列（小文字で比べる）
+ATTR_HINTS = {"div": "comment", "span": "comnum", "p": "comtext", "a": "data-"}
+
+
+def parse_attrs(text):
+    """属性の文字列を辞書にする（名前は小文字、値は文字参照を戻す。同じ名前は後勝ち）"""
+    attrs = {}
+    for match in ATTR_RE.finditer(text):
+        name, double, single, bare = match.groups()
+        value = double if double is not None else single if single is not None else bare
+        if value is None:
+            attrs[name.lower()] = None
+            continue
+        attrs[name.lower()] = unescape(value) if "&" in value else value
+    return attrs
+
+
+def scan_comments(html):
+    """CommentParser と同じ辞書の並びを、HTMLParser を使わずに作る"""
+    comments = []
+    current = None
+    depth = 0
+    capture_num = False
+    capture_text = False
+    capture_time = False
+    num_parts = []
+    text_parts = []
+    time_parts = []
+
+    pos = 0
+    size = len(html)
+    while pos < size:
+        match = TOKEN_RE.search(html, pos)
+        if match is None:
+            break
+        start = match.start()
+        if current is not None and start > pos and (capture_num or capture_text or capture_time):
+            data = html[pos:start]
+            if "&" in data:
+                data = unescape(data)
+            if capture_num:
+                num_parts.append(data)
+            if capture_text:
+                text_parts.append(data)
+            if capture_time:
+                time_parts.append(data)
+        pos = match.end()
+
+        tag = match.group("tag")
+        if tag is None:
+            continue
+        tag = tag.lower()
+
+        if match.group("end"):
+            closing = True
+            opening = False
+        else:
+            attrs_text = match.group("attrs")
+            opening = True
+            closing = attrs_text.endswith("/")
+
+            if tag in RAW_TEXT_TAGS and not closing:
+                # 閉じタグまでは中身をそのまま文字として扱う
+                end = re.compile(rf"</{tag}[\s>/]", re.I).search(html, pos)
+                if end is None:
+                    break
+                if current is not None and end.start() > pos:
+                    data = html[pos : end.start()]
+                    if capture_num:
+                        num_parts.append(data)
+                    if capture_text:
+                        text_parts.append(data)
+                    if capture_time:
+                        time_parts.append(data)
+                pos = end.start()
+                continue
+
+        if opening:
+            if tag == "li":
+                if current is not None:
+                    depth += 1
+                else:
+                    li_id = parse_attrs(attrs_text).get("id", "")
+                    if li_id.startswith("c") and li_id[1:].isdigit():
+                        current = {"comment_no": int(li_id[1:])}
+                        depth = 1
+            elif current is None:
+                pass
+            elif tag == "br":
+                if capture_text:
+                    text_parts.append("\n")
+            elif tag in ATTR_HINTS and (ATTR_HINTS[tag] in attrs_text.lower() or "&" in attrs_text):
+                # 見る属性の名前や値が含まれていないタグは、属性を読まずに飛ばす
+                attr = parse_attrs(attrs_text)
+                if tag == "div":
+                    if "comment" in attr.get("class", ""):
+                        comment_id = attr.get("data-comment")
+                        if comment_id:
+                            current.setdefault("comment_id", comment_id)
+                elif tag == "span":
+                    if attr.get("class") == "comNum":
+                        capture_num = True
+                        num_parts = []
+                elif tag == "p":
+                    if attr.get("class") == "comText":
+                        capture_text = True
+                        text_parts = []
+                else:
+                    user_id = attr.get("data-user")
+                    if user_id:
+                        current.setdefault("user_id", user_id)
+                    parent_comment = attr.get("data-parent_comment")
+                    if parent_comment:
+                        current.setdefault("reply_to", parent_comment)
+                    if "dt" in attr.get("data-cl-params", ""):
+                        capture_time = True
+                        time_parts = []
+
+        if closing:
+            if current is not None and tag == "li":
+                depth -= 1
+                if depth <= 0:
+                    comments.append(current)
+                    current = None
+                    depth = 0
+                    capture_num = capture_text = capture_time = False
+                    num_parts = []
+                    text_parts = []
+                    time_parts = []
+                    continue
+
+            if current is None:
+                continue
+
+            if tag == "span" and capture_num:
+                num_text = "".join(num_parts).strip()
+                if num_text.isdigit():
+                    current["comment_no"] = int(num_text)
+                capture_num = False
+            elif tag == "p" and capture_text:
+                current["text"] = "".join(text_parts).strip()
+                capture_text = False
+            elif tag == "a" and capture_time:
+                time_text = "".join(time_parts).strip()
+                if time_text:
+                    current["posted_at"] = time_text
+                capture_time = False
+
+    return comments
@@ -0,0 +1,126 @@
+import gzip
+import http.client
+import threading
+import time
+import urllib.error
+import urllib.parse
+import zlib
+
+
+# 使い回した接続が向こうで切られていた時に出る例外（新しい接続で1回だけ送り直す）
+STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+REDIRECT_MAX = 5
+
+
+def decode_body(body, encoding):
+    """Content-Encoding に合わせて本文を戻す"""
+    encoding = (encoding or "").strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        # zlib の枠付きが本来の形だが、枠なしで返すサーバーもある
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+class ConnectionPool:
+    """ホストごとに HTTP(S) 接続を持ち続けて使い回す（スレッドごとに別の接続を貸す）
+
+    idle_max 秒より長く使っていない接続は、向こうで切られている前提で捨てる
+    """
+
+    def __init__(self, timeout=30, idle_max=60.0):
+        self.timeout = timeout
+        self.idle_max = idle_max
+        self.lock = threading.Lock()
+        # (scheme, host, port) -> [(接続, 最後に使った時刻), ...]
+        self.idle = {}
+
+    def _acquire(self, key):
+        """空いている接続を借りる。無ければ新しく作る。(接続, 使い回しか) を返す"""
+        now = time.monotonic()
+        stale = []
+        conn = None
+        with self.lock:
+            idle = self.idle.get(key)
+            while idle:
+                candidate, used_at = idle.pop()
+                if now - used_at <= self.idle_max:
+                    conn = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            candidate.close()
+        if conn is not None:
+            return conn, True
+        return self._connect(key), False
+
+    def _connect(self, key):
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _release(self, key, conn):
+        with self.lock:
+            self.idle.setdefault(key, []).append((conn, time.monotonic()))
+
+    def close_all(self):
+        """持っている接続をすべて閉じる"""
+        with self.lock:
+            pools = list(self.idle.values())
+            self.idle = {}
+        for idle in pools:
+            for conn, _used_at in idle:
+                conn.close()
+
+    def _send(self, key, path, headers):
+        """1回分のリクエスト。(状態コード, 理由, ヘッダー, 本文) を返す"""
+        conn, reused = self._acquire(key)
+        while True:
+            try:
+                conn.request("GET", path, headers=headers)
+                res = conn.getresponse()
+                body = res.read()
+            except STALE_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                conn = self._connect(key)
+                reused = False
+                continue
+            except Exception:
+                conn.close()
+                raise
+            if res.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            return res.status, res.reason, res.headers, body
+
+    def get(self, url, headers=None):
+        """GET して本文（圧縮は戻した bytes）を返す。4xx/5xx は urllib と同じ HTTPError を出す"""
+        headers = dict(headers or {})
+        headers.setdefault("Accept-Encoding", "gzip, deflate")
+        for _ in range(REDIRECT_MAX + 1):
+            parts = urllib.parse.urlsplit(url)
+            scheme = parts.scheme.lower()
+            if scheme not in ("http", "https"):
+                raise ValueError(f"unsupported url: {url}")
+            port = parts.port or (443 if scheme == "https" else 80)
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+            status, reason, res_headers, body = self._send((scheme, parts.hostname, port), path, headers)
+            location = res_headers.get("Location")
+            if status in REDIRECT_CODES and location:
+                url = urllib.parse.urljoin(url, location)
+                continue
+            if status >= 400:
+                raise urllib.error.HTTPError(url, status, reason, res_headers, None)
+            return decode_body(body, res_headers.get("Content-Encoding"))
+        raise urllib.error.HTTPError(url, status, "too many redirects", res_headers, None)
@@ -0,0 +1,81 @@
+import glob
+import gzip
+import json
+import os
+import re
+import threading
+import time
+
+
+# 番号ごとに、ページの断片を gzip にして足していく本体と、その位置の索引を置く
+PACK_NAME = "usdjpy_{part}.pack"
+INDEX_NAME = "usdjpy_{part}.idx"
+PACK_RE = re.compile(r"usdjpy_(\d+)\.pack$")
+
+
+class PageArchive:
+    """取得したページの断片を番号ごとの pack ファイルに残す
+
+    pack は1ページ1つの gzip を続けて書いたもの（全体も gzip として読める）。
+    idx は1行1ページの json で、page / offset / pos / size / fetched_at を持つ。
+    本体を書いてから索引を書くので、途中で止まっても索引に載ったページは必ず読める
+    """
+
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        self.lock = threading.Lock()
+
+    def pack_path(self, part):
+        return os.path.join(self.archive_dir, PACK_NAME.format(part=part))
+
+    def index_path(self, part):
+        return os.path.join(self.archive_dir, INDEX_NAME.format(part=part))
+
+    def add(self, part, page, offset, content):
+        """1ページ分の断片を足す"""
+        data = gzip.compress(content.encode("utf-8"))
+        with self.lock:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            with open(self.pack_path(part), "ab") as f:
+                pos = f.seek(0, os.SEEK_END)
+                f.write(data)
+            entry = {"page": page, "offset": offset, "pos": pos, "size": len(data), "fetched_at": int(time.time())}
+            with open(self.index_path(part), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def parts(self):
+        """保存してある番号の一覧（昇順）"""
+        parts = []
+        for path in glob.glob(os.path.join(self.archive_dir, PACK_NAME.format(part="*"))):
+            m = PACK_RE.search(os.path.basename(path))
+            if m and os.path.exists(self.index_path(int(m.group(1)))):
+                parts.append(int(m.group(1)))
+        return sorted(parts)
+
+    def load_index(self, part):
+        """(page, offset) -> 索引の行。同じページを取り直した場合は後のものを使う（並びは取得順）"""
+        entries = {}
+        try:
+            with open(self.index_path(part), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 書き込み途中で止まった行は捨てる
+                        continue
+                    key = (entry["page"], entry["offset"])
+                    entries.pop(key, None)
+                    entries[key] = entry
+        except OSError:
+            pass
+        return entries
+
+    def iter_pages(self, part):
+        """(page, offset, 断片) を取得した順に返す"""
+        entries = self.load_index(part)
+        if not entries:
+            return
+        with open(self.pack_path(part), "rb") as f:
+            for (page, offset), entry in entries.items():
+                f.seek(entry["pos"])
+                yield page, offset, gzip.decompress(f.read(entry["size"])).decode("utf-8")
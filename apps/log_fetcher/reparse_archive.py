@@ -0,0 +1,77 @@
+import argparse
+from pathlib import Path
+
+from app import ARCHIVE_DIR, MISSING_YEAR_DEFAULT, build_log_path, determine_file_date, parse_comments, save_jsonl
+from page_archive import PageArchive
+
+
+def ensure_empty_dir(path: Path) -> None:
+    if not path.exists():
+        path.mkdir(parents=True, exist_ok=True)
+        return
+    if not path.is_dir():
+        raise SystemExit(f"出力先がフォルダではありません: {path}")
+    if any(path.iterdir()):
+        raise SystemExit(f"出力先フォルダが空ではありません: {path}")
+
+
+def rebuild_part(archive: PageArchive, part: int, fast_parse: bool) -> tuple[list, int]:
+    """保存したページを取得順に読み直し、(コメント, ページ数) を返す。同じ番号は後で取ったものを使う"""
+    comments = {}
+    pages = 0
+    for _page, _offset, content in archive.iter_pages(part):
+        pages += 1
+        for item in parse_comments(content, fast_parse):
+            num = item.get("comment_no")
+            if num is None:
+                continue
+            item["part"] = part
+            comments[num] = item
+    return list(comments.values()), pages
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="生データ保存したページからjsonlログを作り直します(通信しません)")
+    parser.add_argument("parts", nargs="*", type=int, help="作り直す番号(省略時は保存してある全番号)")
+    parser.add_argument("--archive", default=ARCHIVE_DIR, help="生データの保存先フォルダ")
+    parser.add_argument("--out", default="logs_reparsed", help="出力先フォルダ(新規)")
+    parser.add_argument("--missing-year", type=int, default=MISSING_YEAR_DEFAULT, help="年が無い場合の年")
+    parser.add_argument("--html-parser", action="store_true", help="高速解析を使わず HTMLParser 版で読む")
+    args = parser.parse_args()
+
+    archive = PageArchive(args.archive)
+    parts = args.parts or archive.parts()
+    if not parts:
+        raise SystemExit(f"生データが見つかりません: {args.archive}")
+
+    out_root = Path(args.out)
+    ensure_empty_dir(out_root)
+
+    failed = 0
+    total = 0
+    for part in parts:
+        comments, pages = rebuild_part(archive, part, not args.html_parser)
+        if not comments:
+            print(f"part={part} コメントがありません(ページ数={pages})")
+            failed += 1
+            continue
+        file_day = determine_file_date(comments, args.missing_year)
+        if not file_day:
+            print(f"part={part} 日付が取れないため書き出しません")
+            failed += 1
+            continue
+        path = build_log_path(part, file_day, str(out_root))
+        save_jsonl(path, comments, args.missing_year)
+        total += len(comments)
+        print(f"part={part} ページ数={pages} 件数={len(comments)} -> {path}")
+
+    print(f"番号数: {len(parts)}")
+    print(f"コメント数: {total}")
+    if failed:
+        print(f"書き出せなかった番号: {failed}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
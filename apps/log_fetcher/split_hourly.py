@@ -1,57 +1,14 @@
 import argparse
 import json
-import re
-from datetime import datetime
+import os
+import sys
 from pathlib import Path
-from typing import Optional
-
-
-POSTED_AT_RE = re.compile(
-    r"(?:(\d{4})年)?\s*(\d{1,2})月\s*(\d{1,2})日\s*(\d{1,2}):(\d{2})(?::(\d{2}))?"
-)
-ALT_POSTED_AT_RE = re.compile(
-    r"(\d{4})[./-](\d{1,2})[./-](\d{1,2})\s*(\d{1,2}):(\d{2})(?::(\d{2}))?"
-)
-
-
-def parse_posted_at(text: str, missing_year: int) -> Optional[datetime]:
-    if not text:
-        return None
-
-    match = POSTED_AT_RE.search(text)
-    if match:
-        year_text, month_text, day_text, hour_text, minute_text, second_text = match.groups()
-        year = int(year_text) if year_text else missing_year
-        second = int(second_text) if second_text else 0
-        try:
-            return datetime(
-                year,
-                int(month_text),
-                int(day_text),
-                int(hour_text),
-                int(minute_text),
-                second,
-            )
-        except ValueError:
-            return None
-
-    match = ALT_POSTED_AT_RE.search(text)
-    if match:
-        year_text, month_text, day_text, hour_text, minute_text, second_text = match.groups()
-        second = int(second_text) if second_text else 0
-        try:
-            return datetime(
-                int(year_text),
-                int(month_text),
-                int(day_text),
-                int(hour_text),
-                int(minute_text),
-                second,
-            )
-        except ValueError:
-            return None
-
-    return None
+
+APPS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APPS_DIR not in sys.path:
+    sys.path.insert(0, APPS_DIR)
+
+from common.timeutil import minutes_to_text, post_minutes, posted_minutes_to_ts
 
 
 def derive_prefix(input_path: Path) -> str:
@@ -125,16 +82,16 @@ def main() -> int:
                     unknown_handles[unknown_path] = write_unknown_line(unknown_path, line, handle)
                     continue
 
-                posted_at = obj.get("posted_at") if isinstance(obj, dict) else None
-                dt = parse_posted_at(str(posted_at or ""), args.missing_year)
-                if dt is None:
+                post_min = post_minutes(obj, args.missing_year) if isinstance(obj, dict) else None
+                if post_min is None:
                     unknown += 1
                     handle = unknown_handles.get(unknown_path)
                     unknown_handles[unknown_path] = write_unknown_line(unknown_path, line, handle)
                     continue
 
-                date_str = dt.strftime("%Y%m%d")
-                hour_str = dt.strftime("%H")
+                hour_key = minutes_to_text(post_min, "%Y%m%d%H")
+                date_str = hour_key[:8]
+                hour_str = hour_key[8:]
                 out_dir = out_root / date_str
                 out_dir.mkdir(parents=True, exist_ok=True)
                 out_path = out_dir / f"{prefix}_{date_str}{hour_str}.jsonl"
@@ -148,6 +105,9 @@ def main() -> int:
                     posted_at = obj.get("posted_at", "")
                     if posted_at and "年" not in str(posted_at):
                         obj["posted_at"] = f"{args.missing_year}年{posted_at}"
+                # 後段で読み直さなくて済むよう、日時を数値でも持たせる
+                if "ts" not in obj:
+                    obj["ts"] = posted_minutes_to_ts(post_min)
                 handle.write(json.dumps(obj, ensure_ascii=False) + "\n")
                 written += 1
 
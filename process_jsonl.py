@@ -18,11 +18,13 @@ with open(input_file, 'r', encoding='utf-8') as f_in, \
     for line in f_in:
         if line.strip():
             data = json.loads(line)
-            # posted_at と text のみを残す
+            # posted_at と text のみを残す（ts があれば日時の数値として残す）
             filtered_data = {
                 "posted_at": data.get("posted_at", ""),
                 "text": data.get("text", "")
             }
+            if "ts" in data:
+                filtered_data["ts"] = data["ts"]
             f_out.write(json.dumps(filtered_data, ensure_ascii=False) + '\n')
 
 print(f"Created: {output_file}")